@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Times the search for free slots in a year of synthetic schedules for a
+whole fleet.
+
+Usage: python3 benchmarks/bench_free_slots.py [aircraft] [days]"""
+
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytz
+import src as paperless
+
+
+def fleet_schedules(aircraft, days, rnd):
+    tz = pytz.timezone('America/Los_Angeles')
+    first_day = datetime.datetime(2020, 1, 1)
+    schedules = {}
+    for i in range(aircraft):
+        tail_number = str(10000 + i)
+        schedules[tail_number] = []
+        for day in range(days):
+            hour = 7
+            while True:
+                hour += rnd.choice([0, 0, 0.5, 1, 2])
+                length = rnd.choice([1, 1.5, 2, 3])
+                if hour + length > 20:
+                    break
+                start = first_day + datetime.timedelta(days=day, hours=hour)
+                schedules[tail_number].append(paperless.Schedule(
+                    None, tail_number, tz.localize(start),
+                    tz.localize(start + datetime.timedelta(hours=length))))
+                hour += length
+    return schedules, tz.localize(first_day)
+
+
+def main(aircraft=30, days=365):
+    schedules, first_day = fleet_schedules(aircraft, days, random.Random(1))
+    count = sum(len(s) for s in schedules.values())
+    print('{} aircraft, {} days, {} schedules'.format(aircraft, days, count))
+
+    t = time.perf_counter()
+    busy_times = paperless.FleetBusyTimes(schedules)
+    print('  build arrays         {:8.2f} ms'.format(
+        (time.perf_counter() - t) * 1000))
+
+    for window_days, hours in [(7, 3), (days, 3), (days, 10)]:
+        end = first_day + datetime.timedelta(days=window_days)
+        min_duration = datetime.timedelta(hours=hours)
+        t = time.perf_counter()
+        groups, starts, ends = busy_times.gaps(first_day, end, min_duration)
+        t_gaps = time.perf_counter() - t
+        t = time.perf_counter()
+        slots = busy_times.free_slots(first_day, end, min_duration)
+        t_slots = time.perf_counter() - t
+        print('  {:3} days, >= {:2} h   gaps() {:7.2f} ms  free_slots() {:7.2f}'
+              ' ms  {:6} slots'.format(window_days, hours, t_gaps * 1000,
+                                       t_slots * 1000, len(slots)))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
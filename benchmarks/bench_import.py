@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Times the cold startup of the package and of the scripts, each in a new
+interpreter, and reports the median over the runs.
+
+Usage: python3 benchmarks/bench_import.py [runs]"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ('python (baseline)', ['-c', 'pass']),
+    ('import src', ['-c', 'import src']),
+    ('src.Schedule', ['-c', 'import src; src.Schedule']),
+    ('src.Calendar', ['-c', 'import src; src.Calendar']),
+    ('src.Scraper', ['-c', 'import src; src.Scraper']),
+    ('create_ics.py --help', ['create_ics.py', '--help']),
+    ('poll.py --help', ['poll.py', '--help']),
+    ]
+
+
+def main(runs=20):
+    with tempfile.TemporaryDirectory() as home:
+        # Startup must not need (nor create) the data directory
+        env = dict(os.environ, HOME=home)
+        print('{:<24} {:>12}'.format('', 'median (ms)'))
+        for name, args in CASES:
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                subprocess.run([sys.executable] + args, cwd=ROOT_DIR, env=env,
+                               stdout=subprocess.DEVNULL, check=True)
+                timings.append(time.perf_counter() - start)
+            print('{:<24} {:>12.1f}'.format(
+                name, statistics.median(timings) * 1000))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Compares the time taken by each parser to read the schedules table of
+the pages saved in tests/fixtures.
+
+Usage: python3 benchmarks/bench_parser.py [repetitions]"""
+
+import os
+import sys
+import timeit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import src as paperless
+
+
+FIXTURES = [
+    ('my_schedules.html', 2, 7),
+    ('aircraft_schedules.html', 1, 4),
+    ]
+
+
+def main(repetitions=20):
+    for filename, start_idx, end_idx in FIXTURES:
+        with open(os.path.join(ROOT_DIR, 'tests', 'fixtures', filename)) as f:
+            html = f.read()
+        print('{} ({} KiB)'.format(filename, len(html) // 1024))
+
+        timings = {}
+        for name, parser_class in sorted(paperless.Scraper.PARSERS.items()):
+            parser = parser_class()
+            def run():
+                return list(parser.table_rows(html, paperless.scraper.TABLE_ID,
+                                              start_idx, end_idx))
+            rows = len(run())
+            timings[name] = min(timeit.repeat(run, number=1,
+                                              repeat=repetitions))
+            print('  {:<5} {:8.2f} ms  {:4} rows'.format(
+                name, timings[name] * 1000, rows))
+        print('  lxml is {:.1f}x faster'.format(
+            timings['soup'] / timings['lxml']))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Measures the memory taken by Schedule objects, compared with the same
+class without __slots__.
+
+Usage: python3 benchmarks/bench_schedule_memory.py [count]"""
+
+import datetime
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src as paperless
+
+
+class DictSchedule:
+    """Schedule as it was before __slots__"""
+
+    def __init__(self, id_=None, tail_number=None, start_dt=None, end_dt=None,
+                 pilot=None, cfi=None, note=None):
+        self.id = id_
+        self.tail_number = tail_number
+        self.start_dt = start_dt
+        self.end_dt = end_dt
+        self.pilot = pilot
+        self.cfi = cfi
+        self.note = note
+
+
+def measure(schedule_class, count):
+    # Field values are shared, only the objects themselves are measured
+    start = datetime.datetime(2020, 10, 21, 14, 0)
+    end = datetime.datetime(2020, 10, 21, 16, 0)
+    tracemalloc.start()
+    schedules = [schedule_class('ACFT_SCHED', '12345', start, end,
+                                'Smith, John', 'Stewart, Michael')
+                 for _ in range(count)]
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / count
+
+
+def main(count=100000):
+    old = measure(DictSchedule, count)
+    new = measure(paperless.Schedule, count)
+    print('{} schedules'.format(count))
+    print('  __dict__   {:6.1f} bytes/schedule'.format(old))
+    print('  __slots__  {:6.1f} bytes/schedule'.format(new))
+    print('  {:.1f}x smaller'.format(old / new))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Benchmarks the scraper entry points against the local stand-in for the
+website (tests/fake_fbo.py), so no network nor credentials are needed.
+
+For each entry point, reports requests per second, parse time per row and
+peak memory (Python allocations) of one call.
+
+Usage: python3 benchmarks/bench_scraper.py --help"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'tests'))
+
+import src as paperless
+from fake_fbo import FakeFbo
+
+
+def make_scraper(fbo, tmp_dir, parser):
+    return fbo.scraper(tmp_dir, parser=parser)
+
+
+def entry_points(fbo, tmp_dir, parser):
+    """Yields (name, function, function parsing the page or None)"""
+    def log_in():
+        make_scraper(fbo, tmp_dir, parser).log_in()
+    yield 'log_in', log_in, None
+
+    scraper = make_scraper(fbo, tmp_dir, parser)
+    scraper.log_in()
+    my_schedules_html = fbo.my_schedules_page()
+    yield 'my_schedules', scraper.my_schedules, \
+          lambda: scraper.parse_my_schedules(my_schedules_html)
+    tail_number = FakeFbo.TAIL_NUMBERS[0][1:]
+    aircraft_schedules_html = fbo.aircraft_schedules_page(tail_number)
+    yield 'aircraft_schedules', \
+          lambda: scraper.aircraft_schedules(tail_number), \
+          lambda: scraper.parse_aircraft_schedules(aircraft_schedules_html)
+    yield 'aircraft_schedules_many', \
+          lambda: scraper.aircraft_schedules_many(FakeFbo.TAIL_NUMBERS), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--my-rows', type=int, default=20)
+    parser.add_argument('--aircraft-rows', type=int, default=400)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds taken by the server per request')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--parser', default='lxml',
+                        choices=sorted(paperless.Scraper.PARSERS))
+    args = parser.parse_args()
+
+    print('{} rows in My Schedules, {} rows per aircraft, latency {} s, '
+          '{} parser'.format(args.my_rows, args.aircraft_rows, args.latency,
+                             args.parser))
+    print('{:<24} {:>10} {:>10} {:>14} {:>12}'.format(
+        'entry point', 'ms/call', 'req/s', 'parse us/row', 'peak KiB'))
+    with FakeFbo(args.my_rows, args.aircraft_rows, args.latency) as fbo, \
+         tempfile.TemporaryDirectory() as tmp_dir:
+        for name, function, parse in entry_points(fbo, tmp_dir, args.parser):
+            function() # Warm up
+
+            requests = fbo.total_requests()
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                function()
+            elapsed = time.perf_counter() - start
+            requests = fbo.total_requests() - requests
+
+            parse_time = ''
+            if parse:
+                start = time.perf_counter()
+                rows = 0
+                for _ in range(args.iterations):
+                    rows += len(list(parse()))
+                parse_time = '{:.1f}'.format(
+                    (time.perf_counter() - start) / rows * 1e6)
+
+            tracemalloc.start()
+            function()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            print('{:<24} {:>10.2f} {:>10.1f} {:>14} {:>12.0f}'.format(
+                name, elapsed / args.iterations * 1000, requests / elapsed,
+                parse_time, peak / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,47 @@
 
 import src as paperless
 
-if paperless.Scraper().is_aircraft_available_before_my_next_flight():
-    print('Aircraft AVAILABLE before next flight')
-else:
-    print('Aircraft BUSY before next flight')
+import argparse
+import datetime
+import sys
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--offline', action='store_true',
+                    help='read the schedules saved by previous runs instead '
+                         'of the website')
+parser.add_argument('--profile', metavar='FILE', nargs='?',
+                    const='check_airplane.prof',
+                    help='write a cProfile dump to FILE and print the time '
+                         'taken by each stage')
+args = parser.parse_args()
+
+
+def is_available_offline():
+    store = paperless.ScheduleStore()
+    settings = paperless.settings.load().scraper()
+    now = datetime.datetime.now(datetime.timezone.utc)
+    schedules = store.query(start=now, owner=settings.username)
+    if not schedules:
+        sys.exit('No stored schedules of {} from now on, run '
+                 'check_airplane_free_before_next_flight.py without --offline '
+                 'first'.format(settings.username))
+    next_flight = schedules[0]
+    return store.fleet_availability([next_flight.tail_number])\
+                .is_available_before_flight(next_flight)
+
+
+def main():
+    paperless.settings.load().validate('scraper')
+    if args.offline:
+        available = is_available_offline()
+    else:
+        scraper = paperless.Scraper(page_cache=paperless.PageCache(),
+                                    store=paperless.ScheduleStore())
+        available = scraper.is_aircraft_available_before_my_next_flight()
+    if available:
+        print('Aircraft AVAILABLE before next flight')
+    else:
+        print('Aircraft BUSY before next flight')
+
+
+paperless.instrument.run(main, args.profile)
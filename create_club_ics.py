@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Writes the calendar of every [account:NAME] of the settings.
+
+    python3 create_club_ics.py [max_workers] [min_interval] [--profile]
+"""
+
+import src as paperless
+
+import argparse
+
+parser = argparse.ArgumentParser()
+parser.add_argument('max_workers', type=int, nargs='?', default=8)
+parser.add_argument('min_interval', type=float, nargs='?', default=1.0)
+parser.add_argument('--profile', metavar='FILE', nargs='?',
+                    const='create_club_ics.prof',
+                    help='write a cProfile dump to FILE and print the time '
+                         'taken by each stage')
+args = parser.parse_args()
+
+
+def main():
+    paperless.settings.load().validate('calendar')
+    club = paperless.Club(paperless.read_accounts(),
+                          max_workers=args.max_workers,
+                          min_interval=args.min_interval,
+                          page_cache=paperless.PageCache())
+    for name, result in club.run_cycle().items():
+        if result.error is not None:
+            print('{}: FAILED ({!r})'.format(name, result.error))
+        else:
+            print('{}: {} schedules'.format(name, len(result.schedules)))
+
+
+paperless.instrument.run(main, args.profile)
@@ -3,6 +3,52 @@
 
 import src as paperless
 
-schedules = paperless.Scraper().my_schedules()
-calendar = paperless.Calendar(schedules)
-calendar.write_filename('paperless.ics')
+import argparse
+import datetime
+import sys
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--offline', action='store_true',
+                    help='read the schedules saved by previous runs instead '
+                         'of the website')
+parser.add_argument('--early', choices=['alarm', 'dtstart'],
+                    help='when the aircraft is free before a flight, add an '
+                         'alarm at that time, or start the event then')
+parser.add_argument('--profile', metavar='FILE', nargs='?',
+                    const='create_ics.prof',
+                    help='write a cProfile dump to FILE and print the time '
+                         'taken by each stage')
+args = parser.parse_args()
+
+
+def main():
+    # Reports every problem before anything is fetched
+    paperless.settings.load().validate()
+    store = paperless.ScheduleStore()
+    if args.offline:
+        settings = paperless.settings.load().scraper()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        schedules = store.query(start=now, owner=settings.username)
+        if not schedules:
+            # Never fetched, or only past flights: writing an empty
+            # calendar would cancel events which may still be there
+            sys.exit('No stored schedules of {} from now on, run '
+                     'create_ics.py without --offline first'.format(
+                         settings.username))
+        free_times = None
+        if args.early:
+            free_times = paperless.free_time_before_flights(
+                schedules, store.schedules_by_tail_number(
+                    {s.tail_number for s in schedules}, start=now))
+    else:
+        scraper = paperless.Scraper(page_cache=paperless.PageCache(),
+                                    store=store)
+        schedules = scraper.my_schedules()
+        free_times = None
+        if args.early:
+            free_times = scraper.free_time_before_my_flights(schedules)
+    calendar = paperless.Calendar(schedules, free_times, args.early)
+    calendar.write_filename('paperless.ics')
+
+
+paperless.instrument.run(main, args.profile)
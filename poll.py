@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Keeps the calendar and the aircraft availability up to date, polling
+the website more often as the next flight approaches.
+
+    python3 poll.py [--calendar paperless.ics] [--once] [--profile]
+                    [--serve PORT [--host HOST]]
+
+With --serve, the calendar is also served over HTTP, from memory, at the
+URL printed on start, e.g. for an Apple Calendar subscription.
+"""
+
+import src as paperless
+
+import argparse
+import signal
+import urllib.parse
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--calendar', default='paperless.ics')
+parser.add_argument('--once', action='store_true',
+                    help='poll once and exit')
+parser.add_argument('--profile', metavar='FILE', nargs='?',
+                    const='poll.prof',
+                    help='write a cProfile dump to FILE and print the time '
+                         'taken by each stage, on exit')
+parser.add_argument('--serve', metavar='PORT', type=int,
+                    help='serve the calendar over HTTP on PORT')
+parser.add_argument('--host', default='127.0.0.1',
+                    help='address to serve the calendar on (default: '
+                         '%(default)s)')
+args = parser.parse_args()
+
+
+def main():
+    paperless.settings.load().validate()
+    scraper = paperless.Scraper(page_cache=paperless.PageCache())
+    server = None
+    if args.serve is not None and not args.once:
+        server = paperless.CalendarServer(args.host, args.serve).start()
+        print('Serving the calendar at {}{}.ics'.format(
+            server.url, urllib.parse.quote(scraper.username)))
+    poller = paperless.Poller(scraper, args.calendar,
+                              change_feed=paperless.ChangeFeed(
+                                  scraper.username),
+                              server=server)
+    if args.once:
+        poller.poll()
+    else:
+        signal.signal(signal.SIGTERM, lambda *args: poller.stop())
+        try:
+            poller.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if server is not None:
+                server.stop()
+
+
+paperless.instrument.run(main, args.profile)
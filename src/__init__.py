@@ -34,8 +34,59 @@ __maintainer__ = 'Mathieu Clement'
 __email__ = 'tiktaktok@users.noreply.github.com'
 __status__ = ''
 
-from .core import absolute_filename # Must be first to avoid cyclic dependency
+import importlib
 
-from .calendar import Calendar
-from .schedule import Schedule
-from .scraper import Scraper
+# Attributes of the package, imported from their module on first access
+# (see __getattr__), so that a script only pays for the modules it uses:
+# bs4, lxml, requests, icalendar and numpy take most of the startup time.
+_LAZY_ATTRIBUTES = {
+    'absolute_filename': 'core',
+    'write_atomically': 'core',
+    'AircraftAvailability': 'availability',
+    'FleetAvailability': 'availability',
+    'PageCache': 'cache',
+    'Calendar': 'calendar',
+    'ChangeFeed': 'changes',
+    'diff': 'changes',
+    'Coalescer': 'coalesce',
+    'Poller': 'daemon',
+    'FreeTime': 'early',
+    'free_time_before_flights': 'early',
+    'FleetBusyTimes': 'freeslots',
+    'FreeSlot': 'freeslots',
+    'find_free_slots': 'freeslots',
+    'Schedule': 'schedule',
+    'Transport': 'transport',
+    'Scraper': 'scraper',
+    'AsyncScraper': 'asyncscraper',
+    'Account': 'accounts',
+    'Club': 'accounts',
+    'RateLimiter': 'accounts',
+    'read_accounts': 'accounts',
+    'ScheduleStore': 'store',
+    'CalendarServer': 'server',
+    }
+
+_SUBMODULES = {'accounts', 'asyncscraper', 'availability', 'cache',
+               'calendar', 'changes', 'coalesce', 'core', 'daemon', 'early',
+               'freeslots', 'instrument', 'schedule', 'scraper', 'server',
+               'settings', 'store', 'transport'}
+
+__all__ = sorted(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError('module {!r} has no attribute {!r}'.format(
+            __name__, name))
+    module = importlib.import_module('.' + _LAZY_ATTRIBUTES[name], __name__)
+    value = getattr(module, name)
+    # Next time found without calling __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | _SUBMODULES)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .core import absolute_filename
+from . import settings
+from .availability import AircraftAvailability
+from .calendar import write_calendar
+from .scraper import Scraper
+from .transport import Transport
+
+import collections
+import concurrent.futures
+import datetime
+import re
+import threading
+import time
+
+
+ACCOUNT_SECTION_PREFIX = 'account:'
+
+
+class Account:
+    """Credentials and outputs of one member, from an [account:NAME]
+    section of the settings. url and timezone default to those of the
+    [scraper] section."""
+
+    def __init__(self, name, base_url, username, password, timezone=None,
+                 calendar_path=None, principal_cfi=None):
+        self.name = name
+        self.base_url = base_url
+        self.username = username
+        self.password = password
+        self.timezone = timezone
+        self.calendar_path = calendar_path or absolute_filename(
+            'calendar-{}.ics'.format(re.sub(r'[^\w.-]', '_', name)))
+        self.principal_cfi = principal_cfi
+
+
+    def __repr__(self):
+        return 'Account({!r}, {!r}, {!r})'.format(self.name, self.base_url,
+                                                  self.username)
+
+
+def read_accounts(path=None):
+    """Returns the list of Account configured in the settings file, in the
+    order of their sections.
+
+        [account:mathieu]
+        username = ...
+        password = ...
+        calendar = /var/www/calendars/mathieu.ics   ; optional
+        principal_cfi = Smith, John                 ; optional
+    """
+    config = settings.load(path).config
+    defaults = config['scraper'] if config.has_section('scraper') else {}
+    accounts = []
+    for section in config.sections():
+        if not section.startswith(ACCOUNT_SECTION_PREFIX):
+            continue
+        name = section[len(ACCOUNT_SECTION_PREFIX):]
+        options = config[section]
+        base_url = options.get('url', defaults.get('url'))
+        username = options.get('username')
+        password = options.get('password')
+        if not base_url or not username or not password:
+            raise ValueError('Mandatory settings missing for account {}'
+                             .format(name))
+        accounts.append(Account(name, base_url, username, password,
+                                options.get('timezone',
+                                            defaults.get('timezone')),
+                                options.get('calendar'),
+                                options.get('principal_cfi')))
+    return accounts
+
+
+class RateLimiter:
+    """Spaces calls to wait() by at least interval seconds, across
+    threads."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_time = 0
+
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+AccountResult = collections.namedtuple(
+    'AccountResult', ['schedules', 'available_before_next_flight', 'error'])
+
+
+class Club:
+    """Scrapes the schedules of many accounts and writes their calendars.
+
+    Each account has its own scraper, so its own session and cookie jar,
+    and its own RateLimiter: one account never sends more than one request
+    every min_interval seconds. All accounts share one pool of at most
+    max_workers threads. The page of an aircraft flown by several members
+    is fetched only once per cycle; give a coalesce.Coalescer to also reuse
+    aircraft pages from one cycle to the next. The scrapers share one
+    Transport, so connections are reused from one account to the next.
+
+    Given a server.CalendarServer, each calendar is also served by it, as
+    the account name; clients only download it again once it changed."""
+
+    def __init__(self, accounts, max_workers=8, min_interval=1.0,
+                 page_cache=None, coalescer=None, transport=None,
+                 server=None):
+        self.accounts = list(accounts)
+        self.server = server
+        self.max_workers = max_workers
+        self.transport = transport or Transport(pool_size=max_workers)
+        self.scrapers = {}
+        for account in self.accounts:
+            self.scrapers[account.name] = Scraper(
+                account.base_url, account.username, account.password,
+                account.timezone, page_cache=page_cache,
+                rate_limiter=RateLimiter(min_interval), coalescer=coalescer,
+                transport=self.transport)
+
+
+    def run_cycle(self, write_calendars=True):
+        """Fetches everything once, writes each account's calendar, and
+        returns a dict of account name to AccountResult. An account which
+        fails doesn't stop the others: its error is in its result."""
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) \
+             as executor:
+            my_schedules = {account.name: executor.submit(
+                                self.scrapers[account.name].my_schedules)
+                            for account in self.accounts}
+
+            # Each aircraft by whoever needs it first
+            next_flights = {}
+            aircraft_schedules = {}
+            for account in self.accounts:
+                try:
+                    schedules = my_schedules[account.name].result()
+                except Exception:
+                    continue
+                next_flight = self.next_flight(account, schedules)
+                next_flights[account.name] = next_flight
+                if next_flight is not None \
+                   and next_flight.tail_number not in aircraft_schedules:
+                    aircraft_schedules[next_flight.tail_number] = \
+                        executor.submit(
+                            self.scrapers[account.name].aircraft_schedules,
+                            next_flight.tail_number)
+
+            results = {}
+            for account in self.accounts:
+                results[account.name] = executor.submit(
+                    self.finish, account, my_schedules[account.name],
+                    next_flights.get(account.name), aircraft_schedules,
+                    write_calendars)
+            return {name: result.result()
+                    for name, result in results.items()}
+
+
+    def next_flight(self, account, schedules):
+        now = datetime.datetime.now(self.scrapers[account.name].timezone)
+        for schedule in schedules:
+            if schedule.end_dt > now:
+                return schedule
+        return None
+
+
+    def finish(self, account, my_schedules, next_flight, aircraft_schedules,
+               write_calendars):
+        """Writes the calendar of account and checks its next flight, once
+        the pages it needs are fetched."""
+        try:
+            schedules = my_schedules.result()
+            if write_calendars:
+                write_calendar(schedules, account.calendar_path,
+                               account.principal_cfi, self.server,
+                               account.name)
+            available = None
+            if next_flight is not None:
+                aircraft = AircraftAvailability(
+                    aircraft_schedules[next_flight.tail_number].result())
+                available = aircraft.is_free_before(next_flight.start_dt)
+            return AccountResult(schedules, available, None)
+        except Exception as e:
+            return AccountResult(None, None, e)
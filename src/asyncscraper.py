@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from . import instrument
+from .schedule import canonicalize_tail_number
+from .scraper import Scraper, in_window
+from .transport import RETRY_STATUSES
+
+import aiohttp
+import asyncio
+
+
+class AsyncScraper:
+    """Same as Scraper, for asyncio code: log_in(), my_schedules(),
+    aircraft_schedules() and is_aircraft_available_before_my_next_flight()
+    are coroutines.
+
+    Requests go through one aiohttp connection pool (at most pool_size
+    connections). Pages are parsed by executor (by default the loop's
+    thread pool), so the event loop isn't blocked while a page is read.
+
+    The arguments are those of Scraper, which reads the pages. The page
+    cache, store, coalescer and rate limiter of Scraper are not supported,
+    nor are sessions kept between runs.
+
+    Needs aiohttp, which is optional: pip3 install -r
+    requirements-async.txt"""
+
+    def __init__(self, base_url=None, username=None, password=None,
+                 timezone=None, parser='lxml', pool_size=10,
+                 connect_timeout=10, read_timeout=60, retries=3,
+                 backoff_factor=0.5, executor=None):
+        self.scraper = Scraper(base_url, username, password, timezone,
+                               parser)
+        self.username = self.scraper.username
+        self.timezone = self.scraper.timezone
+        self.urls = self.scraper.urls
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout,
+                                             sock_read=read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.executor = executor
+        # Created in the event loop, on first use
+        self.session = None
+        self.login_lock = asyncio.Lock()
+        self.is_logged_in = False
+        self.logins = 0
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+    def get_session(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                # unsafe: also keeps the cookies of IP addresses, e.g. of a
+                # local test server
+                cookie_jar=aiohttp.CookieJar(unsafe=True),
+                timeout=self.timeout)
+        return self.session
+
+
+    async def request(self, method, url, **kwargs):
+        """Returns (response, body as bytes). GETs are retried with an
+        exponential backoff on connection errors and 5xx responses, as
+        with Transport; the login POST only when it couldn't connect, as
+        it may have been sent otherwise."""
+        session = self.get_session()
+        retried_errors = aiohttp.ClientConnectionError if method == 'GET' \
+                         else aiohttp.ClientConnectorError
+        for retry in range(self.retries + 1):
+            if retry:
+                await asyncio.sleep(self.backoff_factor * 2 ** (retry - 1))
+            try:
+                async with session.request(method, url, allow_redirects=False,
+                                           **kwargs) as response:
+                    body = await response.read()
+            except retried_errors:
+                if retry == self.retries:
+                    raise
+                continue
+            if method != 'GET' or response.status not in RETRY_STATUSES \
+               or retry == self.retries:
+                return response, body
+
+
+    async def run(self, function, *args):
+        """Returns function(*args), run by the executor"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, function, *args)
+
+
+    async def log_in(self):
+        """Starts a new session and logs in, see Scraper.log_in()"""
+        with instrument.span('login'):
+            self.get_session().cookie_jar.clear()
+            self.logins += 1
+            response, body = await self.request('GET', self.urls.LOGIN_PAGE)
+            form_data = {
+                'TextBox1': 'Please Log In',
+                'ButtLogin': 'Log In',
+                'txtUserName': self.username,
+                'txtPassword': self.scraper.password
+                }
+            form_data.update(await self.run(self.scraper.parser.hidden_inputs,
+                                            self.text(response, body)))
+            response, _ = await self.request('POST', self.urls.LOGIN_PAGE,
+                                             data=form_data)
+            self.is_logged_in = \
+                response.headers.get('Location') == '/mstr7.aspx'
+            return self.is_logged_in
+
+
+    async def ensure_logged_in(self):
+        async with self.login_lock:
+            if not self.is_logged_in:
+                await self.log_in()
+        assert self.is_logged_in, "Could not log in"
+
+
+    async def fetch(self, url):
+        """Returns the text of a page which is only available to logged in
+        users, logging in again once if the session expired."""
+        await self.ensure_logged_in()
+        with instrument.span('fetch'):
+            logins = self.logins
+            response, body = await self.request('GET', url)
+            # Schedule pages only redirect to the login page
+            if 300 <= response.status < 400:
+                async with self.login_lock:
+                    # Another task may have logged in again in the meantime
+                    if self.logins == logins:
+                        await self.log_in()
+                assert self.is_logged_in, "Could not log in"
+                response, body = await self.request('GET', url)
+        instrument.count('pages fetched')
+        instrument.count('bytes downloaded', len(body))
+        return self.text(response, body)
+
+
+    def text(self, response, body):
+        return body.decode(response.charset or 'utf-8', errors='replace')
+
+
+    async def read_schedules(self, url, parse, since=None, until=None):
+        html = await self.fetch(url)
+        return await self.run(self.parse, parse, html, since, until)
+
+
+    def parse(self, parse, html, since, until):
+        return list(in_window(instrument.timed_iter(
+            'parse', parse(html), 'rows parsed'), since, until))
+
+
+    async def my_schedules(self, since=None, until=None):
+        """See Scraper.my_schedules()"""
+        return await self.read_schedules(self.urls.MY_SCHEDULES,
+                                         self.scraper.parse_my_schedules,
+                                         since, until)
+
+
+    async def my_next_flight(self):
+        """See Scraper.my_next_flight()"""
+        schedules = await self.my_schedules()
+        if not schedules:
+            raise IndexError('No future schedules')
+        return schedules[0]
+
+
+    async def aircraft_schedules(self, tail_number, since=None, until=None):
+        """See Scraper.aircraft_schedules()"""
+        url = '{}?AC={}'.format(
+            self.urls.AIRCRAFT_SCHEDULES,
+            canonicalize_tail_number(tail_number))
+        return await self.read_schedules(
+            url, self.scraper.parse_aircraft_schedules, since, until)
+
+
+    async def is_aircraft_available_before_my_next_flight(self):
+        next_flight = await self.my_next_flight()
+        schedules = await self.aircraft_schedules(next_flight.tail_number,
+                                                  until=next_flight.end_dt)
+        return self.scraper.is_aircraft_available_before_flight(next_flight,
+                                                                schedules)
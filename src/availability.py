@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .schedule import canonicalize_tail_number
+
+from bisect import bisect_left, bisect_right
+import datetime
+
+
+class AircraftAvailability:
+    """When one aircraft is busy, from its schedules.
+
+    Schedules don't need to be sorted. Overlapping and back-to-back
+    schedules are merged into busy intervals once, then every question is
+    answered with binary searches, so build this once and ask many
+    questions."""
+
+    def __init__(self, schedules):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted((s.start_dt, s.end_dt) for s in schedules):
+            if self.ends and start <= self.ends[-1]:
+                if end > self.ends[-1]:
+                    self.ends[-1] = end
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+        # gaps[i] is the free time between busy intervals i and i+1
+        gaps = [self.starts[i + 1] - self.ends[i]
+                for i in range(len(self.starts) - 1)]
+        # Sparse table: longest_gaps[k][i] is the longest of gaps[i:i+2**k]
+        self.longest_gaps = [gaps]
+        k = 1
+        while 2 ** k <= len(gaps):
+            previous = self.longest_gaps[-1]
+            half = 2 ** (k - 1)
+            self.longest_gaps.append([max(previous[i], previous[i + half])
+                                      for i in range(len(gaps) - 2 ** k + 1)])
+            k += 1
+
+
+    def __len__(self):
+        """Number of busy intervals"""
+        return len(self.starts)
+
+
+    def is_busy(self, dt):
+        i = bisect_right(self.starts, dt) - 1
+        return i >= 0 and dt < self.ends[i]
+
+
+    def overlaps(self, start, end):
+        """Returns True if the aircraft is busy at any time between start
+        (inclusive) and end (exclusive)."""
+        # First busy interval ending after start
+        i = bisect_right(self.ends, start)
+        return i < len(self.starts) and self.starts[i] < end
+
+
+    def free_since(self, dt):
+        """Returns the time since which the aircraft is free until dt, dt
+        itself if it is busy right before dt, or None if it isn't busy at
+        any time before dt."""
+        # Last busy interval starting before dt
+        i = bisect_left(self.starts, dt) - 1
+        if i < 0:
+            return None
+        return min(self.ends[i], dt)
+
+
+    def free_time_before(self, dt):
+        """Returns for how long (timedelta) the aircraft is free right before
+        dt, or None if it isn't busy at any time before dt."""
+        since = self.free_since(dt)
+        if since is None:
+            return None
+        return dt - since
+
+
+    def is_free_before(self, dt, at_least_minutes=15):
+        free_time = self.free_time_before(dt)
+        return free_time is None \
+               or free_time >= datetime.timedelta(minutes=at_least_minutes)
+
+
+    def next_gap(self, after, min_duration=datetime.timedelta(0)):
+        """Returns (start, end) of the first time from after on during which
+        the aircraft is free for at least min_duration. end is None if the
+        aircraft isn't busy at any time after start."""
+        n = len(self.starts)
+        # Busy intervals ending after "after"
+        i = bisect_right(self.ends, after)
+        if i == n:
+            return (after, None)
+        if self.starts[i] > after \
+           and self.starts[i] - after >= min_duration:
+            # Free at "after", until the next busy interval
+            return (after, self.starts[i])
+        # First gap k >= i, between busy intervals k and k+1, long enough
+        k = self.first_gap(i, min_duration)
+        if k is None:
+            return (self.ends[-1], None)
+        return (self.ends[k], self.starts[k + 1])
+
+
+    def first_gap(self, i, min_duration):
+        """Returns the smallest k >= i such that gaps[k] >= min_duration (and
+        isn't empty), or None."""
+        gaps = self.longest_gaps[0]
+        if i >= len(gaps):
+            return None
+        min_duration = max(min_duration, datetime.timedelta.resolution)
+        if self.longest_gap(i, len(gaps)) < min_duration:
+            return None
+        # Shrink [i, hi) while it still contains a long enough gap
+        lo, hi = i, len(gaps)
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self.longest_gap(lo, mid) >= min_duration:
+                hi = mid
+            else:
+                lo = mid
+        return lo
+
+
+    def longest_gap(self, lo, hi):
+        """Longest of gaps[lo:hi], hi > lo"""
+        k = (hi - lo).bit_length() - 1
+        table = self.longest_gaps[k]
+        return max(table[lo], table[hi - 2 ** k])
+
+
+class FleetAvailability:
+    """AircraftAvailability for several aircraft, by tail number (with or
+    without N prefix)."""
+
+    def __init__(self, schedules_by_tail_number):
+        self.aircraft = {}
+        for tail_number, schedules in schedules_by_tail_number.items():
+            self.aircraft[canonicalize_tail_number(tail_number)] = \
+                AircraftAvailability(schedules)
+
+
+    def __getitem__(self, tail_number):
+        return self.aircraft[canonicalize_tail_number(tail_number)]
+
+
+    def __contains__(self, tail_number):
+        return canonicalize_tail_number(tail_number) in self.aircraft
+
+
+    def tail_numbers(self):
+        return list(self.aircraft.keys())
+
+
+    def free_time_before_flight(self, flight):
+        """Returns for how long the aircraft of the flight is free right
+        before it, or None if the aircraft isn't busy before."""
+        return self[flight.tail_number].free_time_before(flight.start_dt)
+
+
+    def is_available_before_flight(self, flight, at_least_minutes=15):
+        return self[flight.tail_number].is_free_before(flight.start_dt,
+                                                       at_least_minutes)
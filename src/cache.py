@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .core import absolute_filename, write_atomically
+from .schedule import Schedule
+
+import hashlib
+import json
+import os
+import re
+import time
+
+
+# ASP.NET pages carry a view state which may change on every request even
+# though the schedules didn't, so it is left out of the content hash.
+HIDDEN_INPUT_REGEX = re.compile(rb'<input[^>]*type="hidden"[^>]*>',
+                                re.IGNORECASE)
+
+
+class PageCache:
+    """Remembers schedule pages, with the schedules parsed from them, so that
+    a page which didn't change is neither downloaded nor parsed again.
+
+    Entries are stored in DATA_DIR/page_cache, one file per URL and user.
+    An entry younger than ttl seconds is used without asking the server.
+    Older entries are revalidated with the ETag / Last-Modified headers when
+    the server sent them, and with a hash of the page otherwise.
+    Beyond max_entries, the least recently used entries are removed."""
+
+    def __init__(self, directory=None, ttl=0, max_entries=256):
+        self.directory = directory or absolute_filename('page_cache')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(self.directory, exist_ok=True)
+
+
+    def filename(self, url, username):
+        key = '{}\0{}'.format(username, url).encode('utf-8')
+        return os.path.join(self.directory,
+                            hashlib.sha1(key).hexdigest() + '.json')
+
+
+    def get(self, url, username):
+        """Returns the entry for this page, or None"""
+        filename = self.filename(url, username)
+        try:
+            with open(filename, 'r') as f:
+                entry = self.Entry(json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        if entry.url != url or entry.username != username:
+            return None
+        # The modification time of the file tells when it was last used
+        self.touch(filename)
+        return entry
+
+
+    def put(self, url, username, response, content_hash, schedules):
+        entry = self.Entry({
+            'url': url,
+            'username': username,
+            'validated': time.time(),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'hash': content_hash,
+            'schedules': [s.to_dict() for s in schedules],
+            })
+        self.save(entry)
+        self.evict()
+        return entry
+
+
+    def revalidated(self, entry):
+        """Records that the server confirmed the entry is still current"""
+        entry.validated = time.time()
+        self.save(entry)
+
+
+    def save(self, entry):
+        write_atomically(self.filename(entry.url, entry.username),
+                         json.dumps(entry.data).encode('utf-8'))
+
+
+    def evict(self):
+        filenames = [os.path.join(self.directory, f)
+                     for f in os.listdir(self.directory)
+                     if f.endswith('.json')]
+        if len(filenames) <= self.max_entries:
+            return
+        def last_used(filename):
+            try:
+                return os.path.getmtime(filename)
+            except OSError:
+                return 0
+        filenames.sort(key=last_used)
+        for filename in filenames[:len(filenames) - self.max_entries]:
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass # Evicted by another process
+
+
+    def touch(self, filename):
+        try:
+            os.utime(filename)
+        except OSError:
+            pass
+
+
+    def is_fresh(self, entry):
+        return time.time() - entry.validated < self.ttl
+
+
+    @staticmethod
+    def content_hash(content):
+        return hashlib.sha256(HIDDEN_INPUT_REGEX.sub(b'', content)).hexdigest()
+
+
+    class Entry:
+        def __init__(self, data):
+            self.data = data
+            self.url = data['url']
+            self.username = data['username']
+            self.etag = data['etag']
+            self.last_modified = data['last_modified']
+            self.hash = data['hash']
+
+        @property
+        def validated(self):
+            return self.data['validated']
+
+        @validated.setter
+        def validated(self, value):
+            self.data['validated'] = value
+
+        def schedules(self):
+            return [Schedule.from_dict(d) for d in self.data['schedules']]
+
+        def conditional_headers(self):
+            headers = {}
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            if self.last_modified:
+                headers['If-Modified-Since'] = self.last_modified
+            return headers
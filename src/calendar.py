@@ -1,58 +1,420 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from . import absolute_filename
+from .core import absolute_filename, write_atomically
+from . import instrument, settings
 
-import configparser
+import datetime
+import hashlib
 import icalendar
 
+UID_PREFIX = 'PAPERLESS-ICAL-EVENT-'
+PRODID = '-//TIKTAKTOK//PAPERLESS-ICAL//EN'
+
+# What to do with the time the aircraft is free before a flight, see
+# Calendar()
+EARLY_ALARM = 'alarm'
+EARLY_DTSTART = 'dtstart'
+# Less isn't worth it, more isn't useful
+EARLY_MIN = datetime.timedelta(minutes=15)
+EARLY_MAX = datetime.timedelta(hours=2)
+
+# Time zones written as UTC times (with a Z) rather than with a TZID
+UTC_TZIDS = frozenset(['UTC', 'Etc/UTC', 'UCT', 'Etc/UCT', 'GMT', 'Etc/GMT',
+                       'Universal', 'Etc/Universal', 'Zulu', 'Etc/Zulu'])
+
+
+def escape_text(text):
+    """Escapes a TEXT value (RFC 5545 3.3.11) like recent versions of
+    icalendar do: line endings, and newlines already escaped as \\N, become
+    \\n"""
+    return text.replace('\\N', '\n')\
+               .replace('\\', '\\\\').replace(';', '\\;')\
+               .replace(',', '\\,').replace('\r\n', '\\n')\
+               .replace('\n', '\\n').replace('\r', '\\n')
+
+
+def fold(line):
+    """Folds a content line to lines of at most 75 octets (RFC 5545 3.1),
+    at the same places as recent versions of icalendar: never inside a
+    UTF-8 sequence or right after a backslash or a caret, which start
+    escapes."""
+    if len(line) < 75 and line.isascii():
+        return line
+    lines = []
+    chars = []
+    octets = 0
+    for char in line:
+        length = len(char.encode('utf-8'))
+        if chars and octets + length >= 75:
+            if len(chars) > 1 and chars[-1] in '\\^':
+                lines.append(''.join(chars[:-1]))
+                chars = chars[-1:]
+                octets = 1
+            else:
+                lines.append(''.join(chars))
+                chars = []
+                octets = 0
+        chars.append(char)
+        octets += length
+    lines.append(''.join(chars))
+    return '\r\n '.join(lines)
+
+
+def format_datetime(name, dt):
+    """Returns the content line of the DATE-TIME property name, or None if
+    the time zone of dt has no known TZID"""
+    value = '{:%Y%m%dT%H%M%S}'.format(dt)
+    tzinfo = dt.tzinfo
+    if tzinfo is None:
+        return '{}:{}'.format(name, value)
+    tzid = getattr(tzinfo, 'zone', None) or getattr(tzinfo, 'key', None)
+    if tzinfo is datetime.timezone.utc or tzid in UTC_TZIDS:
+        return '{}:{}Z'.format(name, value)
+    if tzid is None:
+        return None
+    return '{};TZID={}:{}'.format(name, tzid, value)
+
+
+def format_duration(duration):
+    """Formats a timedelta as a DURATION value"""
+    sign = ''
+    if duration.days < 0:
+        sign = '-'
+        duration = -duration
+    hours, rest = divmod(duration.seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    time = ''
+    if duration.seconds:
+        time = 'T'
+        if hours:
+            time += '{}H'.format(hours)
+        if minutes or (hours and seconds):
+            time += '{}M'.format(minutes)
+        if seconds:
+            time += '{}S'.format(seconds)
+    if duration.days == 0 and time:
+        return '{}P{}'.format(sign, time)
+    return '{}P{}D{}'.format(sign, duration.days, time)
+
+
 class Calendar:
+    class Settings:
+        """The [calendar] settings, kept for existing callers: use
+        settings.load().calendar()"""
+        def __init__(self):
+            calendar_settings = settings.load().calendar()
+            self.principal_cfi = calendar_settings.principal_cfi
+            self.fbo_url = calendar_settings.fbo_url
+            self.fbo_address = calendar_settings.fbo_address
+
+
+    def __init__(self, schedules, free_times=None, early=None, fast=True,
+                 allow_empty=False):
+        """free_times are early.FreeTime of (some of) the schedules. If early
+        is EARLY_ALARM, events of flights whose aircraft is free for at
+        least EARLY_MIN before get an alarm at that time; if EARLY_DTSTART,
+        they start that much earlier (at most EARLY_MAX).
+
+        If fast, events are serialized straight from the schedules, see
+        fast_event(), rather than built and serialized with icalendar.
 
-    def __init__(self, schedules):
-        if schedules is None or schedules == []:
+        schedules can only be empty if allow_empty: written over a previous
+        calendar, an empty calendar cancels the events which didn't start
+        yet, e.g. once the last booking was cancelled."""
+        if schedules is None or (schedules == [] and not allow_empty):
             raise ValueError('Calendar cannot be empty')
+        if early not in (None, EARLY_ALARM, EARLY_DTSTART):
+            raise ValueError('Unknown early mode {!r}'.format(early))
 
-        self.settings = self.Settings()
+        self.settings = settings.load().calendar()
         self.principal_cfi = self.settings.principal_cfi
         self.fbo_url = self.settings.fbo_url
         self.fbo_address = self.settings.fbo_address
 
-        self.schedules = schedules
-        self.cal = icalendar.Calendar()
-        self.cal['version'] = '2.0'
-        self.cal['prodid'] = '-//TIKTAKTOK//PAPERLESS-ICAL//EN'
+        self.schedules = list(schedules)
+        self.early = early
+        self.fast = fast
+        self.free_times = {}
+        for free_time in free_times or []:
+            self.free_times[free_time.flight.id] = free_time
+        # Built on first use, an incremental update doesn't need it
+        self._cal = None
 
-        for schedule in schedules:
-            self.add_schedule(schedule)
 
+    @property
+    def cal(self):
+        if self._cal is None:
+            self._cal = icalendar.Calendar()
+            self._cal['version'] = '2.0'
+            self._cal['prodid'] = PRODID
 
-    def write_filename(self, path=absolute_filename('calendar.ics')):
-        with open(path, 'wb') as f:
-            self.write_file(f)
+            with instrument.span('calendar.events'):
+                for schedule in self.schedules:
+                    self._cal.add_component(self.event(schedule))
+        return self._cal
+
+
+    def write_filename(self, path=None, incremental=True):
+        """Writes the calendar to path (by default calendar.ics in DATA_DIR),
+        replacing the file atomically.
+
+        If incremental and the file exists, only the events which changed
+        since it was written are serialized again, see update()."""
+        path = path or absolute_filename('calendar.ics')
+        previous = None
+        if incremental:
+            try:
+                with open(path, 'rb') as f:
+                    previous = f.read()
+            except FileNotFoundError:
+                pass
+        if previous:
+            with instrument.span('calendar.update'):
+                data = self.update(previous)
+        elif self.fast:
+            # Serialized while being written
+            data = instrument.timed_iter('calendar.events', self.iter_ical())
+        else:
+            cal = self.cal
+            with instrument.span('calendar.to_ical'):
+                data = cal.to_ical()
+        with instrument.span('calendar.write'):
+            write_atomically(path, data, mode=0o644)
 
 
     def write_file(self, f):
-        f.write(self.cal.to_ical())
+        for data in self.iter_ical():
+            f.write(data)
+
+
+    def iter_ical(self):
+        """Yields the serialized calendar (bytes), an event at a time if
+        fast"""
+        if not self.fast:
+            yield self.cal.to_ical()
+            return
+        yield 'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:{}\r\n'.format(
+            fold(PRODID)).encode('utf-8')
+        for schedule in self.schedules:
+            yield self.event_ical(schedule)
+        yield b'END:VCALENDAR\r\n'
+
+
+    def update(self, previous, now=None):
+        """Returns the calendar previously serialized as previous (bytes)
+        updated with the current schedules.
+
+        Events are matched by UID. Unchanged events are copied as they were,
+        changed events, and cancelled events whose schedule is back, are
+        serialized again with an incremented SEQUENCE, and new events are
+        added. Events which are not in the schedules
+        anymore are cancelled, unless they already started: the website only
+        lists future schedules, so those are kept as history."""
+        if now is None:
+            now = datetime.datetime.now(datetime.timezone.utc)
+        header, blocks, footer = self.split_events(previous)
+        if not header.startswith(b'BEGIN:VCALENDAR'):
+            raise ValueError('Not a calendar')
+
+        events = {}
+        for schedule in self.schedules:
+            events[UID_PREFIX + schedule.id] = schedule
+
+        output = [header]
+        for block in blocks:
+            properties = self.read_properties(block)
+            uid = properties.get('UID', (None, None))[1]
+            sequence = int(properties.get('SEQUENCE', (None, '0'))[1])
+            cancelled = \
+                properties.get('STATUS', (None, None))[1] == 'CANCELLED'
+            if uid in events:
+                schedule = events.pop(uid)
+                if properties.get('X-PAPERLESS-HASH', (None, None))[1] \
+                   == self.fingerprint(schedule) and not cancelled:
+                    output.append(block)
+                else:
+                    output.append(self.event_ical(schedule, sequence + 1))
+            elif cancelled or self.has_started(properties, now):
+                output.append(block)
+            else:
+                event = icalendar.Event.from_ical(block)
+                for name in ['status', 'sequence']:
+                    if name in event:
+                        del event[name]
+                event.add('status', 'CANCELLED')
+                event.add('sequence', sequence + 1)
+                output.append(event.to_ical())
+
+        # New events, in the order of the schedules
+        for schedule in self.schedules:
+            if UID_PREFIX + schedule.id in events:
+                output.append(self.event_ical(schedule))
+
+        output.append(footer)
+        return b''.join(output)
+
+
+    def split_events(self, data):
+        """Splits serialized calendar data into what comes before the first
+        event, the events (one bytes object each, with line endings), and
+        what comes after the last event."""
+        lines = data.splitlines(keepends=True)
+        header = []
+        blocks = []
+        footer = []
+        block = None
+        for line in lines:
+            stripped = line.rstrip(b'\r\n')
+            if block is not None:
+                block.append(line)
+                if stripped == b'END:VEVENT':
+                    blocks.append(b''.join(block))
+                    block = None
+            elif stripped == b'BEGIN:VEVENT':
+                block = [line]
+                # Other components between events, e.g. time zones
+                header.extend(footer)
+                footer = []
+            elif blocks:
+                footer.append(line)
+            else:
+                header.append(line)
+        if block is not None:
+            raise ValueError('Unterminated event')
+        return b''.join(header), blocks, b''.join(footer)
+
+
+    def read_properties(self, block):
+        """Returns {name: (parameters, value)} of the top level properties
+        of a serialized event, without parsing the whole component."""
+        properties = {}
+        depth = 0
+        for line in block.decode('utf-8').replace('\r\n ', '')\
+                         .replace('\r\n\t', '').splitlines():
+            name_params, _, value = line.partition(':')
+            name, _, params = name_params.partition(';')
+            name = name.upper()
+            if name == 'BEGIN':
+                depth += 1
+            elif name == 'END':
+                depth -= 1
+            elif depth == 1 and name not in properties:
+                properties[name] = (params, value)
+        return properties
+
+
+    def has_started(self, properties, now):
+        params, value = properties.get('DTSTART', (None, None))
+        if value is None:
+            return False
+        tzid = None
+        for param in params.split(';'):
+            if param.upper().startswith('TZID='):
+                tzid = param[5:].strip('"')
+        start = icalendar.vDDDTypes.from_ical(value, timezone=tzid)
+        if not isinstance(start, datetime.datetime):
+            start = datetime.datetime.combine(start, datetime.time())
+        if start.tzinfo is None:
+            return start <= now.astimezone().replace(tzinfo=None)
+        return start <= now
 
 
     def add_schedule(self, schedule):
-        self.cal.add_component(self.event(schedule))
+        self.schedules.append(schedule)
+        if self._cal is not None:
+            self._cal.add_component(self.event(schedule))
 
 
     def event(self, schedule):
+        early = self.early_start(schedule)
         event = icalendar.Event()
-        event.add('uid', 'PAPERLESS-ICAL-EVENT-' + schedule.id)
-        event.add('dtstart', schedule.start_dt)
+        event.add('uid', UID_PREFIX + schedule.id)
+        if early and self.early == EARLY_DTSTART:
+            event.add('dtstart', schedule.start_dt - early)
+        else:
+            event.add('dtstart', schedule.start_dt)
         event.add('dtend', schedule.end_dt)
         event.add('summary', self.summary(schedule))
         event.add('categories', self.categories(schedule), encode=0)
-        event.add('description', 'https://{}/'.format(self.fbo_url))
+        event.add('description', self.description(schedule))
         event.add('location', self.fbo_address)
         event.add('status', 'CONFIRMED')
+        if early and self.early == EARLY_ALARM:
+            alarm = icalendar.Alarm()
+            alarm.add('action', 'DISPLAY')
+            alarm.add('trigger', -early)
+            alarm.add('description', self.early_text(schedule, early))
+            event.add_component(alarm)
+        # Tells update() whether the event changed
+        event.add('x-paperless-hash', self.fingerprint(schedule))
+        instrument.count('events built')
 
         return event
 
 
+    def event_ical(self, schedule, sequence=None):
+        """Returns the serialized event of schedule (bytes)"""
+        if self.fast:
+            data = self.fast_event(schedule, sequence)
+            if data is not None:
+                return data
+        event = self.event(schedule)
+        if sequence is not None:
+            event.add('sequence', sequence)
+        return event.to_ical()
+
+
+    def fast_event(self, schedule, sequence=None):
+        """Same as event().to_ical(), written directly, with the properties
+        in the same order. Returns None if a time zone has no known TZID."""
+        early = self.early_start(schedule)
+        start_dt = schedule.start_dt
+        if early and self.early == EARLY_DTSTART:
+            start_dt = start_dt - early
+        dtstart = format_datetime('DTSTART', start_dt)
+        dtend = format_datetime('DTEND', schedule.end_dt)
+        if dtstart is None or dtend is None:
+            return None
+
+        lines = ['BEGIN:VEVENT',
+                 'SUMMARY:' + escape_text(self.summary(schedule)),
+                 dtstart, dtend,
+                 'UID:' + escape_text(UID_PREFIX + schedule.id)]
+        if sequence is not None:
+            lines.append('SEQUENCE:{}'.format(sequence))
+        lines.extend([
+            # Not escaped, as in event()
+            'CATEGORIES:' + self.categories(schedule),
+            'DESCRIPTION:' + escape_text(self.description(schedule)),
+            'LOCATION:' + escape_text(self.fbo_address),
+            'STATUS:CONFIRMED',
+            'X-PAPERLESS-HASH:' + self.fingerprint(schedule)])
+        if early and self.early == EARLY_ALARM:
+            lines.extend([
+                'BEGIN:VALARM',
+                'ACTION:DISPLAY',
+                'DESCRIPTION:' + escape_text(self.early_text(schedule,
+                                                             early)),
+                'TRIGGER:' + format_duration(-early),
+                'END:VALARM'])
+        lines.append('END:VEVENT\r\n')
+        instrument.count('events built')
+        return '\r\n'.join(fold(line) for line in lines).encode('utf-8')
+
+
+    def fingerprint(self, schedule):
+        """Hash of everything the event is made of"""
+        values = (schedule.id,
+                  schedule.start_dt.isoformat(),
+                  getattr(schedule.start_dt.tzinfo, 'zone', None),
+                  schedule.end_dt.isoformat(),
+                  getattr(schedule.end_dt.tzinfo, 'zone', None),
+                  self.summary(schedule), self.categories(schedule),
+                  self.description(schedule), self.fbo_address)
+        return hashlib.sha1(repr(values).encode('utf-8')).hexdigest()[:16]
+
+
     def summary(self, schedule):
         if self.is_flight(schedule):
             summary = 'Flight N{}'.format(schedule.tail_number)
@@ -68,18 +430,50 @@ class Calendar:
             return 'FLIGHT'
         else:
             return schedule.tail_number
-        
+
+
+    def description(self, schedule):
+        description = 'https://{}/'.format(self.fbo_url)
+        early = self.early_start(schedule)
+        if early:
+            description += '\n' + self.early_text(schedule, early)
+        return description
+
+
+    def early_start(self, schedule):
+        """Returns how much earlier the flight could start (timedelta), or
+        None"""
+        free_time = self.free_times.get(schedule.id)
+        if self.early is None or free_time is None:
+            return None
+        early = EARLY_MAX if free_time.free_time is None \
+                else min(free_time.free_time, EARLY_MAX)
+        if early < EARLY_MIN:
+            return None
+        return early
+
+
+    def early_text(self, schedule, early):
+        # Also tells update() that the event changed (see fingerprint())
+        free_from = (schedule.start_dt - early).strftime('%H:%M')
+        if self.early == EARLY_DTSTART:
+            return 'Booked from {}, aircraft free from {}'.format(
+                schedule.start_dt.strftime('%H:%M'), free_from)
+        return 'Aircraft free from {}'.format(free_from)
 
 
     def is_flight(self, schedule):
         return schedule.tail_number.startswith('N')
 
 
-    class Settings:
-        def __init__(self):
-            config = configparser.ConfigParser()
-            settings_file_path = absolute_filename('settings.ini')
-            config.read(settings_file_path)
-            self.principal_cfi = config['calendar']['principal_cfi']
-            self.fbo_url = config['calendar']['fbo_url']
-            self.fbo_address = config['calendar']['fbo_address']
+def write_calendar(schedules, path, principal_cfi=None, server=None,
+                   name=None):
+    """Writes the calendar of schedules to path, then publishes it as name
+    on server (a CalendarServer) if given. Written even without schedules,
+    to cancel the events of the last ones."""
+    calendar = Calendar(schedules, allow_empty=True)
+    if principal_cfi:
+        calendar.principal_cfi = principal_cfi
+    calendar.write_filename(path)
+    if server is not None:
+        server.publish_file(name, path)
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .core import absolute_filename, write_atomically
+from .schedule import GENERATED_ID_PREFIX, Schedule
+
+import collections
+import hashlib
+import json
+import os
+import re
+
+
+ADDED = 'added'
+REMOVED = 'removed'
+CHANGED = 'changed'
+
+
+def identity(schedule):
+    """What makes a schedule the same one from one scrape to the next: its
+    id on the website, or its aircraft and start for rows of aircraft pages,
+    whose ids are row numbers."""
+    if schedule.id is not None \
+       and not schedule.id.startswith(GENERATED_ID_PREFIX):
+        return schedule.id
+    return '{}@{}'.format(schedule.tail_number, schedule.start_dt.isoformat())
+
+
+class Change(collections.namedtuple('Change',
+                                    ['kind', 'old', 'new', 'fields'])):
+    """kind is ADDED (old is None), REMOVED (new is None) or CHANGED, with
+    the names of the fields which changed."""
+    __slots__ = ()
+
+    @property
+    def schedule(self):
+        return self.new if self.new is not None else self.old
+
+
+    @property
+    def moved(self):
+        return 'start_dt' in self.fields or 'end_dt' in self.fields
+
+
+    def __str__(self):
+        s = self.schedule
+        when = '{:%a %d %b %H:%M}-{:%H:%M}'.format(s.start_dt, s.end_dt)
+        if self.kind == CHANGED and self.moved:
+            return 'Moved: {} {:%a %d %b %H:%M}-{:%H:%M} -> {}'.format(
+                s.tail_number, self.old.start_dt, self.old.end_dt, when)
+        if self.kind == CHANGED:
+            return 'Changed ({}): {} {}'.format(', '.join(self.fields),
+                                                s.tail_number, when)
+        return '{}: {} {}'.format(self.kind.capitalize(), s.tail_number,
+                                  when)
+
+
+def diff(old, new):
+    """Returns the list of Change from the schedules old to the schedules new
+    (iterables), in linear time: added and changed ones in the order of new,
+    then removed ones in the order of old."""
+    old_by_identity = collections.OrderedDict(
+        (identity(s), s) for s in old)
+    changes = []
+    for s in new:
+        previous = old_by_identity.pop(identity(s), None)
+        if previous is None:
+            changes.append(Change(ADDED, None, s, ()))
+            continue
+        fields = tuple(field for field in Schedule.FIELDS
+                       if getattr(previous, field) != getattr(s, field)
+                       # Generated ids are row numbers
+                       and field != 'id')
+        if fields:
+            changes.append(Change(CHANGED, previous, s, fields))
+    for s in old_by_identity.values():
+        changes.append(Change(REMOVED, s, None, ()))
+    return changes
+
+
+class ChangeFeed:
+    """Changes of a list of schedules from one scrape to the next, even
+    across runs: the last snapshot is kept in DATA_DIR/changes/<name>.jsonl.
+
+    The first line of the snapshot holds a hash of the others, so when
+    nothing changed, update() only reads that line and writes nothing."""
+
+    def __init__(self, name, directory=None):
+        directory = directory or absolute_filename('changes')
+        os.makedirs(directory, exist_ok=True)
+        self.filename = os.path.join(
+            directory, re.sub(r'[^\w.-]', '_', name) + '.jsonl')
+
+
+    def update(self, schedules):
+        """Returns the changes since the last call (everything is ADDED the
+        first time), and remembers schedules for the next one."""
+        schedules = list(schedules)
+        lines = [json.dumps(s.to_dict(), separators=(',', ':'))
+                 for s in schedules]
+        digest = hashlib.sha1('\n'.join(lines).encode('utf-8')).hexdigest()
+        header, previous = self.read(digest)
+        if header is not None and header.get('hash') == digest:
+            return []
+        changes = diff(previous, schedules)
+        data = [json.dumps({'hash': digest, 'count': len(lines)})] + lines
+        write_atomically(self.filename,
+                         ('\n'.join(data) + '\n').encode('utf-8'))
+        return changes
+
+
+    def read(self, digest=None):
+        """Returns the header and the schedules of the snapshot, or (None,
+        []). The schedules are not read if the hash is digest."""
+        try:
+            with open(self.filename, encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                if header.get('hash') == digest:
+                    return header, []
+                return header, [Schedule.from_dict(json.loads(line))
+                                for line in f if line.strip()]
+        except FileNotFoundError:
+            return None, []
+        except ValueError:
+            # Damaged, start over
+            return None, []
+
+
+    def snapshot(self):
+        return self.read()[1]
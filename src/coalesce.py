@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import concurrent.futures
+import threading
+import time
+
+
+class Coalescer:
+    """Makes concurrent calls for the same key share one call, and reuses
+    its result for ttl seconds.
+
+    The first caller of get() for a key runs fetch(), callers arriving
+    while it runs wait for its result (or its exception) instead of
+    fetching again. Failures are not reused.
+
+    Counters: hits (fresh result reused), misses (fetch() called) and
+    coalesced (waited for a fetch() already running)."""
+
+    def __init__(self, ttl=60, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        # key: Future of the running fetch()
+        self.in_flight = {}
+        # key: (time fetched, result)
+        self.results = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+
+    def get(self, key, fetch):
+        with self.lock:
+            now = self.clock()
+            if key in self.results:
+                fetched_at, result = self.results[key]
+                if now - fetched_at < self.ttl:
+                    self.hits += 1
+                    return result
+                del self.results[key]
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                self.misses += 1
+                future = self.in_flight[key] = concurrent.futures.Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fetch()
+        except BaseException as e:
+            with self.lock:
+                del self.in_flight[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            del self.in_flight[key]
+            if self.ttl > 0:
+                self.results[key] = (self.clock(), result)
+        future.set_result(result)
+        return result
+
+
+    def forget(self, key=None):
+        """Drops the result kept for key, or all results"""
+        with self.lock:
+            if key is None:
+                self.results.clear()
+            else:
+                self.results.pop(key, None)
+
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'coalesced': self.coalesced}
@@ -3,11 +3,36 @@
 
 import os
 import pathlib
+import tempfile
 
 
 DATA_DIR = os.path.join(str(pathlib.Path.home()), '.paperless')
-if not os.path.exists(DATA_DIR):
-    os.makedirs(DATA_DIR)
+
 
 def absolute_filename(filename):
+    """Path of filename in DATA_DIR, which is created if needed (not at
+    import time, which must stay free of side effects)"""
+    os.makedirs(DATA_DIR, exist_ok=True)
     return os.path.join(DATA_DIR, filename)
+
+
+def write_atomically(filename, data, mode=0o600):
+    """Writes data (bytes, or an iterable of bytes, which is written as it
+    is produced) to filename, such that readers see either the old or the new
+    content, never a partly written file."""
+    fd, tmp_filename = tempfile.mkstemp(
+            dir=os.path.dirname(filename) or '.',
+            prefix='.' + os.path.basename(filename))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if isinstance(data, bytes):
+                f.write(data)
+            else:
+                f.writelines(data)
+        # mkstemp creates the file with mode 0600
+        if mode != 0o600:
+            os.chmod(tmp_filename, mode)
+        os.replace(tmp_filename, filename)
+    except:
+        os.remove(tmp_filename)
+        raise
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .core import absolute_filename
+from .availability import AircraftAvailability
+from .calendar import write_calendar
+from .schedule import Schedule
+
+import datetime
+import threading
+import traceback
+
+
+# (time until the next flight, seconds between polls), tightest first
+POLL_INTERVALS = [
+    (datetime.timedelta(hours=1), 60),
+    (datetime.timedelta(hours=3), 5 * 60),
+    (datetime.timedelta(hours=24), 15 * 60),
+    ]
+DEFAULT_POLL_INTERVAL = 30 * 60
+# Local hours during which nobody flies, and polls back off
+QUIET_HOURS = (22, 6)
+QUIET_POLL_INTERVAL = 60 * 60
+# After an error, wait this long, doubled after each failure in a row
+ERROR_POLL_INTERVAL = 60
+
+
+def poll_interval(now, next_flight_start=None, quiet_hours=QUIET_HOURS):
+    """Returns how many seconds to wait before polling again.
+
+    The closer the next flight, the more often. During quiet hours, polls
+    back off unless a flight is close."""
+    interval = DEFAULT_POLL_INTERVAL
+    if next_flight_start is not None:
+        for time_until, seconds in POLL_INTERVALS:
+            if next_flight_start - now < time_until:
+                interval = seconds
+                break
+    start_hour, end_hour = quiet_hours
+    if start_hour <= end_hour:
+        quiet = start_hour <= now.hour < end_hour
+    else:
+        # Past midnight, e.g. 22 to 6
+        quiet = start_hour <= now.hour or now.hour < end_hour
+    if quiet:
+        interval = max(interval, min(QUIET_POLL_INTERVAL, interval * 4))
+    return interval
+
+
+class Poller:
+    """Keeps a scraper (and its session) warm, and polls the website on an
+    adaptive timer, see poll_interval().
+
+    Each poll reads the user's schedules and the schedule of the aircraft
+    of the next flight. The calendar file is only written, and the
+    availability only reported, when they changed.
+
+    Given a server.CalendarServer, the calendar is also served by it, as
+    name (by default the username), and republished only when it changed:
+    polls keep it up to date in the background of the requests."""
+
+    def __init__(self, scraper, calendar_path=None, output=print,
+                 change_feed=None, server=None, name=None):
+        self.scraper = scraper
+        self.calendar_path = calendar_path or absolute_filename('calendar.ics')
+        self.output = output
+        # Optional changes.ChangeFeed, each change of the schedules is output
+        self.change_feed = change_feed
+        self.server = server
+        self.name = name
+        self.stopped = threading.Event()
+        self.last_schedules = None
+        self.last_availability = None
+        self.calendar_writes = 0
+        self.errors_in_a_row = 0
+
+
+    def now(self):
+        return datetime.datetime.now(self.scraper.timezone)
+
+
+    def run(self):
+        """Polls until stop() is called"""
+        while not self.stopped.is_set():
+            try:
+                interval = self.poll()
+                self.errors_in_a_row = 0
+            except Exception:
+                self.errors_in_a_row += 1
+                interval = min(ERROR_POLL_INTERVAL
+                               * 2 ** (self.errors_in_a_row - 1),
+                               DEFAULT_POLL_INTERVAL)
+                self.output('Poll failed, retrying in {} s\n{}'.format(
+                    interval, traceback.format_exc()))
+            self.stopped.wait(interval)
+
+
+    def stop(self):
+        self.stopped.set()
+
+
+    def poll(self):
+        """Polls once, returns the number of seconds until the next poll"""
+        now = self.now()
+        schedules = self.scraper.my_schedules()
+
+        state = [tuple(getattr(s, field) for field in Schedule.FIELDS)
+                 for s in schedules]
+        if state != self.last_schedules:
+            name = self.name
+            if name is None and self.server is not None:
+                # Only needed to publish
+                name = self.scraper.username
+            write_calendar(schedules, self.calendar_path, server=self.server,
+                           name=name)
+            self.calendar_writes += 1
+            self.last_schedules = state
+            self.output('{} schedules, calendar updated'.format(
+                len(schedules)))
+            if self.change_feed is not None:
+                for change in self.change_feed.update(schedules):
+                    self.output(str(change))
+
+        next_flight = None
+        for schedule in schedules:
+            if schedule.end_dt > now:
+                next_flight = schedule
+                break
+
+        if next_flight is not None:
+            # Only bookings before the flight matter
+            aircraft = AircraftAvailability(self.scraper.aircraft_schedules(
+                next_flight.tail_number, until=next_flight.start_dt))
+            available = aircraft.is_free_before(next_flight.start_dt)
+            availability = (next_flight.id, available)
+            if availability != self.last_availability:
+                self.last_availability = availability
+                self.output('Aircraft {} before next flight ({})'.format(
+                    'AVAILABLE' if available else 'BUSY',
+                    next_flight.start_dt.strftime('%Y-%m-%d %H:%M')))
+
+        return poll_interval(now, next_flight.start_dt if next_flight
+                                  else None)
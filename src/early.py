@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import collections
+import heapq
+import operator
+
+
+class FreeTime(collections.namedtuple('FreeTime',
+                                      ['flight', 'free_since', 'free_time'])):
+    """How long the aircraft of flight is free right before it: since
+    free_since, for free_time (timedelta). Both are None if the aircraft
+    isn't booked at any time before the flight."""
+    __slots__ = ()
+
+    def is_free_for(self, duration):
+        return self.free_time is None or self.free_time >= duration
+
+
+def free_time_before_flights(flights, schedules_by_tail_number):
+    """Returns a FreeTime for each of flights, in the same order.
+
+    schedules_by_tail_number are the schedules of the aircraft (tail
+    numbers as in the flights), e.g. from Scraper.aircraft_schedules_many().
+    The flights are bookings too, they don't need to be on the aircraft
+    pages.
+
+    For each aircraft, its flights and its schedules are walked once
+    together in chronological order, keeping the latest end so far, so the
+    whole check is linear once sorted (and the website lists them sorted
+    already, which sorted() handles in linear time)."""
+    flights = list(flights)
+    flights_by_tail_number = collections.defaultdict(list)
+    for flight in flights:
+        flights_by_tail_number[flight.tail_number].append(flight)
+
+    by_flight = {}
+    start = operator.attrgetter('start_dt')
+    for tail_number, tail_flights in flights_by_tail_number.items():
+        # At the same start, a flight comes before other schedules: it is
+        # only free before it if the aircraft is free until it starts
+        walk = heapq.merge(
+            ((f.start_dt, 0, f) for f in sorted(tail_flights, key=start)),
+            ((s.start_dt, 1, s) for s in sorted(
+                schedules_by_tail_number.get(tail_number, ()), key=start)),
+            key=operator.itemgetter(0, 1))
+        busy_until = None
+        for start_dt, is_other, schedule in walk:
+            if not is_other:
+                if busy_until is None:
+                    by_flight[id(schedule)] = FreeTime(schedule, None, None)
+                else:
+                    since = min(busy_until, start_dt)
+                    by_flight[id(schedule)] = FreeTime(schedule, since,
+                                                       start_dt - since)
+            if busy_until is None or schedule.end_dt > busy_until:
+                busy_until = schedule.end_dt
+    return [by_flight[id(flight)] for flight in flights]
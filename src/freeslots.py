@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .schedule import canonicalize_tail_number
+
+import collections
+import datetime
+import numpy as np
+
+
+class FreeSlot(collections.namedtuple('FreeSlot',
+                                      ['tail_number', 'start_dt', 'end_dt'])):
+    __slots__ = ()
+
+    @property
+    def duration(self):
+        return self.end_dt - self.start_dt
+
+
+class FleetBusyTimes:
+    """Busy times of a whole fleet as NumPy arrays, to find free slots of all
+    aircraft at once.
+
+    Building this converts every schedule once; free_slots() can then be
+    called for any number of windows without touching Python objects
+    again."""
+
+    ORDERS = ('duration', 'start')
+
+    def __init__(self, schedules_by_tail_number):
+        self.tail_numbers = []
+        groups = []
+        starts = []
+        ends = []
+        for tail_number, schedules in schedules_by_tail_number.items():
+            tail_number = canonicalize_tail_number(tail_number)
+            if tail_number in self.tail_numbers:
+                group = self.tail_numbers.index(tail_number)
+            else:
+                group = len(self.tail_numbers)
+                self.tail_numbers.append(tail_number)
+            for s in schedules:
+                groups.append(group)
+                starts.append(s.start_dt.timestamp())
+                ends.append(s.end_dt.timestamp())
+        self.groups = np.array(groups, dtype=np.int64)
+        # Seconds since the epoch
+        self.starts = np.array(starts, dtype=np.float64)
+        self.ends = np.array(ends, dtype=np.float64)
+
+
+    def free_slots(self, window_start, window_end, min_duration,
+                   order_by='duration', limit=None):
+        """Returns the list of FreeSlot of at least min_duration (timedelta)
+        between window_start and window_end, for every aircraft.
+
+        Slots are sorted by decreasing duration or by start time (order_by),
+        then by tail number. Only the first limit slots are returned if
+        limit is given."""
+        groups, starts, ends = self.gaps(window_start, window_end,
+                                         min_duration, order_by)
+        return [FreeSlot(self.tail_numbers[group],
+                         self.from_timestamp(start, window_start),
+                         self.from_timestamp(end, window_start))
+                for group, start, end in zip(groups[:limit].tolist(),
+                                             starts[:limit].tolist(),
+                                             ends[:limit].tolist())]
+
+
+    def gaps(self, window_start, window_end, min_duration,
+             order_by='duration'):
+        """Same as free_slots(), as arrays: index in tail_numbers, start and
+        end (seconds since the epoch) of each slot.
+
+        Turning slots into Python objects takes longer than finding them,
+        use this for large numbers of slots."""
+        if order_by not in self.ORDERS:
+            raise ValueError('order_by must be one of {}'.format(self.ORDERS))
+        window = window_end.timestamp() - window_start.timestamp()
+        if window <= 0:
+            empty = np.array([])
+            return empty.astype(np.int64), empty, empty
+
+        # Relative to the window, and cut to it
+        starts = self.starts - window_start.timestamp()
+        ends = self.ends - window_start.timestamp()
+        inside = (ends > 0) & (starts < window)
+        groups = self.groups[inside]
+        starts = np.clip(starts[inside], 0, window)
+        ends = np.clip(ends[inside], 0, window)
+
+        order = np.lexsort((starts, groups))
+        groups = groups[order]
+        starts = starts[order]
+        ends = ends[order]
+
+        # Latest end so far within each aircraft: groups are sorted, so
+        # shifting each one above the previous ones keeps the running
+        # maximum from leaking from one aircraft to the next.
+        offsets = groups * (window + 1)
+        busy_until = np.maximum.accumulate(ends + offsets) - offsets
+
+        n = len(groups)
+        first = np.ones(n, dtype=bool)
+        first[1:] = groups[1:] != groups[:-1]
+        last = np.ones(n, dtype=bool)
+        last[:-1] = first[1:]
+
+        # Between bookings of the same aircraft, before its first booking,
+        # and after its last booking
+        same = ~first[1:]
+        gap_groups = [groups[1:][same], groups[first], groups[last]]
+        gap_starts = [busy_until[:-1][same], np.zeros(first.sum()),
+                      busy_until[last]]
+        gap_ends = [starts[1:][same], starts[first],
+                    np.full(last.sum(), window)]
+        # Aircraft without any booking in the window
+        idle = np.setdiff1d(np.arange(len(self.tail_numbers)), groups)
+        gap_groups.append(idle)
+        gap_starts.append(np.zeros(len(idle)))
+        gap_ends.append(np.full(len(idle), window))
+
+        gap_groups = np.concatenate(gap_groups)
+        gap_starts = np.concatenate(gap_starts)
+        gap_ends = np.concatenate(gap_ends)
+        durations = gap_ends - gap_starts
+        keep = (durations >= min_duration.total_seconds()) & (durations > 0)
+        gap_groups = gap_groups[keep]
+        gap_starts = gap_starts[keep]
+        gap_ends = gap_ends[keep]
+        durations = durations[keep]
+
+        tail_number_ranks = np.argsort(np.argsort(self.tail_numbers))
+        tail_number_ranks = tail_number_ranks[gap_groups] \
+                            if len(gap_groups) else gap_groups
+        if order_by == 'duration':
+            order = np.lexsort((gap_starts, tail_number_ranks, -durations))
+        else:
+            order = np.lexsort((tail_number_ranks, gap_starts))
+
+        origin = window_start.timestamp()
+        return (gap_groups[order], gap_starts[order] + origin,
+                gap_ends[order] + origin)
+
+
+    def from_timestamp(self, timestamp, like):
+        """datetime for timestamp, in the time zone of like"""
+        # Rounded to the microsecond, floats are not exact
+        timestamp = round(timestamp, 6)
+        if like.tzinfo is None:
+            return datetime.datetime.fromtimestamp(timestamp)
+        return datetime.datetime.fromtimestamp(timestamp, like.tzinfo)
+
+
+def find_free_slots(schedules_by_tail_number, window_start, window_end,
+                    min_duration, order_by='duration'):
+    """Shortcut for FleetBusyTimes(...).free_slots(...)"""
+    return FleetBusyTimes(schedules_by_tail_number).free_slots(
+        window_start, window_end, min_duration, order_by)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Timing spans and counters for the scrape to ICS pipeline.
+
+Disabled by default: span() then returns a shared object doing nothing and
+count() returns after one test, so instrumented code runs at full speed.
+
+    instrument.enable()
+    with instrument.span('fetch'):
+        ...
+    instrument.count('bytes downloaded', len(data))
+    print(instrument.summary())
+"""
+
+import collections
+import contextlib
+import sys
+import threading
+import time
+
+
+ENABLED = False
+
+_lock = threading.Lock()
+# name: [calls, seconds]
+_spans = collections.OrderedDict()
+_counters = collections.OrderedDict()
+# name: function returning the current value
+_gauges = collections.OrderedDict()
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def record(name, seconds, calls=1):
+    with _lock:
+        span = _spans.setdefault(name, [0, 0.0])
+        span[0] += calls
+        span[1] += seconds
+
+
+def gauge(name, function):
+    """Adds function() to the summary, for values the code keeps anyway,
+    e.g. cache statistics"""
+    _gauges[name] = function
+
+
+def count(name, n=1):
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        record(self.name, time.perf_counter() - self.start)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """Context manager timing its block under name"""
+    if not ENABLED:
+        return _NO_SPAN
+    return _Span(name)
+
+
+def timed_iter(name, iterable, counter=None):
+    """Returns iterable, timing under name only the time spent producing
+    its items, for generators which do their work lazily. The number of
+    items is added to counter, if given."""
+    if not ENABLED:
+        return iterable
+    return _timed_iter(name, iterable, counter)
+
+
+def _timed_iter(name, iterable, counter):
+    iterator = iter(iterable)
+    seconds = 0.0
+    items = 0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                seconds += time.perf_counter() - start
+            items += 1
+            yield item
+    finally:
+        record(name, seconds)
+        if counter is not None:
+            count(counter, items)
+
+
+def spans():
+    """Returns {name: (calls, seconds)}"""
+    with _lock:
+        return collections.OrderedDict(
+            (name, tuple(span)) for name, span in _spans.items())
+
+
+def counters():
+    with _lock:
+        return collections.OrderedDict(_counters)
+
+
+def summary():
+    """Returns a table of the spans and counters, as text"""
+    lines = ['{:<28} {:>7} {:>10} {:>10}'.format('stage', 'calls',
+                                                 'total ms', 'mean ms')]
+    for name, (calls, seconds) in spans().items():
+        lines.append('{:<28} {:>7} {:>10.1f} {:>10.2f}'.format(
+            name, calls, seconds * 1000, seconds * 1000 / calls))
+    for name, value in counters().items():
+        lines.append('{:<28} {:>7}'.format(name, value))
+    for name, function in _gauges.items():
+        lines.append('{:<28} {:>7}'.format(name, function()))
+    return '\n'.join(lines)
+
+
+@contextlib.contextmanager
+def profiling(filename, out=sys.stderr):
+    """Enables instrumentation and cProfile for the block, then writes the
+    profile to filename (see pstats) and the summary to out."""
+    # Only needed here, kept out of the import of every script
+    import cProfile
+    import pstats
+    reset()
+    enable()
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield profile
+    finally:
+        profile.disable()
+        disable()
+        profile.dump_stats(filename)
+        print(summary(), file=out)
+        print('\nTop functions (cumulative), full profile in {}:'.format(
+            filename), file=out)
+        pstats.Stats(profile, stream=out).sort_stats('cumulative')\
+            .print_stats(15)
+
+
+def run(function, profile=None):
+    """Returns function(), run under profiling(profile) if a filename is
+    given, e.g. from a --profile option."""
+    if not profile:
+        return function()
+    with profiling(profile):
+        return function()
@@ -1,14 +1,33 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import datetime
+import functools
+import pytz
+
+
+# Rows of aircraft pages have no id on the website, the scraper makes one up
+# from the row number
+GENERATED_ID_PREFIX = 'ACFT_SCHED_'
+
+
+def canonicalize_tail_number(tail_number):
+    """Returns the tail number without the N prefix, as the website has it"""
+    if tail_number.startswith('N'):
+        tail_number = tail_number[1:]
+    return tail_number
+
+
+@functools.total_ordering
 class Schedule:
-    id = None
-    tail_number = None
-    start_dt = None
-    end_dt = None
-    pilot = None
-    cfi = None
-    note = None
+    """A reservation of an aircraft (or ground instruction).
+
+    Schedules are equal, hashed and ordered by (tail number, start, end).
+    Don't modify a schedule while it is in a set or used as a dict key."""
+
+    # No per-instance __dict__, we keep a lot of these around
+    __slots__ = ('id', 'tail_number', 'start_dt', 'end_dt', 'pilot', 'cfi',
+                 'note')
 
     def __init__(self, id_=None, tail_number=None, start_dt=None, end_dt=None, 
                  pilot=None, cfi=None, note=None):
@@ -20,6 +39,22 @@ class Schedule:
         self.cfi = cfi
         self.note = note
 
+    def key(self):
+        return (self.tail_number, self.start_dt, self.end_dt)
+
+    def __eq__(self, other):
+        if not isinstance(other, Schedule):
+            return NotImplemented
+        return self.key() == other.key()
+
+    def __lt__(self, other):
+        if not isinstance(other, Schedule):
+            return NotImplemented
+        return self.key() < other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
     def __repr__(self):
         return repr('Schedule(%s,%s,%s,%s,%s,%s,%s)' % (
             repr(self.id),
@@ -30,3 +65,34 @@ class Schedule:
             repr(self.cfi),
             repr(self.note)
             ))
+
+    FIELDS = __slots__
+
+    def to_dict(self):
+        """Returns the schedule as a dict of JSON serializable values"""
+        d = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if isinstance(value, datetime.datetime):
+                value = {
+                    'iso': value.isoformat(),
+                    'tz': getattr(value.tzinfo, 'zone', None),
+                    }
+            d[field] = value
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        """Inverse of to_dict()"""
+        s = cls()
+        for field in cls.FIELDS:
+            value = d.get(field)
+            if isinstance(value, dict):
+                dt = datetime.datetime.fromisoformat(value['iso'])
+                if value['tz']:
+                    # The UTC offset was stored, so this is exact even when
+                    # the local time is ambiguous
+                    dt = dt.astimezone(pytz.timezone(value['tz']))
+                value = dt
+            setattr(s, field, value)
+        return s
@@ -1,64 +1,371 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from bs4 import BeautifulSoup
-import configparser
+from bs4 import BeautifulSoup, Tag
+import concurrent.futures
 import datetime
+import functools
+import io
+import json
+from lxml import etree
+import os
 import pdb
-import pickle
 import pytz
-import requests
+import re
+import threading
+import time
 
-from . import absolute_filename, Schedule
+from . import instrument, settings
+from .core import absolute_filename, write_atomically
+from .availability import AircraftAvailability, FleetAvailability
+from .cache import PageCache
+from .early import free_time_before_flights
+from .schedule import (GENERATED_ID_PREFIX, Schedule,
+                       canonicalize_tail_number)
+from .transport import Transport
 
 
 BS_PARSER='lxml'
+TABLE_ID = 'ctl00_ContentPlaceHolder1_GridView1'
+
+# The server forgets idle sessions after this many seconds (ASP.NET default)
+SESSION_LIFETIME = 20 * 60
 
 
 class CookieManager: 
-    def __init__(self, filename):
+    """Keeps the session cookies of one user between runs.
+
+    Cookies are stored as JSON in a file only readable by its owner, together
+    with the time the session was last used, so that a session the server
+    has certainly forgotten is not even tried."""
+
+    # Don't rewrite the file on every page fetched
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, filename, lifetime=SESSION_LIFETIME):
         self.filename = filename
+        self.lifetime = lifetime
+        self.last_saved = None
 
     def save(self, session):
-        with open(self.filename, 'wb') as f:
-            pickle.dump(session.cookies, f)
+        data = {
+            'last_used': time.time(),
+            'cookies': [{
+                'name': c.name,
+                'value': c.value,
+                'domain': c.domain,
+                'path': c.path,
+                'expires': c.expires,
+                'secure': c.secure,
+                } for c in session.cookies]
+            }
+        write_atomically(self.filename, json.dumps(data).encode('utf-8'))
+        self.last_saved = data['last_used']
 
     def load(self, session):
-        with open(self.filename, 'rb') as f:
-            session.cookies.update(pickle.load(f))
+        """Adds the stored cookies to the session.
+
+        Returns False if there are none or if they are too old to still be
+        valid on the server."""
+        try:
+            with open(self.filename, 'r') as f:
+                data = json.load(f)
+            last_used = data['last_used']
+            cookies = data['cookies']
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        if time.time() - last_used > self.lifetime:
+            return False
+        for c in cookies:
+            if c['expires'] is not None and c['expires'] < time.time():
+                continue
+            session.cookies.set(c['name'], c['value'], domain=c['domain'],
+                                path=c['path'], expires=c['expires'],
+                                secure=c['secure'])
+        self.last_saved = last_used
+        return True
+
+    def touch(self, session):
+        """Records that the session was just used, which extends its life on
+        the server."""
+        if self.last_saved is None \
+           or time.time() - self.last_saved > self.TOUCH_INTERVAL:
+            self.save(session)
+
+    def forget(self):
+        self.last_saved = None
+        try:
+            os.remove(self.filename)
+        except FileNotFoundError:
+            pass
+
+
+class SoupParser:
+    """Reads pages with BeautifulSoup, which builds a tree for the whole page
+    before anything can be looked up."""
+
+    def hidden_inputs(self, html):
+        soup = BeautifulSoup(html, BS_PARSER)
+        inputs = soup.select('input[type=hidden]')
+        d = {}
+        for input_ in inputs:
+            d[input_['name']] = input_['value']
+        return d
+
+
+    def table_rows(self, html, table_id, start_idx, end_idx):
+        """Yields the text of cells start_idx to end_idx (inclusive) of each
+        row of the table, indices being those of BeautifulSoup's contents
+        (None for the strings between cells)."""
+        return self.soup_table_rows(BeautifulSoup(html, BS_PARSER), table_id,
+                                    start_idx, end_idx)
+
+
+    def soup_table_rows(self, soup, table_id, start_idx, end_idx):
+        """Same as table_rows(), from a page already parsed"""
+        for tr in soup.select('#' + table_id)[0].contents[2:-1]:
+            row = []
+            for c in tr.contents[start_idx:end_idx+1]:
+                v = None
+                # Strings between cells (and comments) have a text too in
+                # recent versions of BeautifulSoup, not in older ones
+                if isinstance(c, Tag):
+                    v = c.text
+                row.append(v)
+            yield row
+
+
+class LxmlParser:
+    """Reads pages with lxml directly. Parsing stops as soon as the table has
+    been read, and no tree is built for the rest of the page.
+
+    Text and children are read the way BeautifulSoup presents them, so
+    results are the same as SoupParser's. If the table can't be found, this
+    falls back to SoupParser."""
+
+    # BeautifulSoup replaces strings made only of these by one character
+    ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+    def hidden_inputs(self, html):
+        d = {}
+        for _, input_ in self.iterparse(html, 'input'):
+            if input_.get('type', '').lower() == 'hidden':
+                d[input_.attrib['name']] = input_.attrib['value']
+        return d
+
+
+    def table_rows(self, html, table_id, start_idx, end_idx):
+        table = None
+        for _, element in self.iterparse(html, 'table'):
+            if element.get('id') == table_id:
+                table = element
+                break
+        if table is None:
+            yield from SoupParser().table_rows(html, table_id,
+                                               start_idx, end_idx)
+            return
+
+        for tr in self.contents(table)[2:-1]:
+            yield [self.text(c) 
+                   for c in self.contents(tr)[start_idx:end_idx+1]]
+
+
+    def iterparse(self, html, tag):
+        return etree.iterparse(io.BytesIO(html.encode('utf-8')),
+                               events=('end',), tag=tag, html=True,
+                               encoding='utf-8')
+
+
+    def contents(self, element):
+        """Same as BeautifulSoup's Tag.contents: child elements and the
+        strings between them"""
+        if not isinstance(element.tag, str):
+            # Comments and processing instructions have no children
+            raise AttributeError('contents')
+        contents = []
+        if element.text:
+            contents.append(self.collapse(element.text))
+        for child in element:
+            contents.append(child)
+            if child.tail:
+                contents.append(self.collapse(child.tail))
+        return contents
+
+
+    def text(self, item):
+        # None for strings and comments, as SoupParser
+        if isinstance(item, str) or not isinstance(item.tag, str):
+            return None
+        return ''.join(self.collapse(t) for t in item.itertext())
+
+
+    def collapse(self, text):
+        if text.strip(self.ASCII_SPACES):
+            return text
+        return '\n' if '\n' in text else ' '
+
+
+# strptime is slow, and schedule pages repeat the same dates and times over
+# and over. The formats used by the website are parsed with regular
+# expressions made of the same parts as strptime's, so that they accept
+# exactly the same strings. Anything else goes to strptime.
+_DT_PARTS = {
+    'm': r'(1[0-2]|0[1-9]|[1-9])',
+    'd': r'(3[01]|[12]\d|0[1-9]|[1-9]| [1-9])',
+    'Y': r'(\d\d\d\d)',
+    'y': r'(\d\d)',
+    'H': r'(2[0-3]|[0-1]\d|\d)',
+    'I': r'(1[0-2]|0[1-9]|[1-9])',
+    'M': r'([0-5]\d|\d)',
+    'S': r'(6[0-1]|[0-5]\d|\d)',
+    'p': r'(am|pm)',
+    }
+
+
+def _dt_regex(parts):
+    return re.compile(parts.format(**_DT_PARTS) + r'\Z', re.IGNORECASE)
+
+
+def _from_12hr(m, d, Y, I, M, S, p):
+    hour = int(I) % 12
+    if p.lower() == 'pm':
+        hour += 12
+    return datetime.datetime(int(Y), int(m), int(d), hour, int(M), int(S))
+
+
+def _from_24hr(m, d, y, H, M):
+    year = int(y)
+    # Same pivot as strptime
+    year += 2000 if year <= 68 else 1900
+    return datetime.datetime(year, int(m), int(d), int(H), int(M))
+
+
+FAST_DT_FORMATS = {
+    '%m/%d/%Y %I:%M:%S %p': (
+        _dt_regex(r'{m}/{d}/{Y}\s+{I}:{M}:{S}\s+{p}'), _from_12hr),
+    '%m/%d/%y %H:%M': (
+        _dt_regex(r'{m}/{d}/{y}\s+{H}:{M}'), _from_24hr),
+    }
+
+DT_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=DT_CACHE_SIZE)
+def parse_dt(text, dt_format, timezone=None):
+    """Same as datetime.strptime(text, dt_format), localized with timezone
+    (pytz) if given.
+
+    Results are remembered, so a given date and time is parsed and
+    localized once."""
+    naive = None
+    if dt_format in FAST_DT_FORMATS:
+        regex, from_groups = FAST_DT_FORMATS[dt_format]
+        match = regex.match(text)
+        if match:
+            try:
+                naive = from_groups(*match.groups())
+            except ValueError:
+                pass # e.g. February 30, let strptime raise the usual error
+    if naive is None:
+        naive = datetime.datetime.strptime(text, dt_format)
+    if timezone:
+        return timezone.localize(naive)
+    else:
+        return naive
+
+
+def in_window(schedules, since=None, until=None):
+    """Yields the schedules (in chronological order) overlapping [since,
+    until), both optional. Stops at the first one starting at or after
+    until, so a lazily parsed page isn't read further."""
+    for schedule in schedules:
+        if until is not None and schedule.start_dt >= until:
+            return
+        if since is not None and schedule.end_dt <= since:
+            continue
+        yield schedule
+
+
+instrument.gauge('parse_dt cache hits', lambda: parse_dt.cache_info().hits)
+instrument.gauge('parse_dt cache misses',
+                 lambda: parse_dt.cache_info().misses)
 
 
 class Scraper:
     class Urls:
         def __init__(self, domain):
-            self.BASE_URL = 'https://' + domain
+            # A scheme may be given, e.g. for a local test server
+            if '://' in domain:
+                self.BASE_URL = domain.rstrip('/')
+            else:
+                self.BASE_URL = 'https://' + domain
             self.LOGIN_PAGE = self.BASE_URL + '/fcms1.aspx'
             self.MY_SCHEDULES = self.BASE_URL + '/mstr8.aspx'
             self.AIRCRAFT_SCHEDULES = self.BASE_URL + '/mstr7b.aspx'
 
 
+    class Settings:
+        """The [scraper] settings, kept for existing callers: use
+        settings.load().scraper()"""
+        def __init__(self):
+            scraper_settings = settings.load().scraper()
+            self.base_url = scraper_settings.base_url
+            self.username = scraper_settings.username
+            self.password = scraper_settings.password
+            self.timezone = scraper_settings.timezone
+
+
     is_logged_in = False
+    timezone = None
     DT_FORMAT_12HR = '%m/%d/%Y %I:%M:%S %p'
     DT_FORMAT_24HR = '%m/%d/%y %H:%M'
 
 
+    PARSERS = {
+        'lxml': LxmlParser,
+        'soup': SoupParser,
+        }
+
+
     def __init__(self, base_url=None, username=None, password=None, 
-                       timezone=None):
+                       timezone=None, parser='lxml', page_cache=None,
+                       rate_limiter=None, coalescer=None, transport=None,
+                       store=None):
         if not base_url or not username or not password:
             assert not base_url and not username and not password, \
                 'if one credential missing then all should be missing'
-            settings = self.Settings()
-            base_url = settings.base_url
-            username = settings.username
-            password = settings.password
-            if settings.timezone:
-                timezone = settings.timezone
+            scraper_settings = settings.load().scraper()
+            base_url = scraper_settings.base_url
+            username = scraper_settings.username
+            password = scraper_settings.password
+            if scraper_settings.timezone:
+                timezone = scraper_settings.timezone
         self.username = username
         self.password = password
         if timezone:
             self.timezone = pytz.timezone(timezone) 
         self.urls = self.Urls(base_url)
-        self.cookie_manager = CookieManager(absolute_filename('cookies.bin'))
+        # Name from PARSERS, or any object with the same methods
+        if isinstance(parser, str):
+            parser = self.PARSERS[parser]()
+        self.parser = parser
+        # Optional PageCache
+        self.page_cache = page_cache
+        # Optional object whose wait() is called before each request, e.g.
+        # an accounts.RateLimiter
+        self.rate_limiter = rate_limiter
+        # Optional coalesce.Coalescer for aircraft pages, may be shared by
+        # the scrapers of several users
+        self.coalescer = coalescer
+        # Pool, timeouts and retries of the HTTP connections
+        self.transport = transport or Transport()
+        # Optional store.ScheduleStore, keeping every schedule read
+        self.store = store
+        self.login_lock = threading.Lock()
+        # One cookie jar per user, so that several users can share DATA_DIR
+        self.cookie_manager = CookieManager(absolute_filename(
+            'cookies-{}.json'.format(
+                re.sub(r'[^\w.-]', '_', '{}@{}'.format(username, base_url)))))
 
 
     def log_in(self):
@@ -70,51 +377,127 @@ class Scraper:
 
         This usually doesn't this to be called from outside the module as
         fetch methods check the user is logged in before proceeding further."""
-        self.session = requests.Session()
-        # Load an empty login page before login
-        # to fetch hidden inputs to use in the form data
-        get_request = self.session.get(self.urls.LOGIN_PAGE)
-        form_data = {
-            'TextBox1': 'Please Log In',
-            'ButtLogin': 'Log In',
-            'txtUserName': self.username,
-            'txtPassword': self.password
-            }
-        # Add hidden input fields from earlier
-        form_data.update(self.extract_viewstate_from_login_page(get_request))
-        post_request = self.session.post(self.urls.LOGIN_PAGE, 
-                                         data = form_data,
-                                         allow_redirects=False)
-        self.is_logged_in = 'Location' in post_request.headers \
-                       and post_request.headers['Location'] == '/mstr7.aspx'
-        #if self.is_logged_in:
-            #self.cookie_manager.save(self.session)
-        return self.is_logged_in
+        with instrument.span('login'):
+            self.session = self.transport.session()
+            # Load an empty login page before login
+            # to fetch hidden inputs to use in the form data
+            self.throttle()
+            get_request = self.session.get(self.urls.LOGIN_PAGE,
+                                           timeout=self.transport.timeout)
+            form_data = {
+                'TextBox1': 'Please Log In',
+                'ButtLogin': 'Log In',
+                'txtUserName': self.username,
+                'txtPassword': self.password
+                }
+            # Add hidden input fields from earlier
+            form_data.update(
+                self.extract_viewstate_from_login_page(get_request))
+            self.throttle()
+            post_request = self.session.post(self.urls.LOGIN_PAGE, 
+                                             data = form_data,
+                                             allow_redirects=False,
+                                             timeout=self.transport.timeout)
+            self.is_logged_in = 'Location' in post_request.headers \
+                and post_request.headers['Location'] == '/mstr7.aspx'
+            if self.is_logged_in:
+                self.cookie_manager.save(self.session)
+            return self.is_logged_in
+
+
+    def resume_session(self):
+        """Reuses the session of a previous run if it may still be valid on
+        the server, logs in otherwise.
+
+        The stored session is not checked here: the first page fetched
+        with it is the check (see fetch()), so resuming a valid session
+        costs no request at all.
+
+        Returns True if the user is (probably) logged in."""
+        self.session = self.transport.session()
+        if self.cookie_manager.load(self.session):
+            self.is_logged_in = True
+            return True
+        return self.log_in()
+
+
+    def fetch(self, url, headers=None):
+        """GETs a page which is only available to logged in users.
+
+        If the server redirects to the login page because the session has
+        expired, logs in again and retries once.
+
+        Safe to call from several threads sharing this scraper."""
+        self.ensure_logged_in()
+        with instrument.span('fetch'):
+            session = self.session
+            self.throttle()
+            response = session.get(url, headers=headers,
+                                   allow_redirects=False,
+                                   timeout=self.transport.timeout)
+            if self.is_session_expired(response):
+                with self.login_lock:
+                    # Another thread may have logged in again in the meantime
+                    if self.session is session:
+                        self.cookie_manager.forget()
+                        self.log_in()
+                assert self.is_logged_in, "Could not log in"
+                session = self.session
+                self.throttle()
+                response = session.get(url, headers=headers,
+                                       allow_redirects=False,
+                                       timeout=self.transport.timeout)
+            self.cookie_manager.touch(session)
+        instrument.count('pages fetched')
+        if instrument.ENABLED:
+            instrument.count('bytes downloaded', len(response.content))
+        return response
+
+
+    def throttle(self):
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait()
+
+
+    def ensure_logged_in(self):
+        with self.login_lock:
+            if not self.is_logged_in:
+                self.resume_session()
+        assert self.is_logged_in, "Could not log in"
+
+
+    def is_session_expired(self, response):
+        # Schedule pages never redirect, except to send an anonymous user
+        # back to the login page.
+        return response.is_redirect
 
     def extract_viewstate_from_login_page(self, request):
-        soup = BeautifulSoup(request.text, BS_PARSER)
-        inputs = soup.select('input[type=hidden]')
-        d = {}
-        for input_ in inputs:
-            d[input_['name']] = input_['value']
-        return d
+        return self.parser.hidden_inputs(request.text)
 
 
-    def my_schedules(self):
+    def my_schedules(self, since=None, until=None):
         """Returns future schedules for logged in user in chronological order 
-        (near future to distant future)"""
-        if not self.is_logged_in:
-            self.log_in()
-        assert self.is_logged_in, "Could not log in"
+        (near future to distant future), only those overlapping [since,
+        until) if given (datetimes), see read_schedules()."""
+        return list(self.iter_my_schedules(since, until))
+
+
+    def iter_my_schedules(self, since=None, until=None):
+        """Same as my_schedules(), but schedules are yielded while the table
+        is being read, so a caller can stop as soon as it has what it needs.
+        The page is fetched before this returns."""
         # Fetch page "My Schedules"
-        request = self.session.get(self.urls.MY_SCHEDULES)
-        soup = BeautifulSoup(request.text, BS_PARSER)
+        return self.read_schedules(self.urls.MY_SCHEDULES,
+                                   self.parse_my_schedules,
+                                   owner=self.username, since=since,
+                                   until=until)
 
-        schedules = []
-        for tr in self.extract_table(soup, 2, 7):
+
+    def parse_my_schedules(self, html):
+        for tr in self.iter_table(html, 2, 7):
             s = Schedule()
             s.id = tr[0]
-            s.tail_number = self.canonicalize_tail_number(tr[1])
+            s.tail_number = canonicalize_tail_number(tr[1])
             s.start_dt = self.parse_dt_12hr(tr[2])
             s.end_dt = self.parse_dt_12hr(tr[3])
             s.pilot = tr[4]
@@ -122,37 +505,145 @@ class Scraper:
             # note = tr[6]
             #if note != '\xa0':
             #    s.note = note
-            schedules.append(s)
-        return schedules
+            yield s
 
 
     def my_next_flight(self):
         """Returns the next flight for the logged in user. 
         It is unknown whether the next flight might be ongoing."""
-        return self.my_schedules()[0]
+        for schedule in self.iter_my_schedules():
+            return schedule
+        raise IndexError('No future schedules')
 
 
-    def aircraft_schedules(self, tail_number):
+    def aircraft_schedules(self, tail_number, since=None, until=None):
         """Returns all flights for the given tail number (with or without
-        N prefix), including flights from other students."""
-        tail_number = self.canonicalize_tail_number(tail_number)
-        if not self.is_logged_in:
-            self.log_in()
-        assert self.is_logged_in, "Could not log in"
+        N prefix), including flights from other students, or only those
+        overlapping [since, until) if given (datetimes)."""
+        return list(self.iter_aircraft_schedules(tail_number, since, until))
+
+
+    def iter_aircraft_schedules(self, tail_number, since=None, until=None):
+        """Same as aircraft_schedules(), but schedules are yielded while the
+        table is being read. The page is fetched before this returns."""
+        tail_number = canonicalize_tail_number(tail_number)
 
         # Fetch page "aircraft schedule" (same as clicking on resource in
         # table header on the Resource schedules page)
-        request = self.session.get('{}?AC={}'.format(
-            self.urls.AIRCRAFT_SCHEDULES, tail_number))
-        soup = BeautifulSoup(request.text, BS_PARSER)
+        url = '{}?AC={}'.format(self.urls.AIRCRAFT_SCHEDULES, tail_number)
+        if self.coalescer is not None:
+            # The page is the same for every member, the list is shared
+            # with the other callers: don't modify its schedules. Members
+            # may want different windows, the whole page is shared.
+            return in_window(self.coalescer.get(url, lambda: list(
+                self.read_schedules(url, self.parse_aircraft_schedules,
+                                    tail_number=tail_number))), since, until)
+        return self.read_schedules(url, self.parse_aircraft_schedules,
+                                   tail_number=tail_number, since=since,
+                                   until=until)
+
+
+    def read_schedules(self, url, parse, owner=None, tail_number=None,
+                       since=None, until=None):
+        """Returns an iterator of the schedules read by parse(html) from the
+        page at url, through the page cache if any. The page is fetched
+        before this returns.
+
+        Only the schedules overlapping [since, until) are returned. The
+        website can't filter by date, the whole page is downloaded, but
+        rows are parsed only until one starts at or after until (pages are
+        in chronological order). The page cache still parses whole pages.
+
+        With a store, the window is read and saved first: these are all the
+        future schedules of owner, or of the aircraft tail_number, in the
+        window."""
+        now = datetime.datetime.now(self.timezone)
+        if self.page_cache:
+            schedules = in_window(self.cached_schedules(url, parse),
+                                  since, until)
+        else:
+            schedules = in_window(instrument.timed_iter(
+                'parse', parse(self.fetch(url).text), 'rows parsed'),
+                since, until)
+        if self.store is not None:
+            schedules = list(schedules)
+            with instrument.span('store'):
+                self.store.replace(schedules, max(now, since or now), owner,
+                                   tail_number, until)
+            schedules = iter(schedules)
+        return schedules
 
-        schedules = []
-        counter = 1
-        for tr in self.extract_table(soup, 1, 4):
+
+    def aircraft_schedules_many(self, tail_numbers, max_workers=8,
+                                since=None, until=None):
+        """Returns a dict of tail number (as given) to the schedules of that
+        aircraft, see aircraft_schedules().
+
+        Pages are fetched concurrently with the same session, at most
+        max_workers at a time. Each page is parsed by the thread which
+        downloaded it, while the other pages are still downloading."""
+        tail_numbers = list(tail_numbers)
+        # Log in once, before the threads need the session
+        self.ensure_logged_in()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+            futures = {}
+            for tail_number in tail_numbers:
+                canonical = canonicalize_tail_number(tail_number)
+                if canonical not in futures:
+                    futures[canonical] = executor.submit(
+                            self.aircraft_schedules, canonical, since, until)
+            return {tail_number: futures[
+                        canonicalize_tail_number(tail_number)].result()
+                    for tail_number in tail_numbers}
+
+
+    def fleet_availability(self, tail_numbers, max_workers=8):
+        """Returns a FleetAvailability for the given aircraft, which answers
+        availability questions about all of them without fetching again."""
+        return FleetAvailability(self.aircraft_schedules_many(tail_numbers,
+                                                              max_workers))
+
+
+    def free_slots(self, tail_numbers, min_duration, start=None, end=None,
+                   order_by='duration', max_workers=8):
+        """Returns the FreeSlot of at least min_duration (timedelta) of all
+        the given aircraft between start (default: now) and end (default:
+        7 days after start), longest first or by start time (order_by)."""
+        # Imports NumPy, which nothing else needs
+        from .freeslots import FleetBusyTimes
+        if start is None:
+            start = datetime.datetime.now(self.timezone)
+        if end is None:
+            end = start + datetime.timedelta(days=7)
+        busy_times = FleetBusyTimes(self.aircraft_schedules_many(
+            tail_numbers, max_workers, start, end))
+        return busy_times.free_slots(start, end, min_duration, order_by)
+
+
+    def free_time_before_my_flights(self, my_schedules=None, max_workers=8):
+        """Returns an early.FreeTime for each upcoming flight of the user
+        (from my_schedules if already fetched): for how long its aircraft
+        is free before it. Each aircraft page is fetched once, however many
+        flights are on that aircraft."""
+        if my_schedules is None:
+            my_schedules = self.my_schedules()
+        now = datetime.datetime.now(self.timezone)
+        flights = [s for s in my_schedules if s.start_dt > now]
+        tail_numbers = list(dict.fromkeys(f.tail_number for f in flights))
+        # Bookings after the last flight don't matter
+        until = max(f.start_dt for f in flights) if flights else None
+        return free_time_before_flights(
+            flights, self.aircraft_schedules_many(tail_numbers, max_workers,
+                                                  until=until))
+
+
+    def parse_aircraft_schedules(self, html):
+        for counter, tr in enumerate(self.iter_table(html, 1, 4), 1):
             s = Schedule()
-            s.tail_number = self.canonicalize_tail_number(tr[0])
-            s.id = 'ACFT_SCHED_{}_{}'.format(s.tail_number, counter)
-            counter = counter + 1
+            s.tail_number = canonicalize_tail_number(tr[0])
+            s.id = '{}{}_{}'.format(GENERATED_ID_PREFIX, s.tail_number,
+                                    counter)
             s.start_dt = self.parse_dt_24hr(tr[1]) 
             s.end_dt = self.parse_dt_24hr(tr[2]) 
             s.pilot = tr[3]
@@ -160,57 +651,80 @@ class Scraper:
                 s.cfi = tr[4]
             except:
                 pass
-            schedules.append(s)
-
+            yield s
+
+
+    def cached_schedules(self, url, parse):
+        """Returns the list of schedules read by parse(html) from the page at
+        url, from the page cache if the page didn't change."""
+        entry = self.page_cache.get(url, self.username)
+        if entry is not None and self.page_cache.is_fresh(entry):
+            return entry.schedules()
+
+        headers = entry.conditional_headers() if entry else None
+        response = self.fetch(url, headers)
+        if entry is not None and response.status_code == 304:
+            self.page_cache.revalidated(entry)
+            return entry.schedules()
+
+        content_hash = PageCache.content_hash(response.content)
+        if entry is not None and entry.hash == content_hash:
+            self.page_cache.revalidated(entry)
+            return entry.schedules()
+
+        schedules = list(instrument.timed_iter('parse', parse(response.text),
+                                               'rows parsed'))
+        self.page_cache.put(url, self.username, response, content_hash,
+                            schedules)
         return schedules
 
 
-    def extract_table(self, soup, start_idx, end_idx):
-        rows = []
-        # TODO replace with generator, i.e. 'yield'
-        for tr in soup.select('#ctl00_ContentPlaceHolder1_GridView1')[0]\
-                      .contents[2:-1]:
-            # TODO replace with list comprehension
-            row = []
-            for c in tr.contents[start_idx:end_idx+1]:
-                v = None
-                if c is not None:
-                    try:
-                        v = c.text
-                    except:
-                        pass
-                row.append(v)
-            rows.append(row)
-        return rows
+    def extract_table(self, html, start_idx, end_idx):
+        """Returns the rows of iter_table(). html may also be the page
+        parsed with BeautifulSoup, as extract_table() used to take."""
+        if isinstance(html, BeautifulSoup):
+            return list(SoupParser().soup_table_rows(html, TABLE_ID,
+                                                     start_idx, end_idx))
+        return list(self.iter_table(html, start_idx, end_idx))
+
+
+    def iter_table(self, html, start_idx, end_idx):
+        """Yields the text of cells start_idx to end_idx (inclusive) of each
+        row of the schedules table."""
+        return self.parser.table_rows(html, TABLE_ID, start_idx, end_idx)
 
 
     def is_aircraft_available_before_my_next_flight(self):
         next_flight = self.my_next_flight()
         tail_number = next_flight.tail_number
-        schedules = self.aircraft_schedules(tail_number)
+        # Reading the table stops at the next flight
+        schedules = self.iter_aircraft_schedules(tail_number,
+                                                 until=next_flight.end_dt)
         return self.is_aircraft_available_before_flight(next_flight, schedules)
     
 
     def is_aircraft_available_before_flight(self, flight, aircraft_schedules,
                                             at_least_minutes=15):
-        at_least_timedelta = datetime.timedelta(minutes=at_least_minutes)
-
-        # We are making the assumption flights are sorted chronologically
+        """Whether the aircraft is free for at least at_least_minutes right
+        before flight, according to aircraft_schedules, which must include
+        the flight. Answered by an AircraftAvailability: build a
+        FleetAvailability instead to ask about many flights.
 
+        aircraft_schedules are in chronological order, as on the aircraft
+        page, and aren't read further than the flight."""
+        schedules = []
         for s in aircraft_schedules:
-            # TODO consider equals() method on Schedule
+            schedules.append(s)
+            # Not s == flight: the aircraft page and the pilot's schedules
+            # don't write tail numbers the same way, and the start time is
+            # enough to find the flight.
             if s.start_dt == flight.start_dt:
                 assert s.pilot == flight.pilot
-                # if we get to the given flight, then there were no flights 
-                # before that, and the airplane is available.
-                return True
-            if flight.start_dt - s.end_dt < at_least_timedelta and \
-               (flight.start_dt - s.end_dt).total_seconds() >= 0:
-                # If a flight ends when the given flight starts, 
-                # then the airplane is not available.
-                return False
-
-        raise Exception('flight not found in aicraft schedule')
+                break
+        else:
+            raise ValueError('flight not found in aircraft schedules')
+        return AircraftAvailability(schedules).is_free_before(
+            flight.start_dt, at_least_minutes)
 
 
     def parse_dt_12hr(self, text):
@@ -222,32 +736,9 @@ class Scraper:
     
 
     def parse_dt(self, text, dt_format):
-        naive = datetime.datetime.strptime(text, dt_format)
-        if self.timezone:
-            return self.timezone.localize(naive)
-        else:
-            return naive
+        return parse_dt(text, dt_format, self.timezone)
 
     
     def canonicalize_tail_number(self, tail_number):
-        if tail_number.startswith('N'):
-            tail_number = tail_number[1:]
-        return tail_number
-
-
-
-
-    class Settings:
-
-        def __init__(self):
-            config = configparser.ConfigParser()
-            settings_file_path = absolute_filename('settings.ini')
-            config.read(settings_file_path)
-            self.base_url = config['scraper']['url']
-            self.username = config['scraper']['username']
-            self.password = config['scraper']['password']
-            self.timezone = config['scraper']['timezone']
-            if not self.base_url or not self.username or not self.password:
-                raise ValueError('Mandatory scraper settings missing'
-                                 ' or unredable')
-
+        """See schedule.canonicalize_tail_number()"""
+        return canonicalize_tail_number(tail_number)
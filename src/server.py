@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Serves calendars over HTTP, e.g. for Apple Calendar subscriptions.
+
+Calendars are rendered ahead of time (see CalendarServer.publish()), so a
+request never serializes anything: it gets the bytes kept in memory, or a
+304 Not Modified if the client already has them."""
+
+from . import instrument
+
+import collections
+import email.utils
+import gzip
+import hashlib
+import http.server
+import re
+import threading
+import time
+import urllib.parse
+
+
+RenderedCalendar = collections.namedtuple(
+    'RenderedCalendar', ['body', 'gzipped', 'etag', 'last_modified'])
+
+
+def render(data):
+    """Returns the RenderedCalendar of data (bytes of an ICS file)"""
+    # mtime=0: the same data always gives the same gzipped bytes
+    return RenderedCalendar(data, gzip.compress(data, 9, mtime=0),
+                            hashlib.sha256(data).hexdigest()[:32],
+                            time.time())
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header value allows gzip. An explicit
+    gzip entry wins over *, whatever their order."""
+    qualities = {}
+    for coding in (accept_encoding or '').split(','):
+        name, _, params = coding.partition(';')
+        match = re.search(r'q\s*=\s*([\d.]+)', params)
+        try:
+            quality = float(match.group(1)) if match else 1.0
+        except ValueError:
+            quality = 0.0
+        qualities[name.strip().lower()] = quality
+    quality = qualities.get('gzip', qualities.get('*', 0.0))
+    return quality > 0
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value matches etag (quoted). The
+    comparison is weak, as RFC 7232 requires for If-None-Match."""
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag in ('*', etag):
+            return True
+    return False
+
+
+class CalendarServer:
+    """HTTP server of the calendars published with publish(), each at
+    /<name>.ics.
+
+    Each calendar has a strong ETag per encoding (identity or gzip, the
+    gzipped body is compressed once, when published), so polling clients
+    sending If-None-Match get a 304 until the calendar changes.
+
+    Listens on localhost by default: calendars hold names of pilots and
+    instructors, put a reverse proxy with authentication in front of it to
+    serve them to the Internet."""
+
+    def __init__(self, host='127.0.0.1', port=0, max_age=300):
+        self.max_age = max_age
+        self.calendars = {}
+        self.lock = threading.Lock()
+        self.server = http.server.ThreadingHTTPServer((host, port),
+                                                      self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+
+    def start(self):
+        """Serves from a background thread, returns self"""
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+
+    def stop(self):
+        if self.thread is not None:
+            self.server.shutdown()
+            self.thread = None
+        self.server.server_close()
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+    def publish(self, name, data):
+        """Serves data (bytes of an ICS file) as the calendar name from now
+        on. Returns False, and changes nothing, if it is already served."""
+        etag = hashlib.sha256(data).hexdigest()[:32]
+        with self.lock:
+            current = self.calendars.get(name)
+            if current is not None and current.etag == etag:
+                return False
+        # Compressed outside of the lock, requests are served meanwhile
+        rendered = render(data)
+        with self.lock:
+            self.calendars[name] = rendered
+        instrument.count('calendars published')
+        return True
+
+
+    def publish_file(self, name, path):
+        """Same as publish(), with the content of the file at path"""
+        with open(path, 'rb') as f:
+            return self.publish(name, f.read())
+
+
+    def get(self, name):
+        """Returns the RenderedCalendar served as name, or None"""
+        with self.lock:
+            return self.calendars.get(name)
+
+
+    def handler_class(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self.respond(send_body=True)
+
+            def do_HEAD(self):
+                self.respond(send_body=False)
+
+            def respond(self, send_body):
+                path = urllib.parse.urlsplit(self.path).path
+                match = re.match(r'^/([^/]+)\.ics$', path)
+                calendar = server.get(urllib.parse.unquote(match.group(1))) \
+                           if match else None
+                if calendar is None:
+                    return self.send_error(404)
+
+                if accepts_gzip(self.headers.get('Accept-Encoding')):
+                    body = calendar.gzipped
+                    etag = '"{}-gzip"'.format(calendar.etag)
+                else:
+                    body = calendar.body
+                    etag = '"{}"'.format(calendar.etag)
+
+                if etag_matches(self.headers.get('If-None-Match', ''), etag):
+                    instrument.count('calendar requests not modified')
+                    self.send_response(304)
+                    self.send_common_headers(calendar, etag)
+                    self.end_headers()
+                    return
+
+                instrument.count('calendar requests')
+                self.send_response(200)
+                self.send_common_headers(calendar, etag)
+                self.send_header('Content-Type', 'text/calendar; charset=utf-8')
+                if body is calendar.gzipped:
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if send_body:
+                    self.wfile.write(body)
+
+            def send_common_headers(self, calendar, etag):
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', email.utils.formatdate(
+                    calendar.last_modified, usegmt=True))
+                self.send_header('Cache-Control',
+                                 'max-age={}'.format(server.max_age))
+                self.send_header('Vary', 'Accept-Encoding')
+
+        return Handler
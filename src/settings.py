@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""The settings file (settings.ini in DATA_DIR), shared by the scraper and
+the calendar. load() parses it once, and again only when it changes.
+
+Each option of SCHEMA can be overridden by an environment variable named
+PAPERLESS_<SECTION>_<OPTION>, e.g. PAPERLESS_SCRAPER_PASSWORD."""
+
+from .core import absolute_filename
+
+import collections
+import configparser
+import os
+import threading
+
+
+ENV_PREFIX = 'PAPERLESS_'
+
+# Section: {option: default}, None for mandatory options
+SCHEMA = collections.OrderedDict([
+    ('scraper', collections.OrderedDict([
+        ('url', None),
+        ('username', None),
+        ('password', None),
+        ('timezone', ''),
+        ])),
+    ('calendar', collections.OrderedDict([
+        ('principal_cfi', ''),
+        ('fbo_url', None),
+        ('fbo_address', ''),
+        ])),
+    ])
+
+ScraperSettings = collections.namedtuple(
+    'ScraperSettings', ['base_url', 'username', 'password', 'timezone'])
+
+CalendarSettings = collections.namedtuple(
+    'CalendarSettings', ['principal_cfi', 'fbo_url', 'fbo_address'])
+
+
+class SettingsError(ValueError):
+    """Raised with all the problems of the settings at once"""
+
+    def __init__(self, path, problems):
+        super().__init__('Invalid settings in {}: {}'.format(
+            path, '; '.join(problems)))
+        self.path = path
+        self.problems = problems
+
+
+def env_name(section, option):
+    return '{}{}_{}'.format(ENV_PREFIX, section, option).upper()
+
+
+class Settings:
+    """Settings read from a file and the environment. config is the
+    ConfigParser (e.g. for the [account:NAME] sections), scraper() and
+    calendar() return the typed sections."""
+
+    def __init__(self, path, environ=os.environ):
+        self.path = path
+        self.config = configparser.ConfigParser()
+        self.config.read(path)
+        for section, options in SCHEMA.items():
+            for option in options:
+                value = environ.get(env_name(section, option))
+                if value is None:
+                    continue
+                if not self.config.has_section(section):
+                    self.config.add_section(section)
+                # Taken as is, not interpolated
+                self.config.set(section, option, value.replace('%', '%%'))
+        self._sections = {}
+
+
+    def validate(self, *sections):
+        """Raises a SettingsError listing every problem of sections (by
+        default all of SCHEMA)"""
+        problems = []
+        for section in sections or SCHEMA:
+            problems.extend(self.problems(section))
+        if problems:
+            raise SettingsError(self.path, problems)
+
+
+    def problems(self, section):
+        problems = []
+        for option, default in SCHEMA[section].items():
+            value = self.get(section, option)
+            if value is None and default is None:
+                problems.append('[{}] {} is missing (or set {})'.format(
+                    section, option, env_name(section, option)))
+        if section == 'scraper' and self.get('scraper', 'timezone'):
+            import pytz
+            try:
+                pytz.timezone(self.get('scraper', 'timezone'))
+            except pytz.UnknownTimeZoneError:
+                problems.append('[scraper] timezone {!r} is unknown'.format(
+                    self.get('scraper', 'timezone')))
+        return problems
+
+
+    def get(self, section, option):
+        """Returns the value of option, its default if not mandatory, or
+        None"""
+        value = self.config.get(section, option, fallback=None)
+        if not value:
+            return SCHEMA[section][option]
+        return value
+
+
+    def section(self, section, factory):
+        if section not in self._sections:
+            self.validate(section)
+            self._sections[section] = factory(
+                *[self.get(section, option) for option in SCHEMA[section]])
+        return self._sections[section]
+
+
+    def scraper(self):
+        return self.section('scraper', ScraperSettings)
+
+
+    def calendar(self):
+        return self.section('calendar', CalendarSettings)
+
+
+_lock = threading.Lock()
+# path: (version, Settings)
+_cache = {}
+
+
+def load(path=None):
+    """Returns the Settings of path (by default settings.ini in DATA_DIR).
+
+    The same object is returned until the file (its mtime or size) or the
+    environment overrides change: then the file is parsed again."""
+    path = path or absolute_filename('settings.ini')
+    try:
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        version = None
+    version = (version, tuple(os.environ.get(env_name(section, option))
+                              for section, options in SCHEMA.items()
+                              for option in options))
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        settings = Settings(path)
+        _cache[path] = (version, settings)
+        return settings
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from .core import absolute_filename
+from .availability import FleetAvailability
+from .schedule import (GENERATED_ID_PREFIX, Schedule,
+                       canonicalize_tail_number)
+
+import calendar
+import datetime
+import pytz
+import sqlite3
+import threading
+import time
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS schedules (
+    id TEXT UNIQUE,             -- id on the website, if known
+    owner TEXT,                 -- user whose "My Schedules" listed it
+    tail_number TEXT NOT NULL,
+    start_ts INTEGER NOT NULL,  -- seconds since the epoch
+    end_ts INTEGER NOT NULL,
+    timezone TEXT,              -- NULL: naive datetimes, taken as UTC
+    pilot TEXT,
+    cfi TEXT,
+    note TEXT,
+    updated_at REAL NOT NULL,
+    UNIQUE (tail_number, start_ts)
+);
+CREATE INDEX IF NOT EXISTS schedules_start ON schedules (start_ts);
+CREATE INDEX IF NOT EXISTS schedules_pilot ON schedules (pilot, start_ts);
+CREATE INDEX IF NOT EXISTS schedules_cfi ON schedules (cfi, start_ts);
+CREATE INDEX IF NOT EXISTS schedules_owner ON schedules (owner, start_ts);
+'''
+# (tail_number, start_ts) is indexed by its UNIQUE constraint
+
+COLUMNS = ('id', 'owner', 'tail_number', 'start_ts', 'end_ts', 'timezone',
+           'pilot', 'cfi', 'note')
+
+
+class ScheduleStore:
+    """History of schedules in an SQLite database, so that past flights,
+    which the website doesn't list anymore, are kept, and so that reports
+    don't need the website.
+
+    A schedule is the same as a stored one if it has the same website id,
+    or, for rows of aircraft pages (which have no id), the same tail number
+    and start. Rows seen on both pages are merged.
+
+    Safe to use from several threads."""
+
+    def __init__(self, path=None):
+        self.path = path or absolute_filename('schedules.sqlite3')
+        self.connection = sqlite3.connect(self.path,
+                                          check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            self.connection.executescript(SCHEMA)
+
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+    def upsert(self, schedules, owner=None):
+        """Adds or updates schedules. owner is the user whose own schedules
+        these are, if they come from "My Schedules". Returns the number of
+        schedules."""
+        with self.lock, self.connection:
+            cursor = self.connection.cursor()
+            return len([self.upsert_one(cursor, s, owner)
+                        for s in schedules])
+
+
+    def replace(self, schedules, since, owner=None, tail_number=None,
+                until=None):
+        """Same as upsert(), for all the schedules of owner (or of the
+        aircraft tail_number) starting from since (datetime) on, and before
+        until if given: stored ones which are not in schedules were
+        cancelled, and are deleted.
+
+        For an aircraft, only schedules which were never listed in "My
+        Schedules" are deleted: those are up to the replace() of their
+        owner."""
+        if (owner is None) == (tail_number is None):
+            raise ValueError('Give either owner or tail_number')
+        if owner is not None:
+            scope, value = 'owner = ?', owner
+        else:
+            scope = 'tail_number = ? AND owner IS NULL'
+            value = canonicalize_tail_number(tail_number)
+        scope += ' AND start_ts >= ?'
+        values = [value, self.timestamp(since)]
+        if until is not None:
+            scope += ' AND start_ts < ?'
+            values.append(self.timestamp(until))
+        with self.lock, self.connection:
+            cursor = self.connection.cursor()
+            kept = {self.upsert_one(cursor, s, owner) for s in schedules}
+            stored = cursor.execute(
+                'SELECT rowid FROM schedules WHERE {}'.format(scope),
+                values).fetchall()
+            cancelled = [row for row in stored if row[0] not in kept]
+            cursor.executemany('DELETE FROM schedules WHERE rowid = ?',
+                               cancelled)
+        return len(cancelled)
+
+
+    def upsert_one(self, cursor, schedule, owner):
+        """Returns the rowid of the schedule"""
+        id_, _, tail_number, start_ts, end_ts, timezone, pilot, cfi, note = \
+            self.row(schedule)
+        now = time.time()
+
+        if id_ is not None:
+            # The slot may be stored from an aircraft page, or under the id
+            # of a booking which was moved away
+            cursor.execute('DELETE FROM schedules WHERE tail_number = ? AND '
+                           'start_ts = ? AND (id IS NULL OR id != ?)',
+                           (tail_number, start_ts, id_))
+            row = cursor.execute('SELECT rowid FROM schedules WHERE id = ?',
+                                 (id_,)).fetchone()
+        else:
+            row = cursor.execute('SELECT rowid FROM schedules WHERE '
+                                 'tail_number = ? AND start_ts = ?',
+                                 (tail_number, start_ts)).fetchone()
+
+        if row is None:
+            cursor.execute('INSERT INTO schedules ({}, updated_at) VALUES '
+                           '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+                           .format(', '.join(COLUMNS)),
+                           (id_, owner, tail_number, start_ts, end_ts,
+                            timezone, pilot, cfi, note, now))
+            return cursor.lastrowid
+        cursor.execute('UPDATE schedules SET owner = COALESCE(?, owner), '
+                       'tail_number = ?, start_ts = ?, end_ts = ?, '
+                       'timezone = ?, pilot = COALESCE(?, pilot), '
+                       'cfi = COALESCE(?, cfi), '
+                       'note = COALESCE(?, note), updated_at = ? '
+                       'WHERE rowid = ?',
+                       (owner, tail_number, start_ts, end_ts, timezone,
+                        pilot, cfi, note, now, row[0]))
+        return row[0]
+
+
+    def query(self, start=None, end=None, tail_number=None, pilot=None,
+              cfi=None, owner=None):
+        """Returns the schedules overlapping [start, end) (datetimes, both
+        optional) matching all the given criteria, in chronological
+        order."""
+        conditions = []
+        values = []
+        if start is not None:
+            conditions.append('end_ts > ?')
+            values.append(self.timestamp(start))
+        if end is not None:
+            conditions.append('start_ts < ?')
+            values.append(self.timestamp(end))
+        for column, value in [('tail_number', tail_number), ('pilot', pilot),
+                              ('cfi', cfi), ('owner', owner)]:
+            if value is not None:
+                if column == 'tail_number':
+                    value = canonicalize_tail_number(value)
+                conditions.append('{} = ?'.format(column))
+                values.append(value)
+        sql = 'SELECT {} FROM schedules'.format(', '.join(COLUMNS))
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY start_ts, tail_number'
+        with self.lock:
+            rows = self.connection.execute(sql, values).fetchall()
+        return [self.schedule(row) for row in rows]
+
+
+    def schedules_by_tail_number(self, tail_numbers, start=None, end=None):
+        return {tail_number: self.query(start, end, tail_number=tail_number)
+                for tail_number in tail_numbers}
+
+
+    def fleet_availability(self, tail_numbers, start=None, end=None):
+        """Same as Scraper.fleet_availability(), from the store"""
+        return FleetAvailability(self.schedules_by_tail_number(tail_numbers,
+                                                               start, end))
+
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute(
+                'SELECT COUNT(*) FROM schedules').fetchone()[0]
+
+
+    def row(self, schedule):
+        id_ = schedule.id
+        # Generated ids depend on the row number, they are not stored
+        if id_ is not None and id_.startswith(GENERATED_ID_PREFIX):
+            id_ = None
+        timezone = getattr(schedule.start_dt.tzinfo, 'zone', None)
+        if timezone is None and schedule.start_dt.tzinfo is not None:
+            timezone = 'UTC'
+        return (id_, None, canonicalize_tail_number(schedule.tail_number),
+                self.timestamp(schedule.start_dt),
+                self.timestamp(schedule.end_dt), timezone,
+                schedule.pilot, schedule.cfi, schedule.note)
+
+
+    def schedule(self, row):
+        id_, _, tail_number, start_ts, end_ts, timezone, pilot, cfi, note = \
+            row
+        if id_ is None:
+            id_ = '{}{}_{}'.format(GENERATED_ID_PREFIX, tail_number, start_ts)
+        return Schedule(id_, tail_number,
+                        self.from_timestamp(start_ts, timezone),
+                        self.from_timestamp(end_ts, timezone),
+                        pilot, cfi, note)
+
+
+    def timestamp(self, dt):
+        if dt.tzinfo is None:
+            return calendar.timegm(dt.timetuple())
+        return int(dt.timestamp())
+
+
+    def from_timestamp(self, timestamp, timezone):
+        if timezone is None:
+            return datetime.datetime.fromtimestamp(
+                timestamp, datetime.timezone.utc).replace(tzinfo=None)
+        return datetime.datetime.fromtimestamp(timestamp,
+                                               pytz.timezone(timezone))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import collections
+import requests
+from requests.adapters import HTTPAdapter
+import threading
+from urllib3.util.retry import Retry
+
+try:
+    # urllib3 decodes brotli responses when one of these is installed
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+Timing = collections.namedtuple('Timing',
+                                ['method', 'url', 'status_code', 'seconds'])
+
+
+class Transport:
+    """How a scraper talks to the server: connection pool, timeouts,
+    retries, compression, and timing of every request.
+
+    All the sessions of a transport share one connection pool, so logging
+    in again reuses the open (TLS) connections instead of opening new
+    ones. Idempotent requests (GET) are retried with an exponential backoff
+    (backoff_factor * 2 ** (retry - 1) seconds) on connection errors and
+    5xx responses; the login POST only on connection errors."""
+
+    def __init__(self, pool_size=10, keep_alive=True, connect_timeout=10,
+                 read_timeout=60, retries=3, backoff_factor=0.5,
+                 compression=True, max_timings=1000):
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.timeout = (connect_timeout, read_timeout)
+        self.compression = compression
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size,
+            max_retries=self.retry(retries, backoff_factor))
+        self.timings = collections.deque(maxlen=max_timings)
+        self.timings_lock = threading.Lock()
+
+
+    def retry(self, retries, backoff_factor):
+        kwargs = dict(total=retries, connect=retries, read=retries,
+                      status=retries, backoff_factor=backoff_factor,
+                      status_forcelist=RETRY_STATUSES,
+                      raise_on_status=False)
+        try:
+            return Retry(allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                         **kwargs)
+        except (TypeError, AttributeError):
+            # urllib3 < 1.26
+            return Retry(method_whitelist=Retry.DEFAULT_METHOD_WHITELIST,
+                         **kwargs)
+
+
+    def session(self):
+        """Returns a new session (new cookies) using the shared pool"""
+        session = requests.Session()
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+        session.headers['Accept-Encoding'] = self.accept_encoding()
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        session.hooks['response'].append(self.record)
+        return session
+
+
+    def accept_encoding(self):
+        if not self.compression:
+            return 'identity'
+        if HAS_BROTLI:
+            return 'gzip, deflate, br'
+        return 'gzip, deflate'
+
+
+    def record(self, response, *args, **kwargs):
+        """Response hook: time from sending the request to reading the
+        response headers, retries included."""
+        timing = Timing(response.request.method, response.url,
+                        response.status_code,
+                        response.elapsed.total_seconds())
+        with self.timings_lock:
+            self.timings.append(timing)
+
+
+    def latency_stats(self):
+        """Returns count, mean, median and max of the recorded latencies,
+        in seconds."""
+        with self.timings_lock:
+            seconds = sorted(t.seconds for t in self.timings)
+        if not seconds:
+            return {'count': 0, 'mean': None, 'median': None, 'max': None}
+        return {'count': len(seconds),
+                'mean': sum(seconds) / len(seconds),
+                'median': seconds[len(seconds) // 2],
+                'max': seconds[-1]}
+
+
+    def close(self):
+        self.adapter.close()
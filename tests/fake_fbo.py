@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""A local stand-in for a PaperlessFBO website, serving the pages the
+scraper reads, for tests and benchmarks which shouldn't need the real
+website nor real credentials.
+
+    with FakeFbo(my_rows=20, aircraft_rows=400, latency=0.05) as fbo, \
+         tempfile.TemporaryDirectory() as tmp_dir:
+        scraper = fbo.scraper(tmp_dir)
+
+Run this file to serve until interrupted:
+
+    python3 tests/fake_fbo.py [port] [my_rows] [aircraft_rows] [latency]
+"""
+
+import base64
+import collections
+import datetime
+import gzip
+import html
+import http.cookies
+import http.server
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+import urllib.parse
+
+
+PILOTS = ['Clement, Mathieu', 'Karuak, Justine', 'Smith, John',
+          'Attica, Mark', 'Doe, Jane']
+CFIS = ['CfiLastName, CfiFirstName', 'Stewart, Michael']
+TABLE_ID = 'ctl00_ContentPlaceHolder1_GridView1'
+
+
+def page(title, body, hidden_inputs):
+    inputs = '\n'.join(
+        '<input type="hidden" name="{0}" id="{0}" value="{1}" />'.format(
+            name, html.escape(value)) for name, value in hidden_inputs.items())
+    return '''<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml">
+<head><title>
+\t{title}
+</title></head>
+<body>
+    <form method="post" id="aspnetForm">
+<div class="aspNetHidden">
+{inputs}
+</div>
+    <div class="page">
+        <span id="ctl00_ContentPlaceHolder1_Label1">{title}</span>
+{body}
+    </div>
+    </form>
+</body>
+</html>
+'''.format(title=title, inputs=inputs, body=body)
+
+
+def grid_view(headers, rows):
+    """Renders a table the way ASP.NET renders a GridView"""
+    s = ('<div>\n\t<table cellspacing="0" rules="all" border="1" id="{}"'
+         ' style="border-collapse:collapse;">\n\t\t<tr>\n\t\t\t{}\n\t\t</tr>'
+         .format(TABLE_ID, ''.join('<th scope="col">{}</th>'.format(h)
+                                   for h in headers)))
+    for row in rows:
+        s += '<tr>\n\t\t\t{}\n\t\t</tr>'.format(
+            ''.join('<td>{}</td>'.format(c) for c in row))
+    return s + '\n\t</table>\n</div>'
+
+
+def format_12hr(dt):
+    return '{}/{}/{} {}:{:02d}:00 {}'.format(
+        dt.month, dt.day, dt.year, (dt.hour % 12) or 12, dt.minute,
+        'AM' if dt.hour < 12 else 'PM')
+
+
+def format_24hr(dt):
+    return dt.strftime('%m/%d/%y %H:%M')
+
+
+def bookings(count, seed, first_day):
+    """Yields (start, end) of count chronological bookings"""
+    rnd = random.Random(seed)
+    start = first_day.replace(hour=8)
+    for _ in range(count):
+        end = start + datetime.timedelta(minutes=rnd.choice([60, 90, 120]))
+        yield start, end
+        start = end + datetime.timedelta(minutes=rnd.choice([0, 30, 60, 120]))
+        if start.hour >= 18:
+            start = (start + datetime.timedelta(days=1)).replace(hour=8,
+                                                                 minute=0)
+
+
+def keep_cookies_in(scraper, directory):
+    """Makes scraper keep its session cookies in directory, e.g. a temporary
+    one, rather than in DATA_DIR. Returns scraper."""
+    import src as paperless
+    scraper.cookie_manager = paperless.scraper.CookieManager(
+        os.path.join(directory, scraper.username + '.json'))
+    return scraper
+
+
+class FakeFbo:
+
+    USERNAME = 'student'
+    PASSWORD = 'secret'
+    TAIL_NUMBERS = ['N12345', 'N9876A', 'N555PF']
+    TIMEZONE = 'America/Los_Angeles'
+
+    def __init__(self, my_rows=20, aircraft_rows=100, latency=0.0, port=0,
+                 first_day=None, compress=False):
+        """latency is the time (seconds) taken to answer each request.
+        Pages are gzipped for clients accepting it if compress."""
+        self.my_rows = my_rows
+        self.aircraft_rows = aircraft_rows
+        self.latency = latency
+        self.compress = compress
+        # Number of requests to answer with 503 Service Unavailable
+        self.failures = 0
+        self.first_day = first_day or \
+            (datetime.datetime.now() + datetime.timedelta(days=1)).replace(
+                hour=0, minute=0, second=0, microsecond=0)
+        self.view_state = base64.b64encode(secrets.token_bytes(1500)).decode()
+        # Username to password, more can be added
+        self.accounts = {self.USERNAME: self.PASSWORD}
+        self.sessions = set()
+        self.lock = threading.Lock()
+        self.requests = collections.Counter()
+        self.logins = 0
+        self.bytes_sent = 0
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', port),
+                                                      self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+
+    @property
+    def domain(self):
+        """What to give the scraper as base URL"""
+        return 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+    def __enter__(self):
+        return self.start()
+
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+    def scraper(self, cookies_dir, username=USERNAME, password=PASSWORD,
+                **kwargs):
+        """Returns a Scraper of this website, keeping its cookies in
+        cookies_dir, see keep_cookies_in(). kwargs are given to Scraper."""
+        # Not at the top: this file also runs on its own
+        import src as paperless
+        return keep_cookies_in(
+            paperless.Scraper(self.domain, username, password, self.TIMEZONE,
+                              **kwargs),
+            cookies_dir)
+
+
+    def expire_sessions(self):
+        with self.lock:
+            self.sessions.clear()
+
+
+    def total_requests(self):
+        with self.lock:
+            return sum(self.requests.values())
+
+
+    def login_page(self):
+        return page('Please Log In', '''
+        <input name="TextBox1" type="text" value="Please Log In" />
+        <input name="txtUserName" type="text" />
+        <input name="txtPassword" type="password" />
+        <input type="submit" name="ButtLogin" value="Log In" />''', {
+            '__VIEWSTATE': self.view_state,
+            '__VIEWSTATEGENERATOR': 'A1B2C3D4',
+            '__EVENTVALIDATION': self.view_state[:100],
+            })
+
+
+    def my_schedules_page(self):
+        rows = []
+        rnd = random.Random(1)
+        for i, (start, end) in enumerate(bookings(self.my_rows, 1,
+                                                  self.first_day)):
+            rows.append([
+                '<a href="javascript:__doPostBack()">Select</a>',
+                str(124926 + i), rnd.choice(self.TAIL_NUMBERS),
+                format_12hr(start), format_12hr(end), self.pilot(),
+                rnd.choice(CFIS), '&nbsp;'])
+        return page('My Schedules', grid_view(
+            ['&nbsp;', 'ID', 'Resource', 'Start', 'End', 'Pilot',
+             'Instructor', 'Note'], rows), {'__VIEWSTATE': self.view_state})
+
+
+    def aircraft_schedules_page(self, tail_number):
+        rows = []
+        rnd = random.Random(tail_number)
+        for start, end in bookings(self.aircraft_rows, tail_number,
+                                   self.first_day):
+            rows.append(['N' + tail_number, format_24hr(start),
+                         format_24hr(end), rnd.choice(PILOTS),
+                         rnd.choice(CFIS)])
+        return page('Aircraft Schedule', grid_view(
+            ['Resource', 'Start', 'End', 'Pilot', 'Instructor'], rows),
+            {'__VIEWSTATE': self.view_state})
+
+
+    def pilot(self):
+        """Name of the logged in pilot"""
+        return PILOTS[0]
+
+
+    def handler_class(self):
+        fbo = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately, don't wait for ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self.respond('GET')
+
+            def do_POST(self):
+                self.respond('POST')
+
+            def respond(self, method):
+                url = urllib.parse.urlsplit(self.path)
+                body = b''
+                if method == 'POST':
+                    length = int(self.headers.get('Content-Length', 0))
+                    body = self.rfile.read(length)
+                with fbo.lock:
+                    fbo.requests[url.path] += 1
+                    failing = fbo.failures > 0
+                    if failing:
+                        fbo.failures -= 1
+                if fbo.latency:
+                    time.sleep(fbo.latency)
+                if failing:
+                    return self.send_error(503)
+
+                if url.path == '/fcms1.aspx':
+                    if method == 'POST':
+                        return self.log_in(body)
+                    return self.send_page(fbo.login_page())
+                if not self.has_session():
+                    return self.redirect('/fcms1.aspx')
+                if url.path == '/mstr7.aspx':
+                    return self.send_page(page('Welcome', '', {}))
+                if url.path == '/mstr8.aspx':
+                    return self.send_page(fbo.my_schedules_page())
+                if url.path == '/mstr7b.aspx':
+                    query = urllib.parse.parse_qs(url.query)
+                    tail_number = query.get('AC', [''])[0]
+                    return self.send_page(
+                        fbo.aircraft_schedules_page(tail_number))
+                self.send_error(404)
+
+            def log_in(self, body):
+                form = urllib.parse.parse_qs(body.decode('utf-8'))
+                username = form.get('txtUserName', [None])[0]
+                if username in fbo.accounts \
+                   and form.get('txtPassword') == [fbo.accounts[username]] \
+                   and form.get('__VIEWSTATE') == [fbo.view_state]:
+                    session_id = secrets.token_hex(12)
+                    with fbo.lock:
+                        fbo.sessions.add(session_id)
+                        fbo.logins += 1
+                    return self.redirect('/mstr7.aspx', {
+                        'Set-Cookie': 'ASP.NET_SessionId={}; path=/; '
+                                      'HttpOnly'.format(session_id)})
+                return self.send_page(fbo.login_page())
+
+            def has_session(self):
+                cookies = http.cookies.SimpleCookie(
+                    self.headers.get('Cookie', ''))
+                session = cookies.get('ASP.NET_SessionId')
+                with fbo.lock:
+                    return session is not None \
+                           and session.value in fbo.sessions
+
+            def redirect(self, location, headers={}):
+                self.send_response(302)
+                self.send_header('Location', location)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def send_page(self, text):
+                data = text.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                if fbo.compress and 'gzip' in self.headers.get(
+                        'Accept-Encoding', ''):
+                    data = gzip.compress(data)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                with fbo.lock:
+                    fbo.bytes_sent += len(data)
+
+        return Handler
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    fbo = FakeFbo(port=int(args[0]) if args else 8080,
+                  my_rows=int(args[1]) if len(args) > 1 else 20,
+                  aircraft_rows=int(args[2]) if len(args) > 2 else 100,
+                  latency=float(args[3]) if len(args) > 3 else 0.0)
+    print('Serving on {} (username {}, password {})'.format(
+        fbo.domain, fbo.USERNAME, fbo.PASSWORD))
+    try:
+        fbo.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
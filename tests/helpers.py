@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""Shared fixtures of the tests"""
+
+import datetime
+import pytz
+
+TZ = pytz.timezone('America/Los_Angeles')
+
+
+def dt(day, hour, minute=0):
+    """Local time in November 2030"""
+    return TZ.localize(datetime.datetime(2030, 11, day, hour, minute))
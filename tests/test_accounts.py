@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+from fake_fbo import FakeFbo, keep_cookies_in
+
+import os
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+
+class TestReadAccounts(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'settings.ini')
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def write(self, text):
+        with open(self.path, 'w') as f:
+            f.write(text)
+
+
+    def test_accounts_with_defaults(self):
+        self.write('''
+[scraper]
+url = club.paperlessfbo.com
+username = me
+password = mine
+timezone = America/Los_Angeles
+
+[account:alice]
+username = alice
+password = a
+
+[account:bob]
+username = bob
+password = b
+url = other.paperlessfbo.com
+timezone = Europe/Zurich
+calendar = /tmp/bob.ics
+principal_cfi = Doe, Jane
+''')
+        alice, bob = paperless.read_accounts(self.path)
+        self.assertEqual(alice.name, 'alice')
+        self.assertEqual(alice.base_url, 'club.paperlessfbo.com')
+        self.assertEqual(alice.timezone, 'America/Los_Angeles')
+        self.assertTrue(alice.calendar_path.endswith('calendar-alice.ics'))
+        self.assertIsNone(alice.principal_cfi)
+        self.assertEqual(bob.base_url, 'other.paperlessfbo.com')
+        self.assertEqual(bob.timezone, 'Europe/Zurich')
+        self.assertEqual(bob.calendar_path, '/tmp/bob.ics')
+        self.assertEqual(bob.principal_cfi, 'Doe, Jane')
+
+
+    def test_missing_password(self):
+        self.write('[account:alice]\nurl = x\nusername = alice\n')
+        with self.assertRaises(ValueError):
+            paperless.read_accounts(self.path)
+
+
+class TestRateLimiter(TestCase):
+    def test_spaces_calls_across_threads(self):
+        limiter = paperless.RateLimiter(0.05)
+        times = []
+        lock = threading.Lock()
+
+        def call():
+            limiter.wait()
+            with lock:
+                times.append(time.monotonic())
+
+        threads = [threading.Thread(target=call) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        times.sort()
+        for a, b in zip(times, times[1:]):
+            self.assertGreaterEqual(b - a, 0.04)
+
+
+class TestClub(TestCase):
+    def setUp(self):
+        self.fbo = FakeFbo(my_rows=8, aircraft_rows=30).start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.accounts = []
+        for i in range(5):
+            username = 'member{}'.format(i)
+            self.fbo.accounts[username] = 'pw{}'.format(i)
+            self.accounts.append(paperless.Account(
+                username, self.fbo.domain, username, 'pw{}'.format(i),
+                'America/Los_Angeles',
+                os.path.join(self.tmp_dir.name, username + '.ics')))
+
+
+    def tearDown(self):
+        self.fbo.stop()
+        self.tmp_dir.cleanup()
+
+
+    def club(self, accounts, **kwargs):
+        club = paperless.Club(accounts, **kwargs)
+        for scraper in club.scrapers.values():
+            keep_cookies_in(scraper, self.tmp_dir.name)
+        return club
+
+
+    def test_run_cycle(self):
+        results = self.club(self.accounts, min_interval=0).run_cycle()
+        self.assertEqual(list(results), [a.name for a in self.accounts])
+        for account in self.accounts:
+            result = results[account.name]
+            self.assertIsNone(result.error)
+            self.assertEqual(len(result.schedules), 8)
+            self.assertIn(result.available_before_next_flight, [True, False])
+            self.assertTrue(os.path.exists(account.calendar_path))
+        self.assertEqual(self.fbo.logins, 5)
+        self.assertEqual(self.fbo.requests['/mstr8.aspx'], 5)
+        # Every member's next flight is on the same aircraft here
+        self.assertEqual(self.fbo.requests['/mstr7b.aspx'], 1)
+
+
+    def test_cancels_events_when_no_schedules_left(self):
+        club = self.club(self.accounts[:2], min_interval=0)
+        club.run_cycle()
+        self.fbo.my_rows = 0
+        results = club.run_cycle()
+        self.assertEqual(results['member0'].schedules, [])
+        for account in self.accounts[:2]:
+            with open(account.calendar_path) as f:
+                ics = f.read()
+            self.assertEqual(ics.count('STATUS:CANCELLED'), 8)
+            self.assertNotIn('STATUS:CONFIRMED', ics)
+
+
+    def test_failing_account(self):
+        self.accounts[2].password = 'wrong'
+        results = self.club(self.accounts, min_interval=0).run_cycle(
+            write_calendars=False)
+        self.assertIsNotNone(results['member2'].error)
+        self.assertIsNone(results['member3'].error)
+        self.assertFalse(os.path.exists(self.accounts[0].calendar_path))
+
+
+    def test_rate_limited_per_account(self):
+        start = time.monotonic()
+        self.club(self.accounts, min_interval=0.1).run_cycle(
+            write_calendars=False)
+        # At least log in (2 requests) and my schedules for each account,
+        # accounts in parallel
+        elapsed = time.monotonic() - start
+        self.assertGreaterEqual(elapsed, 0.2)
+        self.assertLess(elapsed, 0.2 * len(self.accounts))
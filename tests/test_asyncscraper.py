@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+from fake_fbo import FakeFbo
+
+import asyncio
+import importlib.util
+import tempfile
+import threading
+import time
+from unittest import IsolatedAsyncioTestCase, mock, skipUnless
+
+
+@skipUnless(importlib.util.find_spec('aiohttp'),
+            'aiohttp is not installed, see requirements-async.txt')
+class TestAsyncScraper(IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.fbo = FakeFbo(my_rows=15, aircraft_rows=50).start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+
+    async def asyncTearDown(self):
+        await self.scraper.close()
+
+
+    def tearDown(self):
+        self.fbo.stop()
+        self.tmp_dir.cleanup()
+
+
+    async def asyncSetUp(self):
+        self.scraper = paperless.AsyncScraper(
+            self.fbo.domain, FakeFbo.USERNAME, FakeFbo.PASSWORD,
+            'America/Los_Angeles', backoff_factor=0.01)
+
+
+    def sync_scraper(self):
+        return self.fbo.scraper(self.tmp_dir.name)
+
+
+    async def test_log_in(self):
+        self.assertTrue(await self.scraper.log_in())
+        async with paperless.AsyncScraper(self.fbo.domain, FakeFbo.USERNAME,
+                                          'wrong', 'America/Los_Angeles') \
+                as scraper:
+            self.assertFalse(await scraper.log_in())
+
+
+    async def test_same_as_scraper(self):
+        sync_scraper = self.sync_scraper()
+        self.assertEqual(await self.scraper.my_schedules(),
+                         sync_scraper.my_schedules())
+        self.assertEqual(await self.scraper.aircraft_schedules('N12345'),
+                         sync_scraper.aircraft_schedules('12345'))
+        everything = sync_scraper.aircraft_schedules('12345')
+        self.assertEqual(await self.scraper.aircraft_schedules(
+                             'N12345', until=everything[5].start_dt),
+                         everything[:5])
+
+
+    async def test_availability_before_next_flight(self):
+        calls = []
+        def available(flight, schedules):
+            calls.append((flight, schedules))
+            return True
+        self.scraper.scraper.is_aircraft_available_before_flight = available
+        self.assertTrue(
+            await self.scraper.is_aircraft_available_before_my_next_flight())
+        (flight, schedules), = calls
+        self.assertEqual(flight, (await self.scraper.my_schedules())[0])
+        # Read up to the flight only
+        self.assertTrue(schedules)
+        for s in schedules:
+            self.assertLess(s.start_dt, flight.end_dt)
+
+
+    async def test_concurrent_pages_share_one_login(self):
+        self.fbo.latency = 0.2
+        start = time.monotonic()
+        results = await asyncio.gather(*[
+            self.scraper.aircraft_schedules(tail_number)
+            for tail_number in FakeFbo.TAIL_NUMBERS])
+        # Logging in (two requests), then the pages at the same time
+        self.assertLess(time.monotonic() - start, 0.2 * 5)
+        self.assertEqual([len(r) for r in results], [50] * 3)
+        self.assertEqual(self.fbo.logins, 1)
+
+
+    async def test_expired_session_logs_in_again_once(self):
+        await self.scraper.my_schedules()
+        self.fbo.expire_sessions()
+        results = await asyncio.gather(self.scraper.my_schedules(),
+                                       self.scraper.aircraft_schedules('12345'))
+        self.assertEqual(len(results[0]), 15)
+        self.assertEqual(self.fbo.logins, 2)
+
+
+    async def test_retries_server_errors(self):
+        await self.scraper.log_in()
+        self.fbo.failures = 2
+        self.assertEqual(len(await self.scraper.my_schedules()), 15)
+
+
+    async def test_parsed_off_the_event_loop(self):
+        threads = []
+        parse = self.scraper.scraper.parse_my_schedules
+        def recording_parse(html):
+            threads.append(threading.current_thread())
+            return parse(html)
+        self.scraper.scraper.parse_my_schedules = recording_parse
+        await self.scraper.my_schedules()
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+
+    async def test_post_not_retried_once_sent(self):
+        import aiohttp
+        attempts = []
+        class FailingSession:
+            def request(self, method, url, **kwargs):
+                attempts.append(method)
+                raise error
+            async def close(self):
+                pass
+        self.scraper.session = FailingSession()
+
+        error = aiohttp.ServerDisconnectedError()
+        with self.assertRaises(aiohttp.ServerDisconnectedError):
+            await self.scraper.request('POST', self.scraper.urls.LOGIN_PAGE)
+        self.assertEqual(attempts, ['POST'])
+        del attempts[:]
+        with self.assertRaises(aiohttp.ServerDisconnectedError):
+            await self.scraper.request('GET', self.scraper.urls.LOGIN_PAGE)
+        self.assertEqual(attempts, ['GET'] * 4)
+
+        # Couldn't connect: not sent
+        del attempts[:]
+        error = aiohttp.ClientConnectorError(mock.Mock(), OSError())
+        with self.assertRaises(aiohttp.ClientConnectorError):
+            await self.scraper.request('POST', self.scraper.urls.LOGIN_PAGE)
+        self.assertEqual(attempts, ['POST'] * 4)
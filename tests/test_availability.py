@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+
+import datetime
+import random
+from unittest import TestCase
+
+BASE = datetime.datetime(2020, 11, 5)
+
+
+def t(minutes):
+    return BASE + datetime.timedelta(minutes=minutes)
+
+
+def schedule(start, end, tail_number='12345'):
+    return paperless.Schedule('1', tail_number, t(start), t(end))
+
+
+class TestAircraftAvailability(TestCase):
+
+    def setUp(self):
+        # Unsorted, overlapping and back-to-back on purpose
+        self.availability = paperless.AircraftAvailability([
+            schedule(600, 720),
+            schedule(60, 120),
+            schedule(100, 180),
+            schedule(180, 240),
+            schedule(300, 330),
+            ])
+
+
+    def test_intervals_are_merged(self):
+        self.assertEqual(len(self.availability), 3)
+
+
+    def test_overlaps(self):
+        self.assertTrue(self.availability.overlaps(t(0), t(61)))
+        self.assertFalse(self.availability.overlaps(t(0), t(60)))
+        self.assertFalse(self.availability.overlaps(t(240), t(300)))
+        self.assertTrue(self.availability.overlaps(t(200), t(210)))
+        self.assertFalse(self.availability.overlaps(t(720), t(1000)))
+
+
+    def test_free_time_before(self):
+        self.assertIsNone(self.availability.free_time_before(t(30)))
+        self.assertEqual(self.availability.free_time_before(t(300)),
+                         datetime.timedelta(minutes=60))
+        self.assertEqual(self.availability.free_time_before(t(200)),
+                         datetime.timedelta(0))
+        self.assertTrue(self.availability.is_free_before(t(300), 60))
+        self.assertFalse(self.availability.is_free_before(t(300), 61))
+
+
+    def test_next_gap(self):
+        m = datetime.timedelta(minutes=1)
+        self.assertEqual(self.availability.next_gap(t(0)), (t(0), t(60)))
+        self.assertEqual(self.availability.next_gap(t(0), 61 * m),
+                         (t(330), t(600)))
+        self.assertEqual(self.availability.next_gap(t(100), 60 * m),
+                         (t(240), t(300)))
+        self.assertEqual(self.availability.next_gap(t(250), 60 * m),
+                         (t(330), t(600)))
+        self.assertEqual(self.availability.next_gap(t(0), 300 * m),
+                         (t(720), None))
+        self.assertEqual(self.availability.next_gap(t(800)), (t(800), None))
+
+
+    def test_same_answers_as_linear_scan(self):
+        rnd = random.Random(42)
+        for _ in range(20):
+            intervals = []
+            for _ in range(rnd.randint(0, 40)):
+                start = rnd.randrange(0, 3000, 15)
+                intervals.append((start, start + rnd.randrange(15, 240, 15)))
+            availability = paperless.AircraftAvailability(
+                [schedule(s, e) for s, e in intervals])
+            for _ in range(50):
+                q = rnd.randrange(-60, 3300, 5)
+                duration = rnd.randrange(0, 300, 15)
+                self.assertEqual(
+                    availability.next_gap(
+                        t(q), datetime.timedelta(minutes=duration)),
+                    self.linear_next_gap(intervals, q, duration))
+                ends_before = [e for s, e in intervals if s < q]
+                busy = any(s < q < e for s, e in intervals)
+                expected = None if not ends_before \
+                    else datetime.timedelta(minutes=0 if busy
+                                            else q - max(ends_before))
+                self.assertEqual(availability.free_time_before(t(q)),
+                                 expected)
+
+
+    def linear_next_gap(self, intervals, after, duration):
+        """Minute by minute"""
+        busy = set()
+        for s, e in intervals:
+            busy.update(range(s, e))
+        last = max([e for s, e in intervals], default=after)
+        minute = after
+        while minute <= last:
+            if minute not in busy:
+                end = minute
+                while end not in busy and end < last:
+                    end += 1
+                if end == last and end not in busy:
+                    return (t(minute), None)
+                if end - minute >= max(duration, 1):
+                    return (t(minute), t(end))
+                minute = end
+            minute += 1
+        return (t(max(after, last)), None)
+
+
+class TestFleetAvailability(TestCase):
+
+    def test_by_tail_number(self):
+        fleet = paperless.FleetAvailability({
+            'N12345': [schedule(60, 120)],
+            '9876A': [schedule(0, 200, '9876A')],
+            })
+        self.assertIn('12345', fleet)
+        self.assertIn('N9876A', fleet)
+        flight = schedule(135, 200, 'N12345')
+        self.assertEqual(fleet.free_time_before_flight(flight),
+                         datetime.timedelta(minutes=15))
+        self.assertTrue(fleet.is_available_before_flight(flight))
+        self.assertFalse(fleet.is_available_before_flight(
+            schedule(135, 200, '9876A')))
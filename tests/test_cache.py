@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+
+import os
+import tempfile
+from unittest import TestCase
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class FakeResponse:
+    def __init__(self, text, status_code=200, headers=None):
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeScraper(paperless.Scraper):
+    """Serves a page from memory and counts fetches and parses"""
+
+    def __init__(self, page_cache):
+        super().__init__('example.com', 'username', 'password',
+                         'America/Los_Angeles', page_cache=page_cache)
+        with open(os.path.join(FIXTURES_DIR, 'my_schedules.html')) as f:
+            self.html = f.read()
+        self.response_headers = {}
+        self.requests = []
+        self.parses = 0
+
+    def fetch(self, url, headers=None):
+        self.requests.append(headers or {})
+        if self.response_headers.get('ETag') and headers \
+           and headers.get('If-None-Match') == self.response_headers['ETag']:
+            return FakeResponse('', 304)
+        return FakeResponse(self.html, headers=self.response_headers)
+
+    def parse_my_schedules(self, html):
+        self.parses += 1
+        return super().parse_my_schedules(html)
+
+
+class TestPageCache(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.page_cache = paperless.PageCache(self.tmp_dir.name)
+        self.scraper = FakeScraper(self.page_cache)
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def test_unchanged_page_is_not_parsed_again(self):
+        first = self.scraper.my_schedules()
+        # A new view state doesn't count as a change
+        self.scraper.html = self.scraper.html.replace(
+                'value="A1B2C3D4"', 'value="E5F6A7B8"')
+        second = self.scraper.my_schedules()
+        self.assertEqual(self.scraper.parses, 1)
+        self.assertEqual(len(self.scraper.requests), 2)
+        self.assertEqual(repr(first), repr(second))
+
+
+    def test_changed_page_is_parsed_again(self):
+        self.scraper.my_schedules()
+        self.scraper.html = self.scraper.html.replace('124926', '999999')
+        schedules = self.scraper.my_schedules()
+        self.assertEqual(self.scraper.parses, 2)
+        self.assertEqual(schedules[0].id, '999999')
+
+
+    def test_etag_is_sent_back(self):
+        self.scraper.response_headers = {'ETag': '"v1"'}
+        first = self.scraper.my_schedules()
+        second = self.scraper.my_schedules()
+        self.assertEqual(self.scraper.requests[1].get('If-None-Match'), '"v1"')
+        self.assertEqual(self.scraper.parses, 1)
+        self.assertEqual(repr(first), repr(second))
+
+
+    def test_fresh_entry_is_used_without_request(self):
+        self.page_cache.ttl = 3600
+        self.scraper.my_schedules()
+        self.scraper.my_schedules()
+        self.assertEqual(len(self.scraper.requests), 1)
+
+
+    def test_entries_are_per_user(self):
+        self.scraper.my_schedules()
+        other = FakeScraper(self.page_cache)
+        other.username = 'other'
+        other.my_schedules()
+        self.assertEqual(other.parses, 1)
+
+
+    def test_least_recently_used_entries_are_evicted(self):
+        self.page_cache.max_entries = 3
+        response = FakeResponse('')
+        for url in ['a', 'b', 'c']:
+            self.page_cache.put(url, 'username', response, 'hash', [])
+            # Make sure modification times differ
+            os.utime(self.page_cache.filename(url, 'username'),
+                     (0, {'a': 1, 'b': 2, 'c': 3}[url]))
+        self.page_cache.get('a', 'username')
+        self.page_cache.put('d', 'username', response, 'hash', [])
+        self.assertIsNone(self.page_cache.get('b', 'username'))
+        for url in ['a', 'c', 'd']:
+            self.assertIsNotNone(self.page_cache.get(url, 'username'))
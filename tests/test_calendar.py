@@ -4,7 +4,10 @@
 import src as paperless
 
 from datetime import datetime as dt
+import datetime
+import os
 import pdb
+import pytz
 import re
 import tempfile
 from unittest import TestCase
@@ -99,3 +102,213 @@ dt(2020, 11, 29, 14, 0), dt(2020, 11, 29, 16, 0),\
             if line.startswith(field):
                 counter = counter + 1
         return counter
+
+
+class TestIncrementalCalendar(TestCase):
+
+    def setUp(self):
+        self.tz = pytz.timezone('America/Los_Angeles')
+        self.now = self.tz.localize(dt(2020, 10, 22, 12, 0))
+        self.schedules = [
+            self.schedule('1', 21), # already flown
+            self.schedule('2', 24),
+            self.schedule('3', 25),
+            self.schedule('4', 26),
+            ]
+        self.previous = paperless.Calendar(self.schedules).cal.to_ical()
+        self.blocks = self.events(self.previous)
+
+
+    def schedule(self, id_, day, start_hour=14, year=2020):
+        return paperless.Schedule(
+            id_, 'N12345',
+            self.tz.localize(dt(year, 10, day, start_hour, 0)),
+            self.tz.localize(dt(year, 10, day, start_hour + 2, 0)),
+            'Clement, Mathieu', 'CfiLastName, CfiFirstName', None)
+
+
+    def update(self, schedules):
+        return paperless.Calendar(schedules).update(self.previous, self.now)
+
+
+    def events(self, data):
+        calendar = paperless.Calendar([self.schedule('0', 1)])
+        header, blocks, footer = calendar.split_events(data)
+        return {calendar.read_properties(b)['UID'][1]: b for b in blocks}
+
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.update(self.schedules[1:]), self.previous)
+
+
+    def test_changed_event_is_updated(self):
+        moved = self.schedule('3', 25, start_hour=10)
+        updated = self.events(self.update(
+            [self.schedules[1], moved, self.schedules[3]]))
+        uid = 'PAPERLESS-ICAL-EVENT-3'
+        self.assertIn(b'SEQUENCE:1', updated[uid])
+        self.assertIn(b'T100000', updated[uid])
+        for other in ['1', '2', '4']:
+            uid = 'PAPERLESS-ICAL-EVENT-' + other
+            self.assertEqual(updated[uid], self.blocks[uid])
+
+
+    def test_new_event_is_added(self):
+        updated = self.events(self.update(
+            self.schedules + [self.schedule('5', 28)]))
+        self.assertEqual(len(updated), 5)
+        self.assertNotIn(b'SEQUENCE', updated['PAPERLESS-ICAL-EVENT-5'])
+
+
+    def test_removed_future_event_is_cancelled(self):
+        updated = self.events(self.update(self.schedules[2:]))
+        cancelled = updated['PAPERLESS-ICAL-EVENT-2']
+        self.assertIn(b'STATUS:CANCELLED', cancelled)
+        self.assertIn(b'SEQUENCE:1', cancelled)
+        # Past events are history, not cancellations
+        self.assertEqual(updated['PAPERLESS-ICAL-EVENT-1'],
+                         self.blocks['PAPERLESS-ICAL-EVENT-1'])
+
+
+    def test_cancelled_event_is_restored(self):
+        self.previous = self.update(self.schedules[2:])
+        restored = self.events(self.update(self.schedules))
+        event = restored['PAPERLESS-ICAL-EVENT-2']
+        self.assertIn(b'STATUS:CONFIRMED', event)
+        self.assertIn(b'SEQUENCE:2', event)
+        # And stays so
+        self.previous = self.update(self.schedules)
+        self.assertEqual(self.update(self.schedules), self.previous)
+
+
+    def test_result_is_valid_calendar(self):
+        data = self.update(self.schedules[2:] + [self.schedule('5', 28)])
+        cal = paperless.calendar.icalendar.Calendar.from_ical(data)
+        self.assertEqual(len(cal.walk('VEVENT')), 5)
+
+
+    def test_write_filename(self):
+        year = dt.now().year + 1
+        schedules = [self.schedule(str(day), day, year=year)
+                     for day in range(1, 5)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'calendar.ics')
+            paperless.Calendar(schedules).write_filename(path)
+            paperless.Calendar(schedules[:2]).write_filename(path)
+            self.assertEqual(os.listdir(tmp_dir), ['calendar.ics'])
+            with open(path, 'rb') as f:
+                data = f.read()
+            self.assertEqual(data.count(b'BEGIN:VEVENT'), 4)
+            self.assertEqual(data.count(b'STATUS:CANCELLED'), 2)
+
+
+class TestFastSerializer(TestCase):
+
+    def setUp(self):
+        tz = pytz.timezone('America/Los_Angeles')
+        utc = datetime.timezone.utc
+        self.schedules = [
+            paperless.Schedule('1', 'N12345', tz.localize(dt(2030, 3, 10, 1)),
+                               tz.localize(dt(2030, 3, 10, 4)),
+                               'Clement, Mathieu', 'CfiLastName, CfiFirstName'),
+            paperless.Schedule('2', 'N9876A', dt(2030, 3, 11, 8),
+                               dt(2030, 3, 11, 10), 'Clement, Mathieu',
+                               'Zoë; Back\\slash, with a name long enough '
+                               'to be folded over more than one line'),
+            paperless.Schedule('3', '12345',
+                               dt(2030, 3, 12, 8, tzinfo=utc),
+                               dt(2030, 3, 12, 9, 30, tzinfo=utc),
+                               'Someone, Else', None),
+            # No known TZID, left to icalendar
+            paperless.Schedule('4', 'N12345', dt(2030, 3, 13, 8, tzinfo=
+                                   datetime.timezone(datetime.timedelta(
+                                       hours=2))),
+                               dt(2030, 3, 13, 9, tzinfo=utc), 'A', 'B'),
+            ]
+        self.free_times = [
+            paperless.FreeTime(self.schedules[0], None,
+                               datetime.timedelta(minutes=90)),
+            paperless.FreeTime(self.schedules[1], None, None)]
+
+
+    def serialize(self, fast, early=None):
+        calendar = paperless.Calendar(self.schedules, self.free_times, early,
+                                      fast=fast)
+        f = tempfile.TemporaryFile()
+        calendar.write_file(f)
+        f.seek(0)
+        return f.read()
+
+
+    def parsed(self, data):
+        """The components of data (bytes) and their properties, as icalendar
+        reads them back: the same whatever the folding, the escaping or
+        the order of the properties."""
+        component = paperless.calendar.icalendar.Calendar.from_ical(data)
+        def params(value):
+            ignored = {'VALUE'}
+            # Old versions of icalendar also give UTC times a TZID
+            if value.to_ical().endswith(b'Z'):
+                ignored.add('TZID')
+            return {k: v for k, v in value.params.items() if k not in ignored}
+        return [(c.name, {name: (value.to_ical(), params(value))
+                          for name, value in c.items()})
+                for c in component.walk()]
+
+
+    def test_same_as_icalendar(self):
+        for early in [None, 'alarm', 'dtstart']:
+            fast = self.serialize(True, early)
+            self.assertEqual(self.parsed(fast),
+                             self.parsed(self.serialize(False, early)), early)
+            for line in fast.split(b'\r\n'):
+                self.assertLessEqual(len(line), 75)
+
+
+    def test_escapes_and_folds_as_icalendar(self):
+        texts = ['a\\Nb', 'a\r\nb\nc', 'x;y,z\\', 'Zoë ' * 30,
+                 'caret^' * 20, 'back\\' * 30, 'é' * 40]
+        # Puts the escape on each side of the first fold
+        texts += ['a' * n + escape for n in range(40, 60)
+                  for escape in ['^n', '\\n']]
+        for text in texts:
+            schedule = paperless.Schedule('1', 'N12345', dt(2030, 3, 10, 8),
+                                          dt(2030, 3, 10, 9), 'Me', text)
+            fast = paperless.Calendar([schedule]).event_ical(schedule)
+            self.assertEqual(self.parsed(fast), self.parsed(
+                paperless.Calendar([schedule], fast=False).event_ical(
+                    schedule)), text)
+            for line in fast.split(b'\r\n'):
+                self.assertLessEqual(len(line), 75)
+        # Old versions of icalendar keep a lone CR, which ends the line
+        self.assertEqual(paperless.calendar.escape_text('a\rb'), 'a\\nb')
+
+
+    def test_round_trip(self):
+        cal = paperless.calendar.icalendar.Calendar.from_ical(
+            self.serialize(True, 'alarm'))
+        events = cal.walk('VEVENT')
+        self.assertEqual(len(events), 4)
+        # icalendar doesn't read back the TZID of fixed offsets
+        for event, schedule in zip(events[:3], self.schedules):
+            self.assertEqual(event['uid'],
+                             'PAPERLESS-ICAL-EVENT-' + schedule.id)
+            self.assertEqual(event.decoded('dtstart'), schedule.start_dt)
+            self.assertEqual(event.decoded('dtend'), schedule.end_dt)
+        self.assertEqual(events[0].decoded('dtstart').utcoffset(),
+                         self.schedules[0].start_dt.utcoffset())
+        self.assertIn('Zoë; Back\\slash, with', str(events[1]['summary']))
+        self.assertEqual(events[0].walk('VALARM')[0].decoded('trigger'),
+                         -datetime.timedelta(minutes=90))
+
+
+    def test_update_same_as_icalendar(self):
+        previous = self.serialize(True)
+        moved = list(self.schedules)
+        moved[2] = paperless.Schedule('3', '12345', dt(2030, 3, 12, 10),
+                                      dt(2030, 3, 12, 11), 'Someone, Else')
+        now = pytz.utc.localize(dt(2030, 1, 1))
+        self.assertEqual(
+            self.parsed(paperless.Calendar(moved).update(previous, now)),
+            self.parsed(paperless.Calendar(moved, fast=False).update(
+                previous, now)))
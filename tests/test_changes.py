@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+from src.changes import ADDED, CHANGED, REMOVED, ChangeFeed, diff
+from src.schedule import Schedule
+from helpers import TZ, dt
+
+import datetime
+import os
+import tempfile
+from unittest import TestCase
+
+
+def schedules():
+    return [
+        Schedule('1', '12345', dt(2, 8), dt(2, 10), 'A', 'X'),
+        Schedule('2', '9876A', dt(2, 9), dt(2, 11), 'A', 'Y'),
+        Schedule('3', '12345', dt(3, 8), dt(3, 10), 'A', 'X'),
+        ]
+
+
+class TestDiff(TestCase):
+    def test_no_changes(self):
+        self.assertEqual(diff(schedules(), schedules()), [])
+
+
+    def test_added_removed_changed(self):
+        new = schedules()
+        del new[0]
+        new[0].start_dt = dt(2, 10)
+        new[1].cfi = 'Z'
+        new.append(Schedule('4', '12345', dt(4, 8), dt(4, 10), 'A', 'X'))
+        changes = diff(schedules(), new)
+        self.assertEqual([(c.kind, c.schedule.id, c.fields) for c in changes],
+                         [(CHANGED, '2', ('start_dt',)),
+                          (CHANGED, '3', ('cfi',)),
+                          (ADDED, '4', ()),
+                          (REMOVED, '1', ())])
+        self.assertTrue(changes[0].moved)
+        self.assertFalse(changes[1].moved)
+        self.assertEqual(changes[0].old.start_dt, dt(2, 9))
+        self.assertTrue(str(changes[0]).startswith('Moved: 9876A'))
+        self.assertTrue(str(changes[3]).startswith('Removed: 12345'))
+
+
+    def test_aircraft_rows_identified_by_slot(self):
+        old = [Schedule('ACFT_SCHED_12345_1', '12345', dt(2, 8), dt(2, 10)),
+               Schedule('ACFT_SCHED_12345_2', '12345', dt(2, 11), dt(2, 12))]
+        # The first booking was cancelled, the other one is now row 1
+        new = [Schedule('ACFT_SCHED_12345_1', '12345', dt(2, 11), dt(2, 13))]
+        changes = diff(old, new)
+        self.assertEqual([(c.kind, c.fields) for c in changes],
+                         [(CHANGED, ('end_dt',)), (REMOVED, ())])
+        self.assertEqual(changes[1].old.start_dt, dt(2, 8))
+
+
+    def test_linear(self):
+        many = [Schedule(str(i), '12345', dt(1, 0) + datetime.timedelta(
+                             hours=i), dt(1, 1) + datetime.timedelta(hours=i))
+                for i in range(20000)]
+        # Would take minutes if quadratic
+        self.assertEqual(diff(many, list(reversed(many))), [])
+
+
+class TestChangeFeed(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.feed = ChangeFeed('student@club', self.tmp_dir.name)
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def test_persisted_between_runs(self):
+        self.assertEqual([c.kind for c in self.feed.update(schedules())],
+                         [ADDED] * 3)
+        self.assertEqual(self.feed.snapshot(), schedules())
+
+        feed = ChangeFeed('student@club', self.tmp_dir.name)
+        new = schedules()
+        new[2].end_dt = dt(3, 11)
+        change, = feed.update(new)
+        self.assertEqual((change.kind, change.schedule.id), (CHANGED, '3'))
+        self.assertEqual(change.old.end_dt, dt(3, 10))
+        self.assertEqual(change.old.end_dt.tzinfo.zone, TZ.zone)
+
+
+    def test_unchanged_neither_parsed_nor_written(self):
+        self.feed.update(schedules())
+        with open(self.feed.filename, 'a') as f:
+            f.write('this line would not parse\n')
+        mtime = os.stat(self.feed.filename).st_mtime_ns
+        self.assertEqual(self.feed.update(schedules()), [])
+        self.assertEqual(os.stat(self.feed.filename).st_mtime_ns, mtime)
+
+
+    def test_damaged_snapshot(self):
+        with open(self.feed.filename, 'w') as f:
+            f.write('{not json\n')
+        self.assertEqual(len(self.feed.update(schedules())), 3)
+        self.assertEqual(self.feed.update(schedules()), [])
+
+
+class TestPollerChanges(TestCase):
+    def test_changes_output(self):
+        class FakeScraper:
+            timezone = TZ
+            def __init__(self):
+                self.schedules = schedules()
+            def my_schedules(self):
+                return list(self.schedules)
+            def aircraft_schedules(self, tail_number, until=None):
+                return []
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            scraper = FakeScraper()
+            messages = []
+            poller = paperless.Poller(
+                scraper, os.path.join(tmp_dir, 'calendar.ics'),
+                output=messages.append,
+                change_feed=ChangeFeed('a', tmp_dir))
+            poller.poll()
+            scraper.schedules = scraper.schedules[1:]
+            del messages[:]
+            poller.poll()
+        self.assertIn('Removed: 12345 Sat 02 Nov 08:00-10:00', messages)
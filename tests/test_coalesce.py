@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+from fake_fbo import FakeFbo
+
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+
+class TestCoalescer(TestCase):
+    def setUp(self):
+        self.now = 0
+        self.coalescer = paperless.Coalescer(ttl=60, clock=lambda: self.now)
+        self.calls = 0
+
+
+    def fetch(self):
+        self.calls += 1
+        return self.calls
+
+
+    def test_reuses_fresh_result(self):
+        self.assertEqual(self.coalescer.get('a', self.fetch), 1)
+        self.now = 59
+        self.assertEqual(self.coalescer.get('a', self.fetch), 1)
+        self.now = 60
+        self.assertEqual(self.coalescer.get('a', self.fetch), 2)
+        self.assertEqual(self.coalescer.get('b', self.fetch), 3)
+        self.assertEqual(self.coalescer.stats(),
+                         {'hits': 1, 'misses': 3, 'coalesced': 0})
+
+
+    def test_no_ttl(self):
+        coalescer = paperless.Coalescer(ttl=0)
+        coalescer.get('a', self.fetch)
+        coalescer.get('a', self.fetch)
+        self.assertEqual(self.calls, 2)
+
+
+    def test_forget(self):
+        self.coalescer.get('a', self.fetch)
+        self.coalescer.forget('a')
+        self.assertEqual(self.coalescer.get('a', self.fetch), 2)
+
+
+    def test_concurrent_callers_share_one_fetch(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_fetch():
+            started.set()
+            release.wait(5)
+            return self.fetch()
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+                       self.coalescer.get('a', slow_fetch)))
+                   for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        # Let the others queue up behind the first one
+        while self.coalescer.stats()['coalesced'] < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.coalescer.stats(),
+                         {'hits': 0, 'misses': 1, 'coalesced': 4})
+
+
+    def test_failure_shared_but_not_kept(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def failing_fetch():
+            started.set()
+            release.wait(5)
+            raise IOError('down')
+
+        errors = []
+        def call():
+            try:
+                self.coalescer.get('a', failing_fetch)
+            except IOError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while self.coalescer.stats()['coalesced'] < 2:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(self.coalescer.get('a', self.fetch), 1)
+
+
+class TestScraperCoalescing(TestCase):
+    def setUp(self):
+        self.fbo = FakeFbo(my_rows=5, aircraft_rows=30, latency=0.05).start()
+        self.fbo.accounts['other'] = 'pw'
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.coalescer = paperless.Coalescer(ttl=60)
+
+
+    def tearDown(self):
+        self.fbo.stop()
+        self.tmp_dir.cleanup()
+
+
+    def scraper(self, username, password):
+        scraper = self.fbo.scraper(self.tmp_dir.name, username, password,
+                                   coalescer=self.coalescer)
+        scraper.ensure_logged_in()
+        return scraper
+
+
+    def test_users_share_aircraft_pages(self):
+        scrapers = [self.scraper(FakeFbo.USERNAME, FakeFbo.PASSWORD),
+                    self.scraper('other', 'pw')] * 3
+        results = [None] * len(scrapers)
+
+        def fetch(i):
+            results[i] = scrapers[i].aircraft_schedules('N12345')
+
+        threads = [threading.Thread(target=fetch, args=(i,))
+                   for i in range(len(scrapers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.fbo.requests['/mstr7b.aspx'], 1)
+        self.assertEqual(len(results[0]), 30)
+        self.assertTrue(all(r == results[0] for r in results))
+
+        # Within the freshness window
+        self.assertEqual(len(scrapers[1].aircraft_schedules('12345')), 30)
+        self.assertEqual(self.fbo.requests['/mstr7b.aspx'], 1)
+        stats = self.coalescer.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'] + stats['coalesced'], 6)
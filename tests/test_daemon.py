@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+from src.daemon import poll_interval
+from fake_fbo import FakeFbo
+
+import datetime
+import os
+import pytz
+import requests
+import tempfile
+import threading
+from unittest import TestCase
+
+
+class TestPollInterval(TestCase):
+    def setUp(self):
+        self.tz = pytz.timezone('America/Los_Angeles')
+        self.noon = self.tz.localize(datetime.datetime(2020, 11, 2, 12, 0))
+        self.midnight = self.tz.localize(datetime.datetime(2020, 11, 2, 0, 0))
+
+
+    def test_tightens_as_next_flight_approaches(self):
+        intervals = [poll_interval(self.noon,
+                                   self.noon + datetime.timedelta(hours=h))
+                     for h in [48, 12, 2, 0.5]]
+        self.assertEqual(intervals, sorted(intervals, reverse=True))
+        self.assertEqual(intervals[-1], 60)
+
+
+    def test_no_next_flight(self):
+        self.assertEqual(poll_interval(self.noon),
+                         paperless.daemon.DEFAULT_POLL_INTERVAL)
+
+
+    def test_backs_off_overnight(self):
+        for h in [48, 12, 2]:
+            self.assertGreater(
+                poll_interval(self.midnight,
+                              self.midnight + datetime.timedelta(hours=h)),
+                poll_interval(self.noon,
+                              self.noon + datetime.timedelta(hours=h)))
+        self.assertEqual(poll_interval(self.midnight),
+                         paperless.daemon.QUIET_POLL_INTERVAL)
+
+
+    def test_quiet_hours_within_a_day(self):
+        quiet = [h for h in range(24)
+                 if poll_interval(self.noon.replace(hour=h),
+                                  quiet_hours=(13, 15))
+                 == paperless.daemon.QUIET_POLL_INTERVAL]
+        self.assertEqual(quiet, [13, 14])
+
+
+    def test_early_flight_still_polled_overnight(self):
+        flight = self.midnight + datetime.timedelta(minutes=30)
+        self.assertLess(poll_interval(self.midnight, flight),
+                        paperless.daemon.QUIET_POLL_INTERVAL)
+
+
+class TestPoller(TestCase):
+    def setUp(self):
+        self.fbo = FakeFbo(my_rows=10, aircraft_rows=40).start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.scraper = self.fbo.scraper(self.tmp_dir.name)
+        self.calendar_path = os.path.join(self.tmp_dir.name, 'calendar.ics')
+        self.messages = []
+        self.poller = paperless.Poller(self.scraper, self.calendar_path,
+                                       output=self.messages.append)
+
+
+    def tearDown(self):
+        self.fbo.stop()
+        self.tmp_dir.cleanup()
+
+
+    def test_writes_calendar_only_when_changed(self):
+        self.poller.poll()
+        self.assertTrue(os.path.exists(self.calendar_path))
+        mtime = os.stat(self.calendar_path).st_mtime_ns
+
+        self.poller.poll()
+        self.assertEqual(self.poller.calendar_writes, 1)
+        self.assertEqual(os.stat(self.calendar_path).st_mtime_ns, mtime)
+
+        self.fbo.my_rows = 11
+        self.poller.poll()
+        self.assertEqual(self.poller.calendar_writes, 2)
+
+
+    def test_cancels_events_when_no_schedules_left(self):
+        self.poller.poll()
+        self.fbo.my_rows = 0
+        self.poller.poll()
+        self.assertEqual(self.poller.calendar_writes, 2)
+        self.assertEqual(self.messages.count('0 schedules, calendar updated'),
+                         1)
+        with open(self.calendar_path) as f:
+            ics = f.read()
+        self.assertEqual(ics.count('STATUS:CANCELLED'), 10)
+        self.assertNotIn('STATUS:CONFIRMED', ics)
+
+
+    def test_reports_availability_once(self):
+        self.poller.poll()
+        self.poller.poll()
+        reports = [m for m in self.messages if m.startswith('Aircraft')]
+        self.assertEqual(len(reports), 1)
+
+
+    def test_keeps_session_warm(self):
+        for _ in range(3):
+            self.poller.poll()
+        self.assertEqual(self.fbo.logins, 1)
+
+
+    def test_interval_from_next_flight(self):
+        interval = self.poller.poll()
+        next_flight = self.scraper.my_schedules()[0]
+        self.assertEqual(interval, poll_interval(self.poller.now(),
+                                                 next_flight.start_dt))
+
+
+    def test_run_survives_errors_and_stops(self):
+        def fail():
+            raise requests.ConnectionError()
+        self.scraper.my_schedules = fail
+        failed = threading.Event()
+        self.poller.output = lambda message: (self.messages.append(message),
+                                              failed.set())
+        thread = threading.Thread(target=self.poller.run)
+        thread.start()
+        self.assertTrue(failed.wait(5))
+        self.poller.stop()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(self.poller.errors_in_a_row, 1)
+        self.assertTrue(self.messages[0].startswith('Poll failed'))
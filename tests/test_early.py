@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+from src.calendar import EARLY_ALARM, EARLY_DTSTART, EARLY_MAX
+from src.early import FreeTime
+from src.schedule import Schedule
+from fake_fbo import FakeFbo
+from helpers import dt
+
+import datetime
+import tempfile
+from unittest import TestCase
+
+
+def hours(n):
+    return datetime.timedelta(hours=n)
+
+
+class TestFreeTimeBeforeFlights(TestCase):
+    def test_free_time(self):
+        flights = [Schedule('3', '12345', dt(2, 14), dt(2, 16)),
+                   Schedule('1', '12345', dt(2, 8), dt(2, 10)),
+                   Schedule('2', '9876A', dt(2, 9), dt(2, 11)),
+                   Schedule('4', '555PF', dt(2, 9), dt(2, 11))]
+        aircraft = {
+            '12345': [Schedule(None, '12345', dt(1, 8), dt(1, 9)),
+                      # The flight itself, and one overlapping the next one
+                      Schedule(None, '12345', dt(2, 8), dt(2, 10)),
+                      Schedule(None, '12345', dt(2, 11), dt(2, 15))],
+            '9876A': [Schedule(None, '9876A', dt(2, 7), dt(2, 9))],
+            }
+        free_times = paperless.free_time_before_flights(flights, aircraft)
+        self.assertEqual([f.flight.id for f in free_times],
+                         ['3', '1', '2', '4'])
+        self.assertEqual([(f.free_since, f.free_time) for f in free_times],
+                         [(dt(2, 14), hours(0)),
+                          (dt(1, 9), hours(23)),
+                          (dt(2, 9), hours(0)),
+                          (None, None)])
+        self.assertTrue(free_times[3].is_free_for(EARLY_MAX))
+        self.assertFalse(free_times[0].is_free_for(hours(1)))
+
+
+    def test_back_to_back_flights(self):
+        flights = [Schedule('1', '12345', dt(2, 8), dt(2, 10)),
+                   Schedule('2', '12345', dt(2, 10), dt(2, 12)),
+                   Schedule('3', '12345', dt(2, 13), dt(2, 14))]
+        free_times = paperless.free_time_before_flights(flights, {})
+        self.assertEqual([f.free_time for f in free_times],
+                         [None, hours(0), hours(1)])
+
+
+class TestCalendarEarly(TestCase):
+    def setUp(self):
+        self.flight = Schedule('1', '12345', dt(2, 14), dt(2, 16),
+                               'Clement, Mathieu', 'Smith, John')
+
+
+    def ics(self, free_time, early):
+        calendar = paperless.Calendar(
+            [self.flight], [FreeTime(self.flight, None, free_time)], early)
+        return calendar.cal.to_ical().decode('utf-8')
+
+
+    def event(self, ics):
+        cal = paperless.calendar.icalendar.Calendar.from_ical(ics)
+        event, = cal.walk('VEVENT')
+        return event
+
+
+    def test_alarm(self):
+        ics = self.ics(hours(1), EARLY_ALARM)
+        self.assertIn('BEGIN:VALARM', ics)
+        self.assertIn('TRIGGER:-PT1H', ics)
+        self.assertIn('Aircraft free from 13:00', ics)
+        self.assertEqual(self.event(ics).decoded('dtstart'), dt(2, 14))
+
+
+    def test_dtstart(self):
+        ics = self.ics(None, EARLY_DTSTART)
+        self.assertNotIn('BEGIN:VALARM', ics)
+        # At most EARLY_MAX
+        event = self.event(ics)
+        self.assertEqual(event.decoded('dtstart'), dt(2, 12))
+        self.assertIn('Booked from 14:00', str(event['description']))
+
+
+    def test_not_worth_it(self):
+        self.assertEqual(self.ics(datetime.timedelta(minutes=10),
+                                  EARLY_ALARM),
+                         self.ics(hours(1), None))
+        self.assertNotIn('VALARM', self.ics(hours(1), None))
+
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            paperless.Calendar([self.flight], [], 'email')
+
+
+    def test_update_notices_free_time(self):
+        previous = paperless.Calendar([self.flight]).cal.to_ical()
+        calendar = paperless.Calendar(
+            [self.flight], [FreeTime(self.flight, None, hours(1))],
+            EARLY_ALARM)
+        updated = calendar.update(previous, now=dt(1, 0)).decode('utf-8')
+        self.assertIn('TRIGGER:-PT1H', updated)
+        self.assertIn('SEQUENCE:1', updated)
+
+
+class TestScraperFreeTime(TestCase):
+    def test_one_page_per_aircraft(self):
+        with FakeFbo(my_rows=20, aircraft_rows=30) as fbo, \
+             tempfile.TemporaryDirectory() as tmp_dir:
+            scraper = fbo.scraper(tmp_dir)
+            my_schedules = scraper.my_schedules()
+            free_times = scraper.free_time_before_my_flights(my_schedules)
+            self.assertEqual([f.flight for f in free_times], my_schedules)
+            tail_numbers = {s.tail_number for s in my_schedules}
+            self.assertEqual(fbo.requests['/mstr7b.aspx'], len(tail_numbers))
+            self.assertEqual(fbo.requests['/mstr8.aspx'], 1)
+            for free_time in free_times:
+                if free_time.free_time is not None:
+                    self.assertGreaterEqual(free_time.free_time, hours(0))
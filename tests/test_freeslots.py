@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+
+import datetime
+import pytz
+import random
+from unittest import TestCase
+
+TZ = pytz.timezone('America/Los_Angeles')
+# Across the end of daylight saving time
+BASE = TZ.localize(datetime.datetime(2020, 10, 31))
+HOUR = datetime.timedelta(hours=1)
+
+
+def t(hours):
+    return TZ.normalize(BASE + datetime.timedelta(hours=hours))
+
+
+def schedule(tail_number, start, end):
+    return paperless.Schedule('1', tail_number, t(start), t(end))
+
+
+class TestFreeSlots(TestCase):
+
+    def setUp(self):
+        self.busy_times = paperless.FleetBusyTimes({
+            'N12345': [schedule('12345', 10, 12),
+                       schedule('12345', 11, 14), # overlapping
+                       schedule('12345', 2, 3)],  # unsorted
+            '9876A': [schedule('9876A', 20, 30),
+                      schedule('9876A', -5, 1)],  # starts before window
+            'N555': [],
+            })
+
+
+    def slots(self, min_hours, order_by='duration', start=0, end=48):
+        return [(s.tail_number, s.start_dt, s.end_dt)
+                for s in self.busy_times.free_slots(
+                    t(start), t(end), min_hours * HOUR, order_by)]
+
+
+    def test_by_start(self):
+        self.assertEqual(self.slots(0, 'start'), [
+            ('12345', t(0), t(2)),
+            ('555', t(0), t(48)),
+            ('9876A', t(1), t(20)),
+            ('12345', t(3), t(10)),
+            ('12345', t(14), t(48)),
+            ('9876A', t(30), t(48)),
+            ])
+
+
+    def test_by_duration_with_minimum(self):
+        self.assertEqual(self.slots(10), [
+            ('555', t(0), t(48)),
+            ('12345', t(14), t(48)),
+            ('9876A', t(1), t(20)),
+            ('9876A', t(30), t(48)),
+            ])
+
+
+    def test_times_are_in_window_time_zone(self):
+        slot = self.busy_times.free_slots(t(0), t(48), 30 * HOUR)[0]
+        self.assertEqual(slot.start_dt, t(0))
+        self.assertEqual(slot.start_dt.tzinfo.zone, 'America/Los_Angeles')
+        self.assertEqual(slot.duration, 48 * HOUR)
+
+
+    def test_empty_window(self):
+        self.assertEqual(self.slots(0, start=5, end=5), [])
+
+
+    def test_same_gaps_as_availability_index(self):
+        rnd = random.Random(3)
+        schedules = {}
+        for tail_number in ['1', '2', '3', '4']:
+            schedules[tail_number] = []
+            for _ in range(rnd.randint(0, 30)):
+                start = rnd.randrange(-24, 24 * 14)
+                schedules[tail_number].append(schedule(
+                    tail_number, start, start + rnd.randint(1, 5)))
+        slots = paperless.find_free_slots(schedules, t(0), t(24 * 7),
+                                          3 * HOUR, order_by='start')
+
+        expected = []
+        for tail_number, tail_schedules in schedules.items():
+            availability = paperless.AircraftAvailability(tail_schedules)
+            start = t(0)
+            while start < t(24 * 7):
+                gap_start, gap_end = availability.next_gap(start, 3 * HOUR)
+                if gap_start >= t(24 * 7):
+                    break
+                if gap_end is None or gap_end > t(24 * 7):
+                    gap_end = t(24 * 7)
+                if gap_end - gap_start >= 3 * HOUR:
+                    expected.append((tail_number, gap_start, gap_end))
+                start = gap_end
+        self.assertEqual(
+            sorted((s.tail_number, s.start_dt, s.end_dt) for s in slots),
+            sorted(expected))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['bs4', 'lxml', 'requests', 'pytz', 'icalendar', 'numpy',
+                 'aiohttp', 'cProfile']
+
+# Cold import of the package, was about 450 ms when it imported everything
+# and is about 1 ms lazily: far enough from both to never flake
+IMPORT_BUDGET_MS = 50
+
+
+class TestLazyImport(TestCase):
+    def run_python(self, code, home):
+        return subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT_DIR,
+            env=dict(os.environ, HOME=home), capture_output=True, text=True,
+            check=True)
+
+
+    def test_cold_import(self):
+        with tempfile.TemporaryDirectory() as home:
+            result = self.run_python(
+                'import sys, src; print(" ".join(sys.modules))', home)
+            # Nor does it create the data directory
+            self.assertEqual(os.listdir(home), [])
+        modules = result.stdout.split()
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, modules)
+        # -X importtime: "import time: self | cumulative | name" (in us)
+        cumulative, = [int(m.group(1)) for m in re.finditer(
+            r'^import time:\s+\d+ \|\s+(\d+) \| src$', result.stderr,
+            re.MULTILINE)]
+        self.assertLess(cumulative / 1000, IMPORT_BUDGET_MS)
+
+
+    def test_only_what_is_used(self):
+        with tempfile.TemporaryDirectory() as home:
+            result = self.run_python(
+                'import sys, src; src.Calendar; print(" ".join(sys.modules))',
+                home)
+        modules = result.stdout.split()
+        self.assertIn('icalendar', modules)
+        for module in ['bs4', 'lxml', 'requests', 'numpy']:
+            self.assertNotIn(module, modules)
+
+
+    def test_attributes(self):
+        self.assertIs(paperless.Scraper, paperless.scraper.Scraper)
+        self.assertIs(paperless.find_free_slots,
+                      paperless.freeslots.find_free_slots)
+        self.assertIn('ScheduleStore', dir(paperless))
+        self.assertIn('instrument', dir(paperless))
+        with self.assertRaises(AttributeError):
+            paperless.NoSuchThing
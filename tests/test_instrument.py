@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+from src import instrument
+from fake_fbo import FakeFbo
+
+import io
+import os
+import pstats
+import tempfile
+from unittest import TestCase
+
+
+class TestInstrument(TestCase):
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+
+    def test_disabled_does_nothing(self):
+        with instrument.span('a'):
+            pass
+        instrument.count('b')
+        items = iter([1, 2])
+        self.assertIs(instrument.timed_iter('c', items), items)
+        self.assertEqual(instrument.spans(), {})
+        self.assertEqual(instrument.counters(), {})
+
+
+    def test_spans_and_counters(self):
+        instrument.enable()
+        for _ in range(3):
+            with instrument.span('a'):
+                pass
+        instrument.count('b', 10)
+        instrument.count('b')
+        self.assertEqual(list(instrument.timed_iter('c', range(5), 'items')),
+                         list(range(5)))
+        self.assertEqual(instrument.spans()['a'][0], 3)
+        self.assertEqual(instrument.spans()['c'][0], 1)
+        self.assertEqual(instrument.counters(), {'b': 11, 'items': 5})
+        summary = instrument.summary()
+        for name in ['a', 'b', 'c', 'items']:
+            self.assertRegex(summary, r'(?m)^{} '.format(name))
+
+
+    def test_timed_iter_stopped_early(self):
+        instrument.enable()
+        for item in instrument.timed_iter('c', range(5), 'items'):
+            if item == 1:
+                break
+        self.assertEqual(instrument.counters(), {'items': 2})
+
+
+class TestProfiling(TestCase):
+    def setUp(self):
+        self.fbo = FakeFbo(my_rows=10, aircraft_rows=10).start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.fbo.stop()
+        self.tmp_dir.cleanup()
+        instrument.reset()
+
+
+    def test_pipeline(self):
+        scraper = self.fbo.scraper(self.tmp_dir.name)
+        profile = os.path.join(self.tmp_dir.name, 'run.prof')
+        out = io.StringIO()
+
+        def main():
+            calendar = paperless.Calendar(scraper.my_schedules())
+            calendar.write_filename(os.path.join(self.tmp_dir.name, 'a.ics'))
+
+        with instrument.profiling(profile, out):
+            main()
+        self.assertFalse(instrument.ENABLED)
+        self.assertIn('calendar.events', out.getvalue())
+        spans = instrument.spans()
+        # The calendar is serialized while being written
+        for name in ['login', 'fetch', 'parse', 'calendar.events',
+                     'calendar.write']:
+            self.assertIn(name, spans)
+        counters = instrument.counters()
+        self.assertEqual(counters['rows parsed'], 10)
+        self.assertEqual(counters['events built'], 10)
+        self.assertEqual(counters['pages fetched'], 1)
+        self.assertGreater(counters['bytes downloaded'], 1000)
+        self.assertGreater(pstats.Stats(profile).total_calls, 0)
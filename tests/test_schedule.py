@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+
+from datetime import datetime as dt
+import pytz
+from unittest import TestCase
+
+class TestSchedule(TestCase):
+
+    def setUp(self):
+        tz = pytz.timezone('America/Los_Angeles')
+        self.start = tz.localize(dt(2020, 11, 1, 1, 30), is_dst=True)
+        self.end = tz.localize(dt(2020, 11, 1, 3, 0))
+        self.schedule = paperless.Schedule('124926', '12345', self.start,
+                                           self.end, 'Clement, Mathieu',
+                                           'CfiLastName, CfiFirstName')
+
+
+    def test_no_instance_dict(self):
+        self.assertFalse(hasattr(self.schedule, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.schedule.notes = 'typo'
+
+
+    def test_empty_constructor(self):
+        s = paperless.Schedule()
+        self.assertIsNone(s.id)
+        self.assertIsNone(s.note)
+        s.id = '1'
+        self.assertEqual(s.id, '1')
+
+
+    def test_equality_and_hash_on_tail_start_end(self):
+        other = paperless.Schedule('ACFT_SCHED_12345_1', '12345', self.start,
+                                   self.end, 'Clement, Mathieu')
+        self.assertEqual(self.schedule, other)
+        self.assertEqual(hash(self.schedule), hash(other))
+        self.assertEqual(len({self.schedule, other}), 1)
+        other.tail_number = '9876A'
+        self.assertNotEqual(self.schedule, other)
+        self.assertNotEqual(self.schedule, None)
+
+
+    def test_ordering(self):
+        later = paperless.Schedule('2', '12345', self.end,
+                                   self.end.replace(hour=5))
+        other_aircraft = paperless.Schedule('3', '00001', self.end,
+                                            self.end.replace(hour=5))
+        self.assertLess(self.schedule, later)
+        self.assertEqual(sorted([later, self.schedule, other_aircraft]),
+                         [other_aircraft, self.schedule, later])
+
+
+    def test_dict_round_trip(self):
+        copy = paperless.Schedule.from_dict(self.schedule.to_dict())
+        self.assertEqual(repr(copy), repr(self.schedule))
+        self.assertEqual(copy.start_dt.utcoffset(),
+                         self.start.utcoffset())
+
+
+    def test_canonicalize_tail_number(self):
+        canonicalize = paperless.schedule.canonicalize_tail_number
+        self.assertEqual(canonicalize('N12345'), '12345')
+        self.assertEqual(canonicalize('12345'), '12345')
+        scraper = paperless.Scraper()
+        self.assertEqual(scraper.canonicalize_tail_number('N9876A'), '9876A')
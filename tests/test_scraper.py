@@ -2,15 +2,29 @@
 # -*- coding: utf-8 -*-
 
 import src as paperless
+from fake_fbo import FakeFbo
 
 import datetime
+import os
 import pdb
 import pprint
 import pytz
+import requests
+import stat
+import tempfile
+import threading
+import time
 from unittest import TestCase, skip
 
 pp = pprint.PrettyPrinter(indent=4)
 
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(filename):
+    with open(os.path.join(FIXTURES_DIR, filename)) as f:
+        return f.read()
+
 class TestScraper(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -270,6 +284,20 @@ class TestAircraftAvailable(TestCase):
         self.assertFalse(self.available(pilot_schedules, acft_schedules))
 
 
+    def test_booking_overlapping_the_flight_is_not_available(self):
+        pilot_schedules = self.make_pilot_schedules([
+        #    d  hr  m  hr  m
+            ['9876', 5, 14, 0, 16, 0]
+            ], 'Smith, John')[0]
+        acft_schedules = self.make_aircraft_schedules([
+            ['Karuak, Justine', '9876', 5, 10, 0, 14, 30],
+            ['Smith, John',     '9876', 5, 14, 0, 16, 0]
+            ])
+        self.assertFalse(self.available(pilot_schedules, acft_schedules))
+        fleet = paperless.FleetAvailability({'9876': acft_schedules})
+        self.assertFalse(fleet.is_available_before_flight(pilot_schedules))
+
+
     def test_tail_number_canonicalization1(self):
         pilot_schedules = self.make_pilot_schedules([
         #    d  hr  m  hr  m
@@ -356,3 +384,366 @@ class TestAircraftAvailable(TestCase):
         return schedules
 
 
+class TestCookieManager(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp_dir.name, 'cookies.json')
+        self.cookie_manager = paperless.scraper.CookieManager(self.filename)
+        self.session = requests.Session()
+        self.session.cookies.set('ASP.NET_SessionId', 'abc123',
+                                 domain='example.com', path='/')
+
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+
+    def test_save_and_load(self):
+        self.cookie_manager.save(self.session)
+        session = requests.Session()
+        self.assertTrue(self.cookie_manager.load(session))
+        self.assertEqual(session.cookies.get('ASP.NET_SessionId'), 'abc123')
+
+
+    def test_file_only_readable_by_owner(self):
+        self.cookie_manager.save(self.session)
+        mode = stat.S_IMODE(os.stat(self.filename).st_mode)
+        self.assertEqual(mode, 0o600)
+
+
+    def test_missing_file_is_not_loaded(self):
+        self.assertFalse(self.cookie_manager.load(requests.Session()))
+
+
+    def test_expired_session_is_not_loaded(self):
+        self.cookie_manager.lifetime = -1
+        self.cookie_manager.save(self.session)
+        session = requests.Session()
+        self.assertFalse(self.cookie_manager.load(session))
+        self.assertEqual(len(session.cookies), 0)
+
+
+    def test_forget(self):
+        self.cookie_manager.save(self.session)
+        self.cookie_manager.forget()
+        self.assertFalse(os.path.exists(self.filename))
+        self.assertFalse(self.cookie_manager.load(requests.Session()))
+        # Forgetting twice is harmless
+        self.cookie_manager.forget()
+
+
+class TestAircraftSchedulesMany(TestCase):
+
+    class SlowScraper(paperless.Scraper):
+        """Pretends every aircraft page takes a while to download"""
+
+        def __init__(self):
+            super().__init__('example.com', 'username', 'password',
+                             'America/Los_Angeles')
+            self.is_logged_in = True
+            self.in_flight = 0
+            self.max_in_flight = 0
+            self.fetched = []
+            self.lock = threading.Lock()
+
+        def aircraft_schedules(self, tail_number, since=None, until=None):
+            with self.lock:
+                self.in_flight += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                self.fetched.append(tail_number)
+            time.sleep(0.05)
+            with self.lock:
+                self.in_flight -= 1
+            return [paperless.Schedule('1', tail_number)]
+
+
+    def test_returns_schedules_by_tail_number(self):
+        scraper = self.SlowScraper()
+        result = scraper.aircraft_schedules_many(['N1234', '5678'])
+        self.assertEqual(set(result.keys()), {'N1234', '5678'})
+        self.assertEqual(result['N1234'][0].tail_number, '1234')
+        self.assertEqual(result['5678'][0].tail_number, '5678')
+
+
+    def test_fetches_concurrently_with_limit(self):
+        scraper = self.SlowScraper()
+        tails = [str(1000 + i) for i in range(12)]
+        scraper.aircraft_schedules_many(tails, max_workers=4)
+        self.assertEqual(sorted(scraper.fetched), tails)
+        self.assertGreater(scraper.max_in_flight, 1)
+        self.assertLessEqual(scraper.max_in_flight, 4)
+
+
+    def test_same_aircraft_fetched_once(self):
+        scraper = self.SlowScraper()
+        result = scraper.aircraft_schedules_many(['N1234', '1234'])
+        self.assertEqual(scraper.fetched, ['1234'])
+        self.assertIs(result['N1234'], result['1234'])
+
+
+class TestParsing(TestCase):
+    """Parses pages saved from the website, no network needed"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scraper = paperless.Scraper('example.com', 'username', 'password',
+                                        'America/Los_Angeles')
+        cls.my_schedules_html = read_fixture('my_schedules.html')
+        cls.aircraft_schedules_html = read_fixture('aircraft_schedules.html')
+
+
+    def test_my_schedules(self):
+        schedules = list(self.scraper.parse_my_schedules(
+            self.my_schedules_html))
+        self.assertEqual(len(schedules), 20)
+        first = schedules[0]
+        self.assertEqual(first.id, '124926')
+        self.assertEqual(first.tail_number, '12345')
+        self.assertEqual(first.start_dt.replace(tzinfo=None),
+                         datetime.datetime(2020, 10, 21, 14, 0))
+        self.assertEqual(first.end_dt.replace(tzinfo=None),
+                         datetime.datetime(2020, 10, 21, 16, 0))
+        self.assertEqual(first.pilot, 'Clement, Mathieu')
+        self.assertIsNotNone(first.start_dt.tzinfo)
+
+
+    def test_aircraft_schedules(self):
+        schedules = list(self.scraper.parse_aircraft_schedules(
+            self.aircraft_schedules_html))
+        self.assertEqual(len(schedules), 400)
+        self.assertEqual(schedules[0].id, 'ACFT_SCHED_12345_1')
+        self.assertEqual(schedules[-1].id, 'ACFT_SCHED_12345_400')
+        for s in schedules:
+            self.assertEqual(s.tail_number, '12345')
+            self.assertLess(s.start_dt, s.end_dt)
+
+
+    def test_schedules_are_parsed_lazily(self):
+        schedules = self.scraper.parse_aircraft_schedules(
+            self.aircraft_schedules_html)
+        self.assertEqual(next(schedules).id, 'ACFT_SCHED_12345_1')
+        self.assertEqual(next(schedules).id, 'ACFT_SCHED_12345_2')
+
+
+    def test_in_window(self):
+        schedules = list(self.scraper.parse_aircraft_schedules(
+            self.aircraft_schedules_html))
+        since, until = schedules[4].start_dt, schedules[8].end_dt
+        self.assertEqual(
+            list(paperless.scraper.in_window(schedules, since, until)),
+            [s for s in schedules
+             if s.end_dt > since and s.start_dt < until])
+        self.assertEqual(list(paperless.scraper.in_window(schedules)),
+                         schedules)
+
+
+    def test_availability_stops_at_flight(self):
+        schedules = list(self.scraper.parse_aircraft_schedules(
+            self.aircraft_schedules_html))
+        flight = schedules[2]
+        consumed = []
+        def iterate():
+            for s in schedules:
+                consumed.append(s)
+                yield s
+        self.scraper.is_aircraft_available_before_flight(flight, iterate())
+        self.assertLessEqual(len(consumed), 3)
+
+
+class TestParsers(TestCase):
+    """Both parsers must read exactly the same cells"""
+
+    TRICKY_HTML = (
+        '<html><body><div><table id="T">\n  <tr><th>h</th></tr>'
+        '<tr><td> </td><!-- c --><td>a<!--z-->b</td>\n\t<td>&nbsp;</td></tr>'
+        '<tr><td><b>x</b> <i>y</i></td><td><table><tr><td>n</td></tr>'
+        '</table></td><td>&amp;\n\t</td></tr>\n</table></div></body></html>')
+
+
+    def assertSameRows(self, html, table_id, start_idx, end_idx):
+        expected = list(paperless.scraper.SoupParser().table_rows(
+            html, table_id, start_idx, end_idx))
+        actual = list(paperless.scraper.LxmlParser().table_rows(
+            html, table_id, start_idx, end_idx))
+        self.assertNotEqual(expected, [])
+        self.assertEqual(actual, expected)
+
+
+    def test_fixtures(self):
+        for filename in ['my_schedules.html', 'aircraft_schedules.html']:
+            html = read_fixture(filename)
+            self.assertSameRows(html, paperless.scraper.TABLE_ID, 0, 10)
+            self.assertEqual(
+                paperless.scraper.LxmlParser().hidden_inputs(html),
+                paperless.scraper.SoupParser().hidden_inputs(html))
+
+
+    def test_comments_whitespace_and_nested_tables(self):
+        self.assertSameRows(self.TRICKY_HTML, 'T', 0, 8)
+
+
+    def test_extract_table_from_soup(self):
+        html = read_fixture('my_schedules.html')
+        scraper = paperless.Scraper('example.com', 'username', 'password',
+                                    'America/Los_Angeles')
+        soup = paperless.scraper.BeautifulSoup(html,
+                                               paperless.scraper.BS_PARSER)
+        self.assertEqual(scraper.extract_table(soup, 2, 7),
+                         scraper.extract_table(html, 2, 7))
+
+
+    def test_schedules(self):
+        html = read_fixture('aircraft_schedules.html')
+        schedules = []
+        for parser in ['lxml', 'soup']:
+            scraper = paperless.Scraper('example.com', 'username', 'password',
+                                        'America/Los_Angeles', parser=parser)
+            schedules.append(repr(list(scraper.parse_aircraft_schedules(html))))
+        self.assertEqual(schedules[0], schedules[1])
+
+
+class TestParseDt(TestCase):
+    """The fast path must give the same results as strptime"""
+
+    def setUp(self):
+        self.tz = pytz.timezone('America/Los_Angeles')
+        paperless.scraper.parse_dt.cache_clear()
+
+
+    def assertSameAsStrptime(self, text, dt_format):
+        try:
+            expected = self.tz.localize(
+                datetime.datetime.strptime(text, dt_format))
+        except ValueError as e:
+            with self.assertRaises(ValueError) as cm:
+                paperless.scraper.parse_dt(text, dt_format, self.tz)
+            self.assertEqual(str(cm.exception), str(e))
+            return
+        actual = paperless.scraper.parse_dt(text, dt_format, self.tz)
+        self.assertEqual(actual, expected, text)
+        self.assertEqual(actual.utcoffset(), expected.utcoffset(), text)
+        self.assertEqual(actual.tzname(), expected.tzname(), text)
+
+
+    def test_dst_transitions(self):
+        for day in [datetime.datetime(2020, 3, 7),
+                    datetime.datetime(2020, 10, 31)]:
+            dt = day
+            while dt < day + datetime.timedelta(days=3):
+                self.assertSameAsStrptime('{}/{}/{} {}:{:02d}:00 {}'.format(
+                    dt.month, dt.day, dt.year, (dt.hour % 12) or 12,
+                    dt.minute, 'AM' if dt.hour < 12 else 'PM'),
+                    paperless.Scraper.DT_FORMAT_12HR)
+                self.assertSameAsStrptime(dt.strftime('%m/%d/%y %H:%M'),
+                                          paperless.Scraper.DT_FORMAT_24HR)
+                dt += datetime.timedelta(minutes=30)
+
+
+    def test_unusual_and_invalid_text(self):
+        for text in ['1/1/2020 12:00:00 AM', '1/1/2020 12:00:00 pm',
+                     '1/ 1/2020  1:00:00 am', '2/30/2020 1:00:00 PM',
+                     '13/1/2020 1:00:00 PM', '1/1/2020 1:00:60 PM',
+                     '1/1/2020 1:00:00 PM ', 'garbage', '']:
+            self.assertSameAsStrptime(text, paperless.Scraper.DT_FORMAT_12HR)
+        for text in ['01/01/68 23:59', '01/01/69 00:00', '1/1/20 1:5',
+                     '1/1/20 24:00', ' 1/1/20 1:00', '1/1/2020 1:00']:
+            self.assertSameAsStrptime(text, paperless.Scraper.DT_FORMAT_24HR)
+
+
+    def test_other_formats_use_strptime(self):
+        self.assertSameAsStrptime('2020-11-01 01:30', '%Y-%m-%d %H:%M')
+
+
+    def test_results_are_cached(self):
+        text = '11/1/2020 1:30:00 AM'
+        first = paperless.scraper.parse_dt(
+            text, paperless.Scraper.DT_FORMAT_12HR, self.tz)
+        second = paperless.scraper.parse_dt(
+            text, paperless.Scraper.DT_FORMAT_12HR, self.tz)
+        self.assertIs(first, second)
+
+
+class TestScraperWithFakeFbo(TestCase):
+    """Whole scraper against a local stand-in for the website"""
+
+    def setUp(self):
+        self.fbo = FakeFbo(my_rows=15, aircraft_rows=50).start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.fbo.stop()
+        self.tmp_dir.cleanup()
+
+
+    def scraper(self, password=FakeFbo.PASSWORD):
+        return self.fbo.scraper(self.tmp_dir.name, password=password)
+
+
+    def test_log_in(self):
+        self.assertTrue(self.scraper().log_in())
+        self.assertFalse(self.scraper('wrong').log_in())
+
+
+    def test_my_schedules(self):
+        schedules = self.scraper().my_schedules()
+        self.assertEqual(len(schedules), 15)
+        self.assertEqual(schedules[0].id, '124926')
+        self.assertEqual(schedules[0].pilot, 'Clement, Mathieu')
+        self.assertEqual(schedules, sorted(schedules, key=lambda s: s.start_dt))
+
+
+    def test_aircraft_schedules(self):
+        schedules = self.scraper().aircraft_schedules('N12345')
+        self.assertEqual(len(schedules), 50)
+        self.assertEqual(schedules[0].tail_number, '12345')
+        self.assertIsNotNone(schedules[0].start_dt.tzinfo)
+
+
+    def test_stored_session_is_reused(self):
+        self.scraper().my_schedules()
+        self.scraper().my_schedules()
+        self.assertEqual(self.fbo.logins, 1)
+        self.assertEqual(self.fbo.requests['/fcms1.aspx'], 2)
+
+
+    def test_expired_session_logs_in_again(self):
+        scraper = self.scraper()
+        scraper.my_schedules()
+        self.fbo.expire_sessions()
+        self.assertEqual(len(scraper.my_schedules()), 15)
+        self.assertEqual(self.fbo.logins, 2)
+
+
+    def test_windowed_schedules(self):
+        scraper = self.scraper()
+        everything = scraper.aircraft_schedules('N12345')
+        since, until = everything[10].end_dt, everything[20].start_dt
+        self.assertEqual(scraper.aircraft_schedules('N12345', since, until),
+                         everything[11:20])
+        self.assertEqual(scraper.my_schedules(until=since),
+                         [s for s in scraper.my_schedules()
+                          if s.start_dt < since])
+
+
+    def test_window_stops_parsing(self):
+        scraper = self.scraper()
+        parsed = []
+        parse = scraper.parse_aircraft_schedules
+        def counting_parse(html):
+            for s in parse(html):
+                parsed.append(s)
+                yield s
+        scraper.parse_aircraft_schedules = counting_parse
+        first = scraper.aircraft_schedules('N12345', until=datetime.datetime(
+            1970, 1, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual((first, len(parsed)), ([], 1))
+
+
+    def test_aircraft_schedules_many(self):
+        self.fbo.latency = 0.1
+        result = self.scraper().aircraft_schedules_many(FakeFbo.TAIL_NUMBERS)
+        self.assertEqual(sorted(result.keys()), sorted(FakeFbo.TAIL_NUMBERS))
+        for schedules in result.values():
+            self.assertEqual(len(schedules), 50)
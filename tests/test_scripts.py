@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+
+import datetime
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import TestCase
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPTS = ['create_ics.py', 'check_airplane_free_before_next_flight.py']
+
+
+class TestOffline(TestCase):
+    def setUp(self):
+        self.home = tempfile.TemporaryDirectory()
+        # The store and the settings are in DATA_DIR, under HOME
+        self.data_dir = os.path.join(self.home.name, '.paperless')
+        os.mkdir(self.data_dir)
+        self.env = {name: value for name, value in os.environ.items()
+                    if not name.startswith(paperless.settings.ENV_PREFIX)}
+        self.env.update(HOME=self.home.name,
+                        PAPERLESS_SCRAPER_URL='club.paperlessfbo.com',
+                        PAPERLESS_SCRAPER_USERNAME='student',
+                        PAPERLESS_SCRAPER_PASSWORD='secret',
+                        PAPERLESS_CALENDAR_FBO_URL='club.paperlessfbo.com')
+
+
+    def tearDown(self):
+        self.home.cleanup()
+
+
+    def run_script(self, script):
+        # Not in ROOT_DIR, where the calendar would be written
+        return subprocess.run(
+            [sys.executable, os.path.join(ROOT_DIR, script), '--offline'],
+            cwd=self.home.name, env=self.env, capture_output=True,
+            text=True, timeout=60)
+
+
+    def assertRunOnlineFirst(self, script):
+        result = self.run_script(script)
+        self.assertEqual(result.returncode, 1, result.stderr)
+        self.assertIn('No stored schedules of student', result.stderr)
+        self.assertIn('without --offline first', result.stderr)
+        self.assertNotIn('Traceback', result.stderr)
+
+
+    def test_empty_store(self):
+        for script in SCRIPTS:
+            with self.subTest(script=script):
+                self.assertRunOnlineFirst(script)
+        self.assertFalse(os.path.exists(
+            os.path.join(self.home.name, 'paperless.ics')))
+
+
+    def test_only_past_schedules(self):
+        store = paperless.ScheduleStore(
+            os.path.join(self.data_dir, 'schedules.sqlite3'))
+        start = datetime.datetime(2001, 1, 1, 8, tzinfo=datetime.timezone.utc)
+        store.upsert([paperless.Schedule(
+            '1', '12345', start, start + datetime.timedelta(hours=2),
+            'Clement, Mathieu')], owner='student')
+        store.close()
+        for script in SCRIPTS:
+            with self.subTest(script=script):
+                self.assertRunOnlineFirst(script)
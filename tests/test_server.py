@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+from src.server import accepts_gzip, etag_matches
+from fake_fbo import FakeFbo
+
+import gzip
+import http.client
+import os
+import tempfile
+from unittest import TestCase
+
+ICS = b'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nEND:VCALENDAR\r\n' * 20
+
+
+class TestHeaders(TestCase):
+    def test_accepts_gzip(self):
+        self.assertTrue(accepts_gzip('gzip, deflate, br'))
+        self.assertTrue(accepts_gzip('deflate;q=1, gzip;q=0.5'))
+        self.assertTrue(accepts_gzip('*'))
+        self.assertFalse(accepts_gzip('gzip;q=0'))
+        self.assertTrue(accepts_gzip('*;q=0, gzip'))
+        self.assertFalse(accepts_gzip('gzip;q=0, *'))
+        self.assertFalse(accepts_gzip('identity'))
+        self.assertFalse(accepts_gzip(None))
+
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"abc"', '"abc"'))
+        self.assertTrue(etag_matches('"xyz", W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches('*', '"abc"'))
+        self.assertFalse(etag_matches('"abc-gzip"', '"abc"'))
+        self.assertFalse(etag_matches('', '"abc"'))
+
+
+class TestCalendarServer(TestCase):
+    def setUp(self):
+        self.server = paperless.CalendarServer().start()
+        self.server.publish('student', ICS)
+
+
+    def tearDown(self):
+        self.server.stop()
+
+
+    def request(self, path='/student.ics', method='GET', **headers):
+        host, port = self.server.server.server_address[:2]
+        connection = http.client.HTTPConnection(host, port, timeout=10)
+        try:
+            connection.request(method, path, headers=headers)
+            response = connection.getresponse()
+            return response, response.read()
+        finally:
+            connection.close()
+
+
+    def test_get(self):
+        response, body = self.request()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, ICS)
+        self.assertEqual(response.getheader('Content-Type'),
+                         'text/calendar; charset=utf-8')
+        self.assertIsNone(response.getheader('Content-Encoding'))
+        self.assertIsNotNone(response.getheader('Last-Modified'))
+
+        response, body = self.request(method='HEAD')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b'')
+        self.assertEqual(response.getheader('Content-Length'), str(len(ICS)))
+
+
+    def test_not_modified(self):
+        response, _ = self.request()
+        etag = response.getheader('ETag')
+        response, body = self.request(**{'If-None-Match': etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b'')
+        self.assertEqual(response.getheader('ETag'), etag)
+
+
+    def test_gzip(self):
+        response, body = self.request(**{'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Content-Encoding'), 'gzip')
+        self.assertEqual(response.getheader('Vary'), 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(body), ICS)
+        self.assertLess(len(body), len(ICS))
+
+        # Each representation has its own strong ETag
+        etag = response.getheader('ETag')
+        self.assertNotEqual(etag, self.request()[0].getheader('ETag'))
+        response, _ = self.request(**{'Accept-Encoding': 'gzip',
+                                      'If-None-Match': etag})
+        self.assertEqual(response.status, 304)
+        response, _ = self.request(**{'If-None-Match': etag})
+        self.assertEqual(response.status, 200)
+
+
+    def test_republished_only_when_changed(self):
+        etag = self.request()[0].getheader('ETag')
+        rendered = self.server.get('student')
+        self.assertFalse(self.server.publish('student', ICS))
+        self.assertIs(self.server.get('student'), rendered)
+
+        self.assertTrue(self.server.publish('student', ICS + ICS))
+        response, body = self.request(**{'If-None-Match': etag})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, ICS + ICS)
+        self.assertNotEqual(response.getheader('ETag'), etag)
+
+
+    def test_not_found(self):
+        self.assertEqual(self.request('/nobody.ics')[0].status, 404)
+        self.assertEqual(self.request('/student')[0].status, 404)
+        self.server.publish('John Smith', ICS)
+        self.assertEqual(self.request('/John%20Smith.ics')[0].status, 200)
+
+
+class TestPollerPublishes(TestCase):
+    def setUp(self):
+        self.fbo = FakeFbo(my_rows=10, aircraft_rows=40).start()
+        self.server = paperless.CalendarServer().start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        scraper = self.fbo.scraper(self.tmp_dir.name)
+        self.calendar_path = os.path.join(self.tmp_dir.name, 'calendar.ics')
+        self.poller = paperless.Poller(scraper, self.calendar_path,
+                                       output=lambda message: None,
+                                       server=self.server)
+
+
+    def tearDown(self):
+        self.server.stop()
+        self.fbo.stop()
+        self.tmp_dir.cleanup()
+
+
+    def test_published_when_changed(self):
+        self.poller.poll()
+        rendered = self.server.get(FakeFbo.USERNAME)
+        with open(self.calendar_path, 'rb') as f:
+            self.assertEqual(rendered.body, f.read())
+
+        self.poller.poll()
+        self.assertIs(self.server.get(FakeFbo.USERNAME), rendered)
+
+        self.fbo.my_rows = 11
+        self.poller.poll()
+        self.assertNotEqual(self.server.get(FakeFbo.USERNAME).etag,
+                            rendered.etag)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+from src import settings
+
+import os
+import tempfile
+from unittest import TestCase, mock
+
+SETTINGS = '''
+[scraper]
+url = club.paperlessfbo.com
+username = student
+password = secret
+timezone = America/Los_Angeles
+
+[calendar]
+principal_cfi = Smith, John
+fbo_url = club.paperlessfbo.com
+fbo_address = My FBO
+'''
+
+
+class TestSettings(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'settings.ini')
+        self.write(SETTINGS)
+        # Restored after each test, which sets its own overrides
+        self.environ = mock.patch.dict(os.environ)
+        self.environ.start()
+        for name in list(os.environ):
+            if name.startswith(settings.ENV_PREFIX):
+                del os.environ[name]
+
+
+    def tearDown(self):
+        self.environ.stop()
+        self.tmp_dir.cleanup()
+
+
+    def write(self, text, mtime_ns=None):
+        with open(self.path, 'w') as f:
+            f.write(text)
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+
+    def test_typed_sections(self):
+        loaded = settings.load(self.path)
+        self.assertEqual(loaded.scraper(), settings.ScraperSettings(
+            'club.paperlessfbo.com', 'student', 'secret',
+            'America/Los_Angeles'))
+        self.assertEqual(loaded.calendar().principal_cfi, 'Smith, John')
+
+
+    def test_parsed_once_until_modified(self):
+        self.write(SETTINGS, 1000000000)
+        loaded = settings.load(self.path)
+        with mock.patch.object(settings.Settings, '__init__') as init:
+            self.assertIs(settings.load(self.path), loaded)
+            init.assert_not_called()
+        self.write(SETTINGS.replace('student', 'pilot'), 2000000000)
+        self.assertEqual(settings.load(self.path).scraper().username, 'pilot')
+
+
+    def test_environment_overrides(self):
+        os.environ['PAPERLESS_SCRAPER_PASSWORD'] = '100%secret'
+        self.assertEqual(settings.load(self.path).scraper().password,
+                         '100%secret')
+        del os.environ['PAPERLESS_SCRAPER_PASSWORD']
+        self.assertEqual(settings.load(self.path).scraper().password,
+                         'secret')
+
+
+    def test_environment_only(self):
+        os.remove(self.path)
+        os.environ.update(PAPERLESS_SCRAPER_URL='club.paperlessfbo.com',
+                          PAPERLESS_SCRAPER_USERNAME='student',
+                          PAPERLESS_SCRAPER_PASSWORD='secret')
+        self.assertEqual(settings.load(self.path).scraper().timezone, '')
+
+
+    def test_all_problems_reported(self):
+        self.write(SETTINGS.replace('password = secret\n', '')
+                           .replace('America/Los_Angeles', 'Mars/Base')
+                           .replace('fbo_url = club.paperlessfbo.com\n', ''))
+        with self.assertRaises(settings.SettingsError) as cm:
+            settings.load(self.path).validate()
+        self.assertEqual(cm.exception.problems, [
+            '[scraper] password is missing (or set '
+            'PAPERLESS_SCRAPER_PASSWORD)',
+            "[scraper] timezone 'Mars/Base' is unknown",
+            '[calendar] fbo_url is missing (or set PAPERLESS_CALENDAR_FBO_URL)',
+            ])
+        self.assertIn(self.path, str(cm.exception))
+        with self.assertRaises(ValueError):
+            settings.load(self.path).calendar()
+
+
+    def test_shared_by_scraper_and_calendar(self):
+        os.environ.update(PAPERLESS_SCRAPER_USERNAME='from_env',
+                          PAPERLESS_CALENDAR_FBO_ADDRESS='Hangar 3')
+        self.assertEqual(paperless.Scraper().username, 'from_env')
+        calendar = paperless.Calendar([paperless.Schedule(
+            '1', 'N12345', None, None)])
+        self.assertEqual(calendar.fbo_address, 'Hangar 3')
+
+
+    def test_former_settings_classes(self):
+        os.environ.update(PAPERLESS_SCRAPER_USERNAME='from_env',
+                          PAPERLESS_CALENDAR_FBO_ADDRESS='Hangar 3')
+        self.assertEqual(paperless.Scraper.Settings().username, 'from_env')
+        self.assertEqual(paperless.Calendar.Settings().fbo_address,
+                         'Hangar 3')
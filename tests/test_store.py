@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+from src.schedule import Schedule
+from fake_fbo import FakeFbo
+from helpers import TZ, dt
+
+import datetime
+import os
+import tempfile
+from unittest import TestCase
+
+
+class TestScheduleStore(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = paperless.ScheduleStore(
+            os.path.join(self.tmp_dir.name, 'schedules.sqlite3'))
+
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+
+    def test_round_trip(self):
+        s = Schedule('124926', '12345', dt(3, 1, 30), dt(3, 3),
+                     'Clement, Mathieu', 'Smith, John', 'Bring headset')
+        self.store.upsert([s])
+        stored, = self.store.query()
+        for field in Schedule.FIELDS:
+            self.assertEqual(getattr(stored, field), getattr(s, field))
+        self.assertEqual(stored.start_dt.tzinfo.zone, TZ.zone)
+        self.assertEqual(stored.start_dt.utcoffset(), s.start_dt.utcoffset())
+
+
+    def test_naive_datetimes(self):
+        s = Schedule('1', '12345', datetime.datetime(2030, 1, 1, 8),
+                     datetime.datetime(2030, 1, 1, 9))
+        self.store.upsert([s])
+        self.assertEqual(self.store.query()[0].start_dt, s.start_dt)
+
+
+    def test_queries(self):
+        self.store.upsert([
+            Schedule('1', '12345', dt(2, 8), dt(2, 10), 'A', 'X'),
+            Schedule('2', '9876A', dt(2, 9), dt(2, 11), 'B', 'X'),
+            Schedule('3', '12345', dt(3, 8), dt(3, 10), 'B', 'Y'),
+            ])
+        ids = lambda schedules: [s.id for s in schedules]
+        self.assertEqual(ids(self.store.query()), ['1', '2', '3'])
+        self.assertEqual(ids(self.store.query(tail_number='N12345')),
+                         ['1', '3'])
+        self.assertEqual(ids(self.store.query(pilot='B')), ['2', '3'])
+        self.assertEqual(ids(self.store.query(cfi='X', pilot='B')), ['2'])
+        # Overlapping, not only starting in the range
+        self.assertEqual(ids(self.store.query(dt(2, 10), dt(3, 8))), ['2'])
+        self.assertEqual(ids(self.store.query(start=dt(2, 10, 30))),
+                         ['2', '3'])
+        self.assertEqual(ids(self.store.query(end=dt(2, 9))), ['1'])
+
+
+    def test_indexes_used(self):
+        for column in ['tail_number', 'pilot', 'cfi', 'start_ts']:
+            plan = self.store.connection.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM schedules WHERE {} = ?'
+                .format(column), ('x',)).fetchall()
+            self.assertIn('USING INDEX', str(plan), column)
+
+
+    def test_merges_aircraft_and_my_schedules(self):
+        self.store.upsert([Schedule('ACFT_SCHED_12345_1', '12345', dt(2, 8),
+                                    dt(2, 10), 'A', 'X')])
+        self.store.upsert([Schedule('124926', 'N12345', dt(2, 8), dt(2, 10),
+                                    'A', 'X')], owner='a')
+        self.store.upsert([Schedule('ACFT_SCHED_12345_7', '12345', dt(2, 8),
+                                    dt(2, 10, 30), 'A', 'X')])
+        s, = self.store.query()
+        self.assertEqual(s.id, '124926')
+        self.assertEqual(s.end_dt, dt(2, 10, 30))
+        self.assertEqual(len(self.store.query(owner='a')), 1)
+
+
+    def test_aircraft_page_keeps_the_instructor(self):
+        self.store.upsert([Schedule('124926', 'N12345', dt(2, 8), dt(2, 10),
+                                    'Clement, Mathieu', 'Smith, John')],
+                          owner='a')
+        # Aircraft pages have no CFI
+        self.store.upsert([Schedule('ACFT_SCHED_12345_1', '12345', dt(2, 8),
+                                    dt(2, 10), 'Clement, Mathieu', None)])
+        s, = self.store.query(owner='a')
+        self.assertEqual(s.cfi, 'Smith, John')
+        self.assertEqual(s.pilot, 'Clement, Mathieu')
+
+
+    def test_generated_ids_stable(self):
+        self.store.upsert([Schedule('ACFT_SCHED_12345_1', '12345', dt(2, 8),
+                                    dt(2, 10))])
+        first = self.store.query()[0].id
+        self.store.upsert([Schedule('ACFT_SCHED_12345_2', '12345', dt(2, 8),
+                                    dt(2, 10))])
+        self.assertEqual(self.store.query()[0].id, first)
+
+
+    def test_moved_booking(self):
+        self.store.upsert([Schedule('1', '12345', dt(2, 8), dt(2, 10))])
+        self.store.upsert([Schedule('1', '12345', dt(2, 12), dt(2, 14))])
+        s, = self.store.query()
+        self.assertEqual(s.start_dt, dt(2, 12))
+
+
+    def test_replace_deletes_cancelled_future_schedules(self):
+        self.store.upsert([
+            Schedule('1', '12345', dt(1, 8), dt(1, 10)),
+            Schedule('2', '12345', dt(2, 8), dt(2, 10)),
+            Schedule('3', '12345', dt(3, 8), dt(3, 10)),
+            ], owner='a')
+        self.store.upsert([Schedule('4', '12345', dt(3, 12), dt(3, 14))],
+                          owner='b')
+        cancelled = self.store.replace(
+            [Schedule('3', '12345', dt(3, 8), dt(3, 10))], dt(2, 0),
+            owner='a')
+        self.assertEqual(cancelled, 1)
+        # Past flights are history, others' flights are not touched
+        self.assertEqual([s.id for s in self.store.query()], ['1', '3', '4'])
+
+        self.store.upsert([Schedule('ACFT_SCHED_12345_1', '12345', dt(3, 16),
+                                    dt(3, 17))])
+        self.store.replace([], dt(3, 9), tail_number='N12345')
+        self.assertEqual([s.id for s in self.store.query()], ['1', '3', '4'])
+
+
+    def test_replace_within_window(self):
+        self.store.upsert([
+            Schedule('1', '12345', dt(2, 8), dt(2, 10)),
+            Schedule('2', '12345', dt(3, 8), dt(3, 10)),
+            Schedule('3', '12345', dt(4, 8), dt(4, 10)),
+            ], owner='a')
+        # The 2nd was cancelled, the 1st is before the window
+        self.store.replace([Schedule('3', '12345', dt(4, 8), dt(4, 10))],
+                           dt(3, 0), owner='a', until=dt(5, 0))
+        self.assertEqual([s.id for s in self.store.query()], ['1', '3'])
+        self.store.replace([], dt(1, 0), owner='a', until=dt(4, 8))
+        self.assertEqual([s.id for s in self.store.query()], ['3'])
+
+
+    def test_fleet_availability(self):
+        self.store.upsert([
+            Schedule('1', '12345', dt(2, 8), dt(2, 10)),
+            Schedule('2', '12345', dt(2, 10), dt(2, 12)),
+            ])
+        flight = self.store.query()[1]
+        availability = self.store.fleet_availability(['N12345'])
+        self.assertFalse(availability.is_available_before_flight(flight))
+
+
+class TestScraperWithStore(TestCase):
+    def setUp(self):
+        self.fbo = FakeFbo(my_rows=10, aircraft_rows=30).start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = paperless.ScheduleStore(
+            os.path.join(self.tmp_dir.name, 'schedules.sqlite3'))
+        self.scraper = self.fbo.scraper(self.tmp_dir.name, store=self.store)
+
+
+    def tearDown(self):
+        self.fbo.stop()
+        self.store.close()
+        self.tmp_dir.cleanup()
+
+
+    def test_scraped_schedules_are_stored(self):
+        my_schedules = self.scraper.my_schedules()
+        self.assertEqual(self.store.query(owner=FakeFbo.USERNAME),
+                         my_schedules)
+        aircraft = self.scraper.aircraft_schedules('N12345')
+        stored = self.store.query(tail_number='12345')
+        for s in aircraft:
+            self.assertIn(s.start_dt, [t.start_dt for t in stored])
+        # Rows of both pages for the same slot are merged, keeping the id
+        for s in my_schedules:
+            if s.tail_number == '12345':
+                self.assertIn(s.id, [t.id for t in stored])
+
+        # Cancelled on the website
+        self.fbo.my_rows = 9
+        self.scraper.my_schedules()
+        self.assertEqual(len(self.store.query(owner=FakeFbo.USERNAME)), 9)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import src as paperless
+from fake_fbo import FakeFbo
+
+import requests
+import tempfile
+from unittest import TestCase
+
+
+class TestTransport(TestCase):
+    def setUp(self):
+        self.fbo = FakeFbo(my_rows=20, aircraft_rows=10).start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+
+    def tearDown(self):
+        self.fbo.stop()
+        self.tmp_dir.cleanup()
+
+
+    def scraper(self, **kwargs):
+        transport = paperless.Transport(backoff_factor=0, **kwargs)
+        return self.fbo.scraper(self.tmp_dir.name, transport=transport)
+
+
+    def test_retries_server_errors(self):
+        scraper = self.scraper(retries=3)
+        scraper.ensure_logged_in()
+        self.fbo.failures = 2
+        self.assertEqual(len(scraper.my_schedules()), 20)
+        self.assertEqual(self.fbo.requests['/mstr8.aspx'], 3)
+
+
+    def test_gives_up_after_retries(self):
+        session = paperless.Transport(retries=1, backoff_factor=0).session()
+        self.fbo.failures = 5
+        response = session.get(self.fbo.domain + '/fcms1.aspx')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.fbo.requests['/fcms1.aspx'], 2)
+
+
+    def test_read_timeout(self):
+        self.fbo.latency = 0.5
+        scraper = self.scraper(read_timeout=0.05, retries=0)
+        with self.assertRaises(requests.RequestException):
+            scraper.log_in()
+
+
+    def test_compression(self):
+        self.fbo.compress = True
+        self.fbo.my_rows = 200
+        self.assertEqual(len(self.scraper().my_schedules()), 200)
+        compressed = self.fbo.bytes_sent
+        self.fbo.bytes_sent = 0
+        self.assertEqual(len(self.scraper(compression=False).my_schedules()),
+                         200)
+        self.assertLess(compressed, self.fbo.bytes_sent / 2)
+
+
+    def test_sessions_share_pool(self):
+        transport = paperless.Transport()
+        a = transport.session()
+        b = transport.session()
+        self.assertIsNot(a.cookies, b.cookies)
+        self.assertIs(a.get_adapter(self.fbo.domain),
+                      b.get_adapter(self.fbo.domain))
+
+
+    def test_latency_timing(self):
+        scraper = self.scraper()
+        self.assertEqual(scraper.transport.latency_stats()['count'], 0)
+        scraper.my_schedules()
+        timings = list(scraper.transport.timings)
+        # Login page, login, my schedules
+        self.assertEqual([t.method for t in timings], ['GET', 'POST', 'GET'])
+        self.assertEqual(timings[-1].status_code, 200)
+        stats = scraper.transport.latency_stats()
+        self.assertEqual(stats['count'], 3)
+        self.assertGreaterEqual(stats['max'], stats['median'])